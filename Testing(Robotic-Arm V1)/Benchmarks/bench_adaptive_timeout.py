@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+#
+# Loop rate of a 5-servo read loop when servo 5 is missing from the bus.
+#
+# Each loop reads every servo's position with ReadPos and then all of
+# them with one SyncReadState. With the fixed timeout every read of the
+# missing servo waits LATENCY_TIMER (50 ms). With AdaptiveTimeout the
+# missing ID is quarantined after a few misses, the present ones get a
+# timeout sized from their measured latency, and the loop runs at the
+# rate of the servos that are there.
+#
+
+import sys
+import time
+
+sys.path.append("..")
+from STservo_sdk import *
+from fake_bus import FakeBus
+
+PRESENT_IDS = [1, 2, 3, 4]
+MOTOR_IDS = [1, 2, 3, 4, 5]
+BAUDRATE = 1000000
+RESPONSE_DELAY = 0.0001   # seconds before each status packet
+DURATION = 2.0            # seconds per measurement
+
+
+def loop(packetHandler):
+    for sid in MOTOR_IDS:
+        packetHandler.ReadPos(sid)
+    packetHandler.SyncReadState(MOTOR_IDS, ['position'])
+
+
+def measure(packetHandler):
+    loops = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < DURATION:
+        loop(packetHandler)
+        loops += 1
+    return loops / (time.perf_counter() - start)
+
+
+def main():
+    with FakeBus(PRESENT_IDS, response_delay=RESPONSE_DELAY, baudrate=BAUDRATE) as bus:
+        portHandler = PortHandler(bus.port_name)
+        packetHandler = sts(portHandler)
+        if not portHandler.openPort():
+            print("Failed to open the port")
+            return
+        portHandler.setRxBlocking(True)
+
+        print("%-16s %10s %12s %12s" % ("timeout", "loops/s", "quarantines", "skipped"))
+        print("%-16s %10.1f %12s %12s" % ("fixed", measure(packetHandler), "-", "-"))
+
+        adaptiveTimeout = AdaptiveTimeout()
+        packetHandler.setAdaptiveTimeout(adaptiveTimeout)
+        hz = measure(packetHandler)
+        print("%-16s %10.1f %12d %12d" % ("AdaptiveTimeout", hz, adaptiveTimeout.quarantine_count,
+                                           adaptiveTimeout.skipped_count))
+        for sid in PRESENT_IDS:
+            print("  ID %d: srtt %.3f ms, timeout latency %.3f ms" % (
+                sid, adaptiveTimeout.srtt[sid], adaptiveTimeout.getLatency(sid)))
+
+        portHandler.closePort()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+#
+# Request latency for concurrent position readers, the threaded
+# Read_Write_Pos.py pattern vs the asyncio front-end.
+#
+# "threaded" runs one thread per servo, each taking a shared comm_lock
+# around sts.ReadPos, as Read_Write_Pos.py does for its pollers and
+# spawn()ed moves. "asyncio" runs one task per servo awaiting
+# async_sts.ReadPos on a single event loop. Latency is measured from the
+# moment a reader wants the bus to the moment it has the position.
+#
+
+import sys
+import time
+import asyncio
+import threading
+
+sys.path.append("..")
+from STservo_sdk import *
+from fake_bus import FakeBus
+
+BAUDRATE = 1000000
+RESPONSE_DELAY = 0.0001   # seconds before each status packet
+DURATION = 2.0            # seconds per measurement
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100.0))]
+
+
+def threaded(port_name, motor_ids):
+    portHandler = PortHandler(port_name)
+    portHandler.openPort()
+    portHandler.setBaudRate(BAUDRATE)
+    portHandler.setRxBlocking(True)
+    packetHandler = sts(portHandler)
+    comm_lock = threading.Lock()
+    latencies = []
+    stop = time.perf_counter() + DURATION
+
+    def reader(sid):
+        while time.perf_counter() < stop:
+            t0 = time.perf_counter()
+            with comm_lock:
+                packetHandler.ReadPos(sid)
+            latencies.append(time.perf_counter() - t0)
+
+    threads = [threading.Thread(target=reader, args=(sid,)) for sid in motor_ids]
+    cpu = time.process_time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    cpu = time.process_time() - cpu
+    portHandler.closePort()
+    return latencies, cpu
+
+
+def asynchronous(port_name, motor_ids):
+    portHandler = PortHandler(port_name)
+    portHandler.openPort()
+    portHandler.setBaudRate(BAUDRATE)
+    latencies = []
+
+    async def reader(packetHandler, sid, stop):
+        while time.perf_counter() < stop:
+            t0 = time.perf_counter()
+            await packetHandler.ReadPos(sid)
+            latencies.append(time.perf_counter() - t0)
+
+    async def run():
+        asyncPortHandler = AsyncPortHandler(portHandler)
+        asyncPortHandler.attach()
+        packetHandler = async_sts(asyncPortHandler)
+        stop = time.perf_counter() + DURATION
+        await asyncio.gather(*(reader(packetHandler, sid, stop) for sid in motor_ids))
+        asyncPortHandler.detach()
+
+    cpu = time.process_time()
+    asyncio.run(run())
+    cpu = time.process_time() - cpu
+    portHandler.closePort()
+    return latencies, cpu
+
+
+def main():
+    print("%-10s %7s %10s %10s %10s %14s" % ("mode", "servos", "txn/s", "p50 us", "p99 us", "CPU us/txn"))
+    for n in (1, 5):
+        motor_ids = list(range(1, n + 1))
+        with FakeBus(motor_ids, response_delay=RESPONSE_DELAY, baudrate=BAUDRATE) as bus:
+            for name, fn in (("threaded", threaded), ("asyncio", asynchronous)):
+                latencies, cpu = fn(bus.port_name, motor_ids)
+                print("%-10s %7d %10.0f %10.0f %10.0f %14.1f" % (
+                    name, n, len(latencies) / DURATION,
+                    percentile(latencies, 50) * 1e6, percentile(latencies, 99) * 1e6,
+                    cpu / len(latencies) * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+#
+# IK for a 10000-point Cartesian path: one call per point vs one batch.
+#
+# "per point" is 3DIK.py's analytical_ik_3dof_with_base (copied here, since
+# importing 3DIK.py opens the port). "batch_ik" is Maths/batch_ik.py solving
+# the whole path, and both elbow branches, in one call. The batch result
+# is checked against the per-point one and round-tripped through the
+# batch forward kinematics.
+#
+
+import sys
+import time
+
+import numpy as np
+
+sys.path.append("..")
+from Maths.batch_ik import *
+
+# 3DIK.py's link lengths (cm), passed explicitly to the Maths functions
+l1 = 22.85
+l2 = 22.85
+l3 = 24.25
+
+POINTS = 10000
+
+
+def analytical_ik_3dof_with_base(x, y, z, phi):
+    theta0 = np.arctan2(y, x)
+    r = np.sqrt(x**2 + y**2)
+    wx = r - l3 * np.cos(phi)
+    wz = z - l3 * np.sin(phi)
+    r_sq = wx**2 + wz**2
+    cos_theta2 = (r_sq - l1**2 - l2**2) / (2 * l1 * l2)
+    if abs(cos_theta2) > 1:
+        return None
+    theta2 = np.arccos(cos_theta2)
+    k1 = l1 + l2 * np.cos(theta2)
+    k2 = l2 * np.sin(theta2)
+    theta1 = np.arctan2(wz, wx) - np.arctan2(k2, k1)
+    theta3 = phi - theta1 - theta2
+    return np.degrees([theta0, theta1, theta2, theta3])
+
+
+def main():
+    # a helix through and beyond the workspace
+    t = np.linspace(0, 8 * np.pi, POINTS)
+    x = (10 + 60 * t / t[-1]) * np.cos(t)
+    y = (10 + 60 * t / t[-1]) * np.sin(t)
+    z = 15 + 10 * np.sin(3 * t)
+    phi = np.full(POINTS, -np.pi / 2)
+
+    start = time.perf_counter()
+    single = [analytical_ik_3dof_with_base(*target) for target in zip(x, y, z, phi)]
+    single_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    angles, reachable = batch_ik_3dof_with_base(x, y, z, phi, l1=l1, l2=l2, l3=l3)
+    batch_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    both, _ = batch_ik_3dof_with_base(x, y, z, phi, elbow=np.array([[ELBOW_DOWN], [ELBOW_UP]]), l1=l1, l2=l2, l3=l3)
+    both_s = time.perf_counter() - start
+
+    same_mask = np.array_equal(reachable, [s is not None for s in single])
+    expected = np.array([s if s is not None else [np.nan] * 4 for s in single])
+    max_diff = np.nanmax(np.abs(np.degrees(angles) - expected))
+
+    position, fk_phi = batch_fk_3dof_with_base(both[:, reachable], l1, l2, l3)
+    fk_error = np.max(np.abs(position - np.stack([x, y, z], axis=-1)[reachable]))
+
+    print("%-22s %10s %12s" % ("method", "ms", "us/point"))
+    print("%-22s %10.2f %12.3f" % ("per point", single_s * 1e3, single_s * 1e6 / POINTS))
+    print("%-22s %10.2f %12.3f" % ("batch_ik", batch_s * 1e3, batch_s * 1e6 / POINTS))
+    print("%-22s %10.2f %12.3f" % ("batch_ik both elbows", both_s * 1e3, both_s * 1e6 / POINTS))
+    print("\n%d of %d points reachable, same mask as per point: %s" % (reachable.sum(), POINTS, same_mask))
+    print("max angle difference vs per point: %.2e deg" % max_diff)
+    print("max FK round-trip error (both elbows): %.2e cm" % fk_error)
+
+
+if __name__ == "__main__":
+    main()
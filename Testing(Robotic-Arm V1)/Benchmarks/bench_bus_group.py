@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+#
+# Loop rate for 6 servos split over 1, 2 and 3 buses with BusGroup.
+#
+# Each loop is one ReadState (position, speed) and one WriteGoals with a
+# new goal for every servo, the positionController.py cycle. Every bus
+# is its own FakeBus pty at 115200 baud, where wire time dominates the
+# cycle as it does on a real adapter.
+#
+
+import sys
+import time
+
+sys.path.append("..")
+from STservo_sdk import *
+from fake_bus import FakeBus
+
+MOTOR_IDS = [1, 2, 3, 4, 5, 6]
+BAUDRATE = 115200
+RESPONSE_DELAY = 0.0001   # seconds before each status packet
+DURATION = 2.0            # seconds per measurement
+
+
+def measure(busGroup):
+    loops = 0
+    errors = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < DURATION:
+        goal = 1000 + (loops % 2) * 1000
+        states, result = busGroup.ReadState(MOTOR_IDS, ['position', 'speed'])
+        if result != COMM_SUCCESS or busGroup.WriteGoals(dict((sid, goal) for sid in MOTOR_IDS), 0, 0) != COMM_SUCCESS:
+            errors += 1
+        loops += 1
+    return loops / (time.perf_counter() - start), errors
+
+
+def run(n_buses):
+    groups = [MOTOR_IDS[i::n_buses] for i in range(n_buses)]
+    fakeBuses = [FakeBus(ids, response_delay=RESPONSE_DELAY, baudrate=BAUDRATE).start() for ids in groups]
+    ports = []
+    try:
+        with BusGroup() as busGroup:
+            for fakeBus in fakeBuses:
+                portHandler = PortHandler(fakeBus.port_name)
+                portHandler.baudrate = BAUDRATE
+                if not portHandler.openPort():
+                    print("Failed to open the port")
+                    return
+                portHandler.setRxBlocking(True)
+                ports.append(portHandler)
+                busGroup.addBus(sts(portHandler))
+            found = busGroup.scan(MOTOR_IDS)
+            hz, errors = measure(busGroup)
+            print("%5d %8d %10.1f %8d" % (n_buses, len(found), hz, errors))
+    finally:
+        for portHandler in ports:
+            portHandler.closePort()
+        for fakeBus in fakeBuses:
+            fakeBus.stop()
+
+
+def main():
+    print("%5s %8s %10s %8s" % ("buses", "servos", "loops/s", "errors"))
+    for n_buses in (1, 2, 3):
+        run(n_buses)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+#
+# How fast can the positionController.py cycle run? A ControlLoop does one
+# SyncReadState (read), a trivial goal update (compute) and a GroupSyncWrite
+# of 5 goals (write) at each rate; the table shows release jitter, phase
+# times and overruns. Pick the highest rate with no overruns and a p99
+# cycle time comfortably below the period.
+#
+
+import sys
+
+sys.path.append("..")
+from STservo_sdk import *
+from fake_bus import FakeBus
+
+MOTOR_IDS = [1, 2, 3, 4, 5]
+BAUDRATE = 1000000
+RESPONSE_DELAY = 0.0001   # seconds before each status packet
+DURATION = 2.0            # seconds per rate
+RATES = (100, 200, 500, 1000)
+SPEED = 1200
+ACC = 50
+
+
+def make_loop(packetHandler, rate):
+    goals = dict((sid, 0) for sid in MOTOR_IDS)
+
+    def read():
+        states, _ = packetHandler.SyncReadState(MOTOR_IDS, ['position'])
+        return states
+
+    def compute(states):
+        for sid in MOTOR_IDS:
+            goals[sid] = (goals[sid] + 1) & 0x3FF
+        return goals
+
+    def write(goals):
+        packetHandler.groupSyncWrite.clearParam()
+        for sid, goal in goals.items():
+            packetHandler.SyncWritePosEx(sid, goal, SPEED, ACC)
+        packetHandler.groupSyncWrite.txPacket()
+
+    return ControlLoop(rate, read, compute, write, history=4096)
+
+
+def main():
+    with FakeBus(MOTOR_IDS, response_delay=RESPONSE_DELAY, baudrate=BAUDRATE) as bus:
+        portHandler = PortHandler(bus.port_name)
+        packetHandler = sts(portHandler)
+        if not portHandler.openPort():
+            print("Failed to open the port")
+            return
+        portHandler.setRxBlocking(True)
+
+        print("%7s %8s %9s %12s %12s %10s %10s %12s" % (
+            "rate", "cycles", "overruns", "jitter p50", "jitter p99", "read p50", "write p50", "cycle p99"))
+        for rate in RATES:
+            loop = make_loop(packetHandler, rate)
+            loop.run(duration=DURATION)
+            s = loop.stats()
+            print("%5dHz %8d %9d %10.0fus %10.0fus %8.0fus %8.0fus %10.0fus" % (
+                rate, s['cycles'], s['overruns'], s['jitter']['p50_us'], s['jitter']['p99_us'],
+                s['read']['p50_us'], s['write']['p50_us'], s['cycle']['p99_us']))
+
+        portHandler.closePort()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+#
+# Time to dump registers 0-70 of a 5-servo arm: 71 ReadByte calls per
+# servo (the old mfw.py / Read_Write.py 'i' handler), one
+# sts.ReadControlTable per servo, and one sts.ReadControlTables sync read
+# for the whole bus.
+#
+
+import sys
+import time
+
+sys.path.append("..")
+from STservo_sdk import *
+from fake_bus import FakeBus
+
+MOTOR_IDS = [1, 2, 3, 4, 5]
+BAUDRATE = 1000000
+RESPONSE_DELAY = 0.0001   # seconds before each status packet
+REPEAT = 5
+
+
+def per_byte(packetHandler):
+    for sid in MOTOR_IDS:
+        for index in range(0, STS_PRESENT_CURRENT_H + 1):
+            packetHandler.ReadByte(sid, index)
+
+
+def per_servo(packetHandler):
+    for sid in MOTOR_IDS:
+        packetHandler.ReadControlTable(sid)
+
+
+def whole_bus(packetHandler):
+    packetHandler.ReadControlTables(MOTOR_IDS)
+
+
+def main():
+    with FakeBus(MOTOR_IDS, response_delay=RESPONSE_DELAY, baudrate=BAUDRATE) as bus:
+        portHandler = PortHandler(bus.port_name)
+        packetHandler = sts(portHandler)
+        if not portHandler.openPort():
+            print("Failed to open the port")
+            return
+        portHandler.setRxBlocking(True)
+
+        print("%-22s %10s" % ("method", "ms/dump"))
+        for name, fn in (("ReadByte x 71", per_byte), ("ReadControlTable", per_servo),
+                         ("ReadControlTables", whole_bus)):
+            best = None
+            for _ in range(REPEAT):
+                start = time.perf_counter()
+                fn(packetHandler)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            print("%-22s %10.2f" % (name, best * 1e3))
+
+        portHandler.closePort()
+
+
+if __name__ == "__main__":
+    main()
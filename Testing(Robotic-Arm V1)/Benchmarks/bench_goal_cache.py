@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+#
+# Loop rate for the positionController.py main loop (write 5 goals, then
+# one SyncReadState) when the joystick only moves a joint now and then.
+#
+# "every write" calls WriteSignedPosEx for all five servos each loop, as
+# the script used to. "GoalWriteCache" sends only changed goals, in one
+# sync write.
+#
+
+import sys
+import time
+
+sys.path.append("..")
+from STservo_sdk import *
+from fake_bus import FakeBus
+
+MOTOR_IDS = [1, 2, 3, 4, 5]
+BAUDRATE = 1000000
+RESPONSE_DELAY = 0.0001   # seconds before each status packet
+DURATION = 2.0            # seconds per measurement
+CHANGE_EVERY = 10         # one joint target changes every N loops
+SPEED = 1200
+ACC = 50
+
+
+def goals_at(cycle):
+    step = cycle // CHANGE_EVERY
+    return dict((sid, (step * 40) & 0x3FF if sid == 1 + step % len(MOTOR_IDS) else 0) for sid in MOTOR_IDS)
+
+
+def every_write(packetHandler, goalCache, goals):
+    for sid in MOTOR_IDS:
+        packetHandler.WriteSignedPosEx(sid, goals[sid], SPEED, ACC)
+
+
+def cached(packetHandler, goalCache, goals):
+    goalCache.writeGoals(goals, SPEED, ACC)
+
+
+def rate(packetHandler, write):
+    goalCache = GoalWriteCache(packetHandler)
+    cycles = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < DURATION:
+        write(packetHandler, goalCache, goals_at(cycles))
+        packetHandler.SyncReadState(MOTOR_IDS, ['position'])
+        cycles += 1
+    return cycles / (time.perf_counter() - start), goalCache
+
+
+def main():
+    with FakeBus(MOTOR_IDS, response_delay=RESPONSE_DELAY, baudrate=BAUDRATE) as bus:
+        portHandler = PortHandler(bus.port_name)
+        packetHandler = sts(portHandler)
+        if not portHandler.openPort():
+            print("Failed to open the port")
+            return
+        portHandler.setRxBlocking(True)
+
+        print("%-16s %10s %10s %12s %12s" % ("mode", "loop Hz", "goals", "suppressed", "packets"))
+        hz, _ = rate(packetHandler, every_write)
+        print("%-16s %10.0f" % ("every write", hz))
+        hz, goalCache = rate(packetHandler, cached)
+        print("%-16s %10.0f %10d %12d %12d" % ("GoalWriteCache", hz, goalCache.goal_count,
+                                               goalCache.suppressed_count, goalCache.packet_count))
+
+        portHandler.closePort()
+
+
+if __name__ == "__main__":
+    main()
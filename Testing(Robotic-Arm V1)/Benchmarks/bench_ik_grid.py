@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+#
+# IKGrid (Maths/ik_grid.py) lookup vs the analytic IK.
+#
+# Builds a grid for 7 orientations between -90 and 0 degrees at 0.5 cm,
+# saves it and memory-maps it back. It then solves random targets in
+# the arm's workspace box with the phis on and between the grid values,
+# and up to one grid step above and below the grid (those must take the
+# exact fallback, not extrapolate):
+# - one at a time: 3DIK.py's analytical_ik_3dof_with_base vs IKGrid.solve
+# - in one batch: batch_ik_3dof_with_base vs IKGrid.lookup
+# Accuracy is the angle error of the interpolated answers against the
+# exact ones, and the resulting end-effector position error through FK.
+#
+
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+
+sys.path.append("..")
+from Maths.batch_ik import *
+from Maths.ik_grid import IKGrid
+
+# 3DIK.py's link lengths (cm), passed explicitly to the Maths functions
+l1 = 22.85
+l2 = 22.85
+l3 = 24.25
+
+TARGETS = 20000
+PHIS = np.linspace(-np.pi / 2, 0, 7)
+RESOLUTION = 0.5
+
+
+def analytical_ik_3dof_with_base(x, y, z, phi):
+    theta0 = np.arctan2(y, x)
+    r = np.sqrt(x**2 + y**2)
+    wx = r - l3 * np.cos(phi)
+    wz = z - l3 * np.sin(phi)
+    r_sq = wx**2 + wz**2
+    cos_theta2 = (r_sq - l1**2 - l2**2) / (2 * l1 * l2)
+    if abs(cos_theta2) > 1:
+        return None
+    theta2 = np.arccos(cos_theta2)
+    k1 = l1 + l2 * np.cos(theta2)
+    k2 = l2 * np.sin(theta2)
+    theta1 = np.arctan2(wz, wx) - np.arctan2(k2, k1)
+    theta3 = phi - theta1 - theta2
+    return np.degrees([theta0, theta1, theta2, theta3])
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    start = time.perf_counter()
+    grid = IKGrid.build(PHIS, resolution=RESOLUTION, l1=l1, l2=l2, l3=l3)
+    build_s = time.perf_counter() - start
+    path = os.path.join(tempfile.mkdtemp(), "ik_grid.npy")
+    grid.save(path)
+    grid = IKGrid.load(path)
+    print("grid %s, %.1f MB, built in %.2f s, %.0f%% of cells interpolable\n" % (
+        grid.table.shape, os.path.getsize(path) / 1e6, build_s, 100 * (grid.table[..., 3] > 0).mean()))
+
+    rng = np.random.default_rng(0)
+    x = rng.uniform(-70, 70, TARGETS)
+    y = rng.uniform(-70, 70, TARGETS)
+    z = rng.uniform(-40, 70, TARGETS)
+    step = PHIS[1] - PHIS[0]
+    phi = rng.choice(np.concatenate([PHIS, rng.uniform(PHIS[0], PHIS[-1], 7),
+                                     rng.uniform(PHIS[-1], PHIS[-1] + step, 2),
+                                     rng.uniform(PHIS[0] - step, PHIS[0], 2)]), TARGETS)
+    targets = list(zip(x.tolist(), y.tolist(), z.tolist(), phi.tolist()))
+
+    single, single_s = timed(lambda: [analytical_ik_3dof_with_base(*t) for t in targets])
+    looked_up, lookup_s = timed(lambda: [grid.solve(*t) for t in targets])
+    exact, batch_s = timed(lambda: batch_ik_3dof_with_base(x, y, z, phi, l1=l1, l2=l2, l3=l3))
+    grid.lookup_count = grid.fallback_count = 0
+    (angles, reachable), grid_batch_s = timed(grid.lookup, x, y, z, phi)
+
+    print("%-34s %10s %10s" % ("method", "ms", "us/target"))
+    for name, seconds in (("analytical_ik_3dof_with_base", single_s), ("IKGrid.solve", lookup_s),
+                          ("batch_ik_3dof_with_base", batch_s), ("IKGrid.lookup", grid_batch_s)):
+        print("%-34s %10.2f %10.3f" % (name, seconds * 1e3, seconds * 1e6 / TARGETS))
+
+    exact_angles, exact_reachable = exact
+    solve_angles = np.array([a if a is not None else [np.nan] * 4 for a in looked_up])
+    print("\n%d of %d targets reachable; same mask as analytic: %s; %.0f%% of the reachable ones interpolated" % (
+        reachable.sum(), TARGETS, np.array_equal(reachable, exact_reachable),
+        100.0 * (grid.lookup_count - grid.fallback_count) / reachable.sum()))
+    print("IKGrid.solve vs IKGrid.lookup max difference: %.2e deg" % np.nanmax(np.abs(solve_angles - np.degrees(angles))))
+
+    print("\n%-22s %-10s %10s %10s %10s" % ("error", "phi", "mean", "p99", "max"))
+    in_range = (phi >= PHIS[0]) & (phi <= PHIS[-1])
+    for name, mask in (("on grid", reachable & np.isin(phi, PHIS)),
+                       ("between", reachable & in_range & ~np.isin(phi, PHIS)),
+                       ("above", reachable & (phi > PHIS[-1])), ("below", reachable & (phi < PHIS[0]))):
+        if not mask.any():
+            print("%-22s %-10s %10s" % ("angle (deg)", name, "unreachable"))
+            continue
+        error = np.abs(np.degrees(angles) - np.degrees(exact_angles))[mask]
+        fk, _ = batch_fk_3dof_with_base(angles[mask], l1, l2, l3)
+        position_error = np.linalg.norm(fk - np.stack([x, y, z], axis=-1)[mask], axis=-1)
+        print("%-22s %-10s %10.4f %10.4f %10.4f" % ("angle (deg)", name, error.mean(), np.percentile(error, 99), error.max()))
+        print("%-22s %-10s %10.4f %10.4f %10.4f" % ("position (cm)", name, position_error.mean(),
+                                                   np.percentile(position_error, 99), position_error.max()))
+
+if __name__ == "__main__":
+    main()
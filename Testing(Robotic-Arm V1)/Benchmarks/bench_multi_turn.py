@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+#
+# Multi-turn unwrapping: cost per control-loop update and torn reads.
+#
+# "dicts + state_lock" is Read_Write_Pos.py's update_rotation_from_abs67
+# called once per servo: module-level dicts, a global lock per call.
+# "dicts (positionController)" is positionController.py's turn_count /
+# prev_pos loop. "MultiTurnTracker" (Maths/multi_turn.py) unwraps the
+# whole vector in one update().
+#
+# Part 2 runs a reader thread next to the writer. The writer moves every
+# joint by the same step each update; a read is torn when the joints it
+# sees disagree, i.e. it caught the writer half way through the joints.
+# The dict reader takes state_lock per joint, as showPosition does.
+#
+
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.append("..")
+from Maths.multi_turn import MultiTurnTracker
+
+TICKS_PER_TURN = 4096
+UPDATES = 2000
+STEP = 700       # steps per update, so the raw reads wrap often
+READ_TIME = 1.0  # seconds for part 2
+
+
+class DictState(object):
+    # the Read_Write_Pos.py pattern
+    def __init__(self, ids):
+        self.lock = threading.Lock()
+        self.last = dict((sid, 0) for sid in ids)
+        self.steps = dict((sid, 0) for sid in ids)
+        self.rotation = dict((sid, 0) for sid in ids)
+
+    def update(self, sid, raw):
+        raw &= 0xFFFF
+        with self.lock:
+            prev = self.last.get(sid, raw)
+            delta = ((raw - prev + 32768) % 65536) - 32768
+            self.steps[sid] += delta
+            self.last[sid] = raw
+            self.rotation[sid] = int(self.steps[sid] // TICKS_PER_TURN)
+            return self.rotation[sid]
+
+    def read(self, sid):
+        with self.lock:
+            return self.steps[sid]
+
+
+def raw_reads(n, updates):
+    return [[(u * STEP + i) & 0xFFFF for i in range(n)] for u in range(1, updates + 1)]
+
+
+def time_dicts(ids, reads):
+    state = DictState(ids)
+    start = time.perf_counter_ns()
+    for raw in reads:
+        for sid, value in zip(ids, raw):
+            state.update(sid, value)
+    return (time.perf_counter_ns() - start) / len(reads)
+
+
+def time_position_controller(ids, reads):
+    prev_pos = dict((sid, 0) for sid in ids)
+    turn_count = dict((sid, 0) for sid in ids)
+    abs_positions = {}
+    start = time.perf_counter_ns()
+    for raw in reads:
+        for sid, value in zip(ids, raw):
+            current_pos = value % TICKS_PER_TURN
+            delta = current_pos - prev_pos[sid]
+            if delta > TICKS_PER_TURN / 2:
+                turn_count[sid] -= 1
+            elif delta < -TICKS_PER_TURN / 2:
+                turn_count[sid] += 1
+            abs_positions[sid] = current_pos + turn_count[sid] * TICKS_PER_TURN
+            prev_pos[sid] = current_pos
+    return (time.perf_counter_ns() - start) / len(reads)
+
+
+def time_tracker(ids, reads):
+    tracker = MultiTurnTracker(ids, wrap=65536)
+    tracker.reset([0] * len(ids), rotations=[0] * len(ids))
+    reads = np.asarray(reads, dtype=np.int64)
+    start = time.perf_counter_ns()
+    for raw in reads:
+        tracker.update(raw)
+    return (time.perf_counter_ns() - start) / len(reads)
+
+
+def torn_dicts(ids):
+    state = DictState(ids)
+    stop = threading.Event()
+
+    def writer():
+        u = 0
+        while not stop.is_set():
+            u += 1
+            for sid in ids:
+                state.update(sid, u * STEP)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    reads = torn = 0
+    end = time.perf_counter() + READ_TIME
+    while time.perf_counter() < end:
+        seen = [state.read(sid) for sid in ids]
+        reads += 1
+        torn += len(set(seen)) > 1
+    stop.set()
+    thread.join()
+    return reads, torn
+
+
+def torn_tracker(ids):
+    tracker = MultiTurnTracker(ids, wrap=65536)
+    tracker.reset([0] * len(ids), rotations=[0] * len(ids))
+    stop = threading.Event()
+
+    def writer():
+        u = 0
+        while not stop.is_set():
+            u += 1
+            tracker.update(np.full(len(ids), u * STEP))
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    reads = torn = 0
+    end = time.perf_counter() + READ_TIME
+    while time.perf_counter() < end:
+        steps = tracker.snapshot().steps
+        reads += 1
+        torn += bool(steps.min() != steps.max())
+    stop.set()
+    thread.join()
+    return reads, torn
+
+
+def main():
+    print("%-28s %10s %10s %10s" % ("us per update", "5 joints", "32", "256"))
+    for name, fn in (("dicts + state_lock", time_dicts), ("dicts (positionController)", time_position_controller),
+                     ("MultiTurnTracker", time_tracker)):
+        row = []
+        for n in (5, 32, 256):
+            ids = list(range(1, n + 1))
+            row.append(fn(ids, raw_reads(n, UPDATES)) / 1e3)
+        print("%-28s %10.1f %10.1f %10.1f" % ((name,) + tuple(row)))
+
+    ids = [1, 2, 3, 4, 5]
+    print("\n%-28s %10s %10s" % ("reader vs writer, 5 joints", "reads", "torn"))
+    print("%-28s %10d %10d" % (("dicts + state_lock",) + torn_dicts(ids)))
+    print("%-28s %10d %10d" % (("MultiTurnTracker.snapshot",) + torn_tracker(ids)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+#
+# Per-packet CPU and memory cost of the protocol_packet_handler hot path.
+#
+# Each transaction is run once against an in-process fake servo to record
+# its reply; the timed runs then get that reply back from a canned port,
+# so the numbers are the SDK's own packet building/parsing overhead.
+#
+
+import sys
+import time
+import tracemalloc
+from serial.serialutil import to_bytes
+
+sys.path.append("..")
+from STservo_sdk import *
+from fake_bus import FakeServoChain, LoopbackPortHandler
+
+STS_ID = 1
+SYNC_IDS = list(range(1, 21))
+ITERATIONS = 500
+
+
+class CannedPortHandler(LoopbackPortHandler):
+    def __init__(self, chain):
+        LoopbackPortHandler.__init__(self, chain)
+        self.replies = None
+        self.recorded = bytearray()
+
+    def writePort(self, packet):
+        packet = to_bytes(packet)  # same conversion pyserial's write() does
+        if self.replies is None:
+            for reply in self.chain.process(packet):
+                self.recorded.extend(reply)
+                self.rx.extend(reply)
+        else:
+            self.rx.extend(self.replies)
+        return len(packet)
+
+    def readPortInto(self, buffer):
+        # pyserial's readinto() is read() plus a copy into the buffer
+        data = self.readPort(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def cases(packetHandler):
+    groupSyncWrite = GroupSyncWrite(packetHandler, STS_ACC, 7)
+    groupSyncRead = GroupSyncRead(packetHandler, STS_PRESENT_POSITION_L, 15)
+    for sts_id in SYNC_IDS:
+        groupSyncWrite.addParam(sts_id, [50, 0, 8, 0, 0, 176, 4])
+        groupSyncRead.addParam(sts_id)
+
+    return [
+        ("readTxRx (ReadPos)", lambda: packetHandler.ReadPos(STS_ID)),
+        ("writeTxRx (WritePosEx)", lambda: packetHandler.WritePosEx(STS_ID, 2048, 1200, 50)),
+        ("writeTxOnly", lambda: packetHandler.write1ByteTxOnly(STS_ID, STS_ACC, 50)),
+        ("sync write, %d servos" % len(SYNC_IDS), groupSyncWrite.txPacket),
+        ("sync read, %d servos" % len(SYNC_IDS), groupSyncRead.txRxPacket),
+    ]
+
+
+def ns_per_call(fn, iterations, repeat=50):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for _ in range(iterations):
+            fn()
+        elapsed = (time.perf_counter_ns() - start) / iterations
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def peak_bytes(fn):
+    # transient memory allocated above the baseline during one call
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak - base
+
+
+def main():
+    chain = FakeServoChain(SYNC_IDS)
+    portHandler = CannedPortHandler(chain)
+    packetHandler = sts(portHandler)
+    portHandler.openPort()
+
+    print("%-26s %12s %14s" % ("transaction", "ns/packet", "peak bytes"))
+    for name, fn in cases(packetHandler):
+        portHandler.replies = None
+        portHandler.recorded = bytearray()
+        fn()
+        portHandler.replies = bytes(portHandler.recorded)
+        print("%-26s %12.0f %14d" % (name, ns_per_call(fn, ITERATIONS), peak_bytes(fn)))
+
+    portHandler.closePort()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+#
+# PortHandler timing: cost of the timeout check, and a simulated clock.
+#
+# Part 1 times isPacketTimeout(), which rxPacket calls on every spin.
+# "time.time float" is the old getCurrentTime/getTimeSinceStart pair:
+# a wall-clock float in ms, compared against the timeout. "monotonic_ns
+# deadline" is the current check: one integer compare against a deadline
+# computed when the timeout is set.
+#
+# Part 2 runs the same scenario on LoopbackPortHandler with a SimClock:
+# 5 servos move 3000 steps at 1000 steps/s. The host polls position and
+# MOVING with a sync read every 10 ms, and also pings a sixth ID that is
+# not on the bus, until every servo has stopped. Wire time, response
+# delays, timeouts and the host's sleeps all happen in simulated time.
+#
+
+import sys
+import time
+
+sys.path.append("..")
+from STservo_sdk import *
+from fake_bus import FakeServoChain, LoopbackPortHandler, SimClock
+
+MOTOR_IDS = [1, 2, 3, 4, 5]
+ABSENT_ID = 6
+BAUDRATE = 1000000
+RESPONSE_DELAY = 0.0001   # seconds before each status packet
+POLL_PERIOD = 0.01        # seconds
+CHECKS = 1000000
+
+
+class WallClockPortHandler(PortHandler):
+    # the timeout check as it was before monotonic_ns deadlines
+    def setPacketTimeoutMillis(self, msec):
+        self.packet_start_time = self.getCurrentTime()
+        self.packet_timeout = msec
+
+    def isPacketTimeout(self):
+        if self.getTimeSinceStart() > self.packet_timeout:
+            self.packet_timeout = 0
+            return True
+        return False
+
+    def getCurrentTime(self):
+        return round(time.time() * 1000000000) / 1000000.0
+
+    def getTimeSinceStart(self):
+        time_since = self.getCurrentTime() - self.packet_start_time
+        if time_since < 0.0:
+            self.packet_start_time = self.getCurrentTime()
+        return time_since
+
+
+def check_cost(portHandler):
+    portHandler.setPacketTimeoutMillis(60000)
+    start = time.perf_counter_ns()
+    for _ in range(CHECKS):
+        portHandler.isPacketTimeout()
+    return (time.perf_counter_ns() - start) / CHECKS
+
+
+def simulated_move():
+    clock = SimClock()
+    portHandler = LoopbackPortHandler(FakeServoChain(MOTOR_IDS, clock=clock.monotonic),
+                                      clock=clock, response_delay=RESPONSE_DELAY)
+    packetHandler = sts(portHandler)
+    portHandler.openPort()
+    portHandler.setBaudRate(BAUDRATE)
+
+    for sid in MOTOR_IDS:
+        packetHandler.WritePosEx(sid, 0, 0, 0)
+    clock.sleep(1.0)
+
+    wall_start = time.perf_counter()
+    sim_start = clock.monotonic()
+    for sid in MOTOR_IDS:
+        packetHandler.SyncWritePosEx(sid, 3000, 1000, 0)
+    packetHandler.groupSyncWrite.txPacket()
+    packetHandler.groupSyncWrite.clearParam()
+
+    polls = 0
+    timeouts = 0
+    while True:
+        clock.sleep(POLL_PERIOD)
+        states, _ = packetHandler.SyncReadState(MOTOR_IDS, ['position', 'moving'])
+        if packetHandler.ping(ABSENT_ID)[1] == COMM_RX_TIMEOUT:
+            timeouts += 1
+        polls += 1
+        if all(state is not None and not state['moving'] and state['position'] == 3000 for state in states.values()):
+            break
+    return clock.monotonic() - sim_start, time.perf_counter() - wall_start, polls, timeouts
+
+
+def main():
+    print("%-24s %12s" % ("timeout check", "ns/check"))
+    print("%-24s %12.0f" % ("time.time float", check_cost(WallClockPortHandler("none"))))
+    print("%-24s %12.0f" % ("monotonic_ns deadline", check_cost(PortHandler("none"))))
+
+    simulated, wall, polls, timeouts = simulated_move()
+    print("\n%d-servo move, %d polls, %d timeouts on ID %d" % (len(MOTOR_IDS), polls, timeouts, ABSENT_ID))
+    print("simulated %.2f s in %.3f s wall time (%.0fx real time)" % (simulated, wall, simulated / wall))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+#
+# Round trips and time for startup/diagnostic reads, direct vs RegisterMirror.
+#
+# "startup": ping + min/max angle limits + mode for 5 servos, done twice
+# (as scripts re-check settings). "dump": the 70-register dump from
+# Read_Write_Pos.py / mfw.py.
+#
+
+import sys
+import time
+
+sys.path.append("..")
+from STservo_sdk import *
+from fake_bus import FakeBus
+
+MOTOR_IDS = [1, 2, 3, 4, 5]
+BAUDRATE = 1000000
+RESPONSE_DELAY = 0.0001   # seconds before each status packet
+
+
+class Counting(object):
+    # counts INST_* round trips made through a packet handler
+    def __init__(self, packetHandler):
+        self.packetHandler = packetHandler
+        self.count = 0
+        self.txRxFrame = packetHandler.txRxFrame
+        packetHandler.txRxFrame = self._txRxFrame
+
+    def _txRxFrame(self, *args):
+        self.count += 1
+        return self.txRxFrame(*args)
+
+
+def startup_direct(packetHandler, registerMirror):
+    for _ in range(2):
+        for sid in MOTOR_IDS:
+            packetHandler.ping(sid)
+            packetHandler.read2ByteTxRx(sid, STS_MAX_ANGLE_LIMIT_L)
+            packetHandler.read2ByteTxRx(sid, STS_MIN_ANGLE_LIMIT_L)
+            packetHandler.read1ByteTxRx(sid, STS_MODE)
+
+
+def startup_mirror(packetHandler, registerMirror):
+    for _ in range(2):
+        for sid in MOTOR_IDS:
+            registerMirror.ping(sid)
+            registerMirror.read2Byte(sid, STS_MAX_ANGLE_LIMIT_L)
+            registerMirror.read2Byte(sid, STS_MIN_ANGLE_LIMIT_L)
+            registerMirror.read1Byte(sid, STS_MODE)
+
+
+def dump_direct(packetHandler, registerMirror):
+    for index in range(0, 70):
+        packetHandler.ReadByte(1, index)
+
+
+def dump_mirror(packetHandler, registerMirror):
+    registerMirror.read(1, 0, 70)
+
+
+def main():
+    with FakeBus(MOTOR_IDS, response_delay=RESPONSE_DELAY, baudrate=BAUDRATE) as bus:
+        portHandler = PortHandler(bus.port_name)
+        packetHandler = sts(portHandler)
+        if not portHandler.openPort():
+            print("Failed to open the port")
+            return
+        portHandler.setRxBlocking(True)
+        counting = Counting(packetHandler)
+
+        print("%-20s %12s %10s" % ("case", "round trips", "ms"))
+        for name, fn in (("startup, direct", startup_direct), ("startup, mirror", startup_mirror),
+                         ("dump, direct", dump_direct), ("dump, mirror", dump_mirror)):
+            registerMirror = RegisterMirror(packetHandler)
+            counting.count = 0
+            start = time.perf_counter()
+            fn(packetHandler, registerMirror)
+            print("%-20s %12d %10.2f" % (name, counting.count, (time.perf_counter() - start) * 1e3))
+
+        portHandler.closePort()
+
+
+if __name__ == "__main__":
+    main()
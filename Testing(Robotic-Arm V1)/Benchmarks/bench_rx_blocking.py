@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+#
+# CPU time per transaction: spinning vs blocking receive.
+#
+# Runs ReadPos against a pty-backed fake servo with PortHandler in its
+# default (spinning) receive mode and with setRxBlocking(True).
+#
+
+import sys
+import time
+
+sys.path.append("..")
+from STservo_sdk import *
+from fake_bus import FakeBus
+
+STS_ID = 1
+TRANSACTIONS = 2000
+RESPONSE_DELAY = 0.0005  # seconds before the fake servo answers
+
+
+def run(packetHandler, count):
+    failures = 0
+    cpu_start = time.thread_time()
+    wall_start = time.perf_counter()
+    for _ in range(count):
+        _, sts_comm_result, _ = packetHandler.ReadPos(STS_ID)
+        if sts_comm_result != COMM_SUCCESS:
+            failures += 1
+    wall = time.perf_counter() - wall_start
+    cpu = time.thread_time() - cpu_start
+    return cpu, wall, failures
+
+
+def main():
+    with FakeBus([STS_ID], response_delay=RESPONSE_DELAY) as bus:
+        portHandler = PortHandler(bus.port_name)
+        packetHandler = sts(portHandler)
+        if not portHandler.openPort():
+            print("Failed to open the port")
+            return
+
+        print("%-10s %14s %14s %10s" % ("mode", "cpu us/txn", "wall us/txn", "failures"))
+        for mode, blocking in (("spinning", False), ("blocking", True)):
+            portHandler.setRxBlocking(blocking)
+            run(packetHandler, 100)  # warm up
+            cpu, wall, failures = run(packetHandler, TRANSACTIONS)
+            print("%-10s %14.1f %14.1f %10d" % (mode, cpu * 1e6 / TRANSACTIONS,
+                                                wall * 1e6 / TRANSACTIONS, failures))
+
+        portHandler.closePort()
+
+
+if __name__ == "__main__":
+    main()
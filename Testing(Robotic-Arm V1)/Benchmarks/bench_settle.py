@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+#
+# Homing wait: how long after the slowest joint arrives the host notices.
+#
+# 5 simulated servos (LoopbackPortHandler on a SimClock) start 200-4000
+# steps from 0 and are sent to 0 at speed 1200 / ACC 50, as in the
+# zeroing routine of positionController.py, 3DIK.py and 2DIK.py.
+#
+# "sleep(1) + ReadMoving" is the old routine: a fixed 1 s sleep, then
+# ReadMoving servo by servo, stopping at the first moving one, with 50 ms
+# between passes. "AwaitSettled" is one sync read of position, speed and
+# MOVING per poll at the adaptive period, done when every joint is within
+# 10 steps of 0.
+#
+# "sequential goto_zero" is the old Read_Write_Pos.py goto_zero: move one
+# servo, poll its MOVING flag every 50 ms until it stops, then the next.
+# "concurrent goto_zero" starts every move, then waits with SettleMonitor.
+#
+# "late" is the time from the last joint reaching 0 to the routine
+# returning; "packets" counts instructions sent while waiting.
+#
+
+import sys
+
+sys.path.append("..")
+from STservo_sdk import *
+from fake_bus import FakeServoChain, LoopbackPortHandler, SimClock
+
+MOTOR_IDS = [1, 2, 3, 4, 5]
+STARTS = {1: 200, 2: 900, 3: 1800, 4: 3000, 5: 4000}
+BAUDRATE = 1000000
+RESPONSE_DELAY = 0.0001
+SPEED = 1200
+ACC = 50
+RUNS = 5
+
+
+def setup(starts):
+    clock = SimClock()
+    chain = FakeServoChain(MOTOR_IDS, clock=clock.monotonic)
+    portHandler = LoopbackPortHandler(chain, clock=clock, response_delay=RESPONSE_DELAY)
+    portHandler.openPort()
+    portHandler.setBaudRate(BAUDRATE)
+    for sts_id in MOTOR_IDS:
+        chain.servo(sts_id).setPosition(starts[sts_id])
+    return clock, chain, sts(portHandler)
+
+
+def stepped_sleep(chain, clock):
+    # clock.sleep that steps the servos every 1 ms and notes when each first stops at 0
+    arrived = {}
+
+    def sleep(seconds):
+        end = clock.now_ns + int(seconds * 1e9)
+        while clock.now_ns < end:
+            clock.advanceTo(min(end, clock.now_ns + 1000000))
+            for sts_id in MOTOR_IDS:
+                servo = chain.servo(sts_id)
+                servo.update()
+                if sts_id not in arrived and servo.position == 0.0 and servo.velocity == 0.0:
+                    arrived[sts_id] = clock.monotonic()
+    return sleep, arrived
+
+
+def old_zeroing(sleep, packetHandler):
+    for sts_id in MOTOR_IDS:
+        packetHandler.WriteSignedPosEx(sts_id, 0, SPEED, ACC)
+    sleep(1)
+    all_stopped = False
+    while not all_stopped:
+        all_stopped = True
+        for sts_id in MOTOR_IDS:
+            moving, _, _ = packetHandler.ReadMoving(sts_id)
+            if moving != 0:
+                all_stopped = False
+                break
+        sleep(0.05)
+
+
+def new_zeroing(sleep, packetHandler):
+    for sts_id in MOTOR_IDS:
+        packetHandler.WriteSignedPosEx(sts_id, 0, SPEED, ACC)
+    settled, _ = packetHandler.AwaitSettled(MOTOR_IDS, goals=dict.fromkeys(MOTOR_IDS, 0), wrap=4096,
+                                            timeout=30.0, sleep=sleep)
+    assert settled
+
+
+def sequential_goto_zero(sleep, packetHandler):
+    for sts_id in MOTOR_IDS:
+        packetHandler.WritePosEx(sts_id, 0, SPEED, ACC)
+        while True:
+            moving, _, _ = packetHandler.ReadMoving(sts_id)
+            if moving == 0:
+                break
+            sleep(0.05)
+
+
+def concurrent_goto_zero(sleep, packetHandler):
+    for sts_id in MOTOR_IDS:
+        packetHandler.WritePosEx(sts_id, 0, SPEED, ACC)
+    monitor = SettleMonitor(MOTOR_IDS)
+    while True:
+        states, _ = packetHandler.SyncReadState(MOTOR_IDS, SETTLE_FIELDS)
+        if monitor.update(states):
+            break
+        sleep(monitor.period)
+
+
+def measure(routine, scale):
+    starts = dict((sts_id, int(position * scale)) for sts_id, position in STARTS.items())
+    clock, chain, packetHandler = setup(starts)
+    sleep, arrived = stepped_sleep(chain, clock)
+    start = clock.monotonic()
+    packets = chain.rx_count
+    routine(sleep, packetHandler)
+    done = clock.monotonic() - start
+    for sts_id in MOTOR_IDS:
+        arrived.setdefault(sts_id, clock.monotonic())  # stopped during the last read
+    last = max(arrived.values()) - start
+    return done, last, chain.rx_count - packets - len(MOTOR_IDS)
+
+
+def main():
+    print("%-24s %10s %10s %10s %10s" % ("routine", "distance", "done s", "late ms", "packets"))
+    for name, routine in (("sleep(1) + ReadMoving", old_zeroing), ("AwaitSettled", new_zeroing),
+                          ("sequential goto_zero", sequential_goto_zero), ("concurrent goto_zero", concurrent_goto_zero)):
+        for scale in (0.1, 1.0):
+            done = last = packets = 0.0
+            for run in range(RUNS):
+                d, l, p = measure(routine, scale * (1.0 + 0.05 * run))
+                done += d / RUNS
+                last += l / RUNS
+                packets += p / RUNS
+            print("%-24s %10d %10.3f %10.1f %10.0f" % (name, max(STARTS.values()) * scale, done, (done - last) * 1e3, packets))
+
+
+if __name__ == "__main__":
+    main()
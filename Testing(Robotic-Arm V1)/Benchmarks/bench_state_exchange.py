@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+#
+# Joint state from the bus thread to many readers: writer stalls and
+# reader throughput, lock versus StateExchange.
+#
+# One writer stands in for the bus thread: 1 ms of (sleeping) bus time
+# per poll, then it publishes the 5 joints' StsTelemetry. N reader
+# threads read all joints in a loop, as show_all_positions and a
+# controller would.
+#
+# "state_lock" is the Read_Write_Pos.py pattern: a dict of states behind
+# one lock, taken by the writer to store a poll and by readers to copy it.
+# One extra reader mimics dump_registers, which held the lock for a 5 ms
+# bus read every 50 ms. "StateExchange" publishes into a double buffer
+# (STservo_sdk/state_exchange.py); readers take no lock, and the slow
+# reader's 5 ms does not touch the writer.
+#
+# "publish us" is the time from the writer finishing its bus read to the
+# poll being visible to readers (p50 / p99 / max). A read is torn when
+# its joints come from different polls (every field of poll k is k).
+#
+
+import sys
+import threading
+import time
+
+sys.path.append("..")
+from STservo_sdk import *
+
+MOTOR_IDS = [1, 2, 3, 4, 5]
+BUS_TIME = 0.001   # seconds of bus I/O per poll
+READ_PERIOD = 0.0002  # seconds each reader sleeps between reads
+SLOW_HOLD = 0.005  # dump_registers: seconds holding the lock ...
+SLOW_EVERY = 0.05  # ... every this many seconds
+DURATION = 1.0     # seconds per run
+
+
+def poll(k):
+    return dict((sid, StsTelemetry(*([k] * len(StsTelemetry._fields)))) for sid in MOTOR_IDS)
+
+
+class LockedState(object):
+    # the Read_Write_Pos.py pattern
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.states = {}
+
+    def publish(self, states):
+        with self.lock:
+            for sid, state in states.items():
+                self.states[sid] = state
+
+    def read(self):
+        with self.lock:
+            return [self.states[sid].position for sid in MOTOR_IDS]
+
+    def slow(self):
+        with self.lock:
+            time.sleep(SLOW_HOLD)
+
+
+class ExchangeState(object):
+    def __init__(self):
+        self.exchange = StateExchange(MOTOR_IDS)
+
+    def publish(self, states):
+        self.exchange.publish(states)
+
+    def read(self):
+        snapshot = self.exchange.read()
+        return [snapshot.get(sid, 'position') for sid in MOTOR_IDS]
+
+    def slow(self):
+        time.sleep(SLOW_HOLD)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def run(state, readers, slow):
+    state.publish(poll(0))
+    polls = [poll(k) for k in range(1, 10000)]
+    stop = threading.Event()
+    latencies = []
+    counts = [0] * readers
+    torn = [0] * readers
+
+    def writer():
+        for states in polls:
+            if stop.is_set():
+                break
+            time.sleep(BUS_TIME)
+            start = time.perf_counter_ns()
+            state.publish(states)
+            latencies.append(time.perf_counter_ns() - start)
+
+    def reader(r):
+        while not stop.is_set():
+            seen = state.read()
+            counts[r] += 1
+            torn[r] += min(seen) != max(seen)
+            time.sleep(READ_PERIOD)
+
+    def slow_reader():
+        while not stop.is_set():
+            state.slow()
+            time.sleep(SLOW_EVERY - SLOW_HOLD)
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader, args=(r,)) for r in range(readers)]
+    if slow:
+        threads.append(threading.Thread(target=slow_reader))
+    for thread in threads:
+        thread.start()
+    time.sleep(DURATION)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return (len(latencies), percentile(latencies, 0.5) / 1e3, percentile(latencies, 0.99) / 1e3,
+            max(latencies) / 1e3, sum(counts) / DURATION, sum(torn))
+
+
+def main():
+    print("%-16s %8s %5s %8s %9s %9s %9s %11s %6s" % ("state", "readers", "slow", "polls", "p50 us", "p99 us",
+                                                      "max us", "reads/s", "torn"))
+    for slow in (False, True):
+        for readers in (1, 4, 8):
+            for name, cls in (("state_lock", LockedState), ("StateExchange", ExchangeState)):
+                row = run(cls(), readers, slow)
+                print("%-16s %8d %5s %8d %9.1f %9.1f %9.1f %11.0f %6d" % ((name, readers, "yes" if slow else "no") + row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+#
+# Bus-level benchmark suite for the STservo_sdk transaction paths.
+#
+# For each baud rate, every single-servo transaction (ping, read1/2/4Byte,
+# WritePosEx, RegWritePosEx + RegAction) and the group transactions
+# (GroupSyncWrite.txPacket, GroupSyncRead.txRxPacket) for each servo count
+# are run against the fake bus. Each one reports transactions/s, p50/p99
+# latency and CPU time per transaction of the calling thread.
+# The "loopback" transport repeats them in-process with no OS I/O or wire
+# time, which leaves the SDK's own Python overhead.
+#
+#   python bench_suite.py
+#   python bench_suite.py --out results.json
+#   python bench_suite.py --out new.json --compare results.json
+#
+# Results are only printed unless --out names a JSON file to write.
+# With --compare, any case whose txn/s dropped by more than --threshold
+# against the baseline is listed and the exit status is 1.
+#
+
+import sys
+import json
+import time
+import argparse
+import platform
+
+sys.path.append("..")
+from STservo_sdk import *
+from fake_bus import FakeBus, FakeServoChain, LoopbackPortHandler
+
+RESPONSE_DELAY = 0.0001   # seconds before each status packet
+STS_ID = 1
+GOAL_LENGTH = 7           # STS_ACC..goal speed, as WritePosEx
+# servos per sync write packet: 8 bytes of header, instruction, address,
+# length and checksum, then ID + goal per servo
+SYNC_WRITE_MAX_IDS = (TXPACKET_MAX_LEN - 8) // (1 + GOAL_LENGTH)
+
+
+def single_cases(packetHandler):
+    # name -> callable returning the comm result
+    def reg_write_action():
+        result = packetHandler.RegWritePosEx(STS_ID, 1000, 0, 0)[0]
+        return packetHandler.RegAction() if result == COMM_SUCCESS else result
+
+    return [
+        ("ping", lambda: packetHandler.ping(STS_ID)[1]),
+        ("read1ByteTxRx", lambda: packetHandler.read1ByteTxRx(STS_ID, STS_PRESENT_VOLTAGE)[1]),
+        ("read2ByteTxRx", lambda: packetHandler.read2ByteTxRx(STS_ID, STS_PRESENT_POSITION_L)[1]),
+        ("read4ByteTxRx", lambda: packetHandler.read4ByteTxRx(STS_ID, STS_PRESENT_POSITION_L)[1]),
+        ("WritePosEx", lambda: packetHandler.WritePosEx(STS_ID, 1000, 0, 0)[0]),
+        ("RegWritePosEx+RegAction", reg_write_action),
+    ]
+
+
+def group_cases(packetHandler, ids):
+    # More servos than fit in one sync write packet are split over several;
+    # one transaction is then all of them, and the op name gives the count.
+    groupSyncWrites = []
+    for start in range(0, len(ids), SYNC_WRITE_MAX_IDS):
+        groupSyncWrite = GroupSyncWrite(packetHandler, STS_ACC, GOAL_LENGTH)
+        for sid in ids[start:start + SYNC_WRITE_MAX_IDS]:
+            groupSyncWrite.addParam(sid, [0, 0xE8, 0x03, 0, 0, 0, 0])
+        groupSyncWrites.append(groupSyncWrite)
+    groupSyncRead = GroupSyncRead(packetHandler, STS_PRESENT_POSITION_L, 4)
+    for sid in ids:
+        groupSyncRead.addParam(sid)
+
+    def sync_write():
+        for groupSyncWrite in groupSyncWrites:
+            result = groupSyncWrite.txPacket()
+            if result != COMM_SUCCESS:
+                return result
+        return COMM_SUCCESS
+
+    name = "GroupSyncWrite.txPacket"
+    if len(groupSyncWrites) > 1:
+        name += " x%d" % len(groupSyncWrites)
+    return [
+        (name, sync_write),
+        ("GroupSyncRead.txRxPacket", groupSyncRead.txRxPacket),
+    ]
+
+
+def percentile(sorted_samples, p):
+    return sorted_samples[min(len(sorted_samples) - 1, int(len(sorted_samples) * p / 100.0))]
+
+
+def measure(fn, duration):
+    latencies = []
+    errors = 0
+    cpu = time.thread_time_ns()
+    start = time.perf_counter_ns()
+    end = start + int(duration * 1e9)
+    now = start
+    while now < end:
+        result = fn()
+        t = time.perf_counter_ns()
+        latencies.append(t - now)
+        if result != COMM_SUCCESS:
+            errors += 1
+        now = t
+    cpu = time.thread_time_ns() - cpu
+    elapsed = now - start
+
+    latencies.sort()
+    return {
+        'txn': len(latencies),
+        'errors': errors,
+        'txn_per_s': len(latencies) * 1e9 / elapsed,
+        'p50_us': percentile(latencies, 50) / 1e3,
+        'p99_us': percentile(latencies, 99) / 1e3,
+        'cpu_us': cpu / 1e3 / len(latencies),
+    }
+
+
+def run_cases(packetHandler, transport, baud, servo_counts, duration, results):
+    cases = [(1, name, fn) for name, fn in single_cases(packetHandler)]
+    for n in servo_counts:
+        cases += [(n, name, fn) for name, fn in group_cases(packetHandler, list(range(1, n + 1)))]
+
+    for servos, name, fn in cases:
+        fn()  # warm up
+        row = dict(transport=transport, baud=baud, servos=servos, op=name)
+        row.update(measure(fn, duration))
+        if row['errors'] == row['txn']:
+            # only the error path was timed, not a throughput
+            print("%-9s %8d %7d %-26s skipped, every transaction failed" % (transport, baud, servos, name))
+            continue
+        results.append(row)
+        print("%-9s %8d %7d %-26s %10.0f %9.0f %9.0f %9.1f %7d" % (
+            transport, baud, servos, name, row['txn_per_s'], row['p50_us'], row['p99_us'], row['cpu_us'], row['errors']))
+
+
+def compare(results, baseline_path, threshold):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    key = lambda row: (row['transport'], row['baud'], row['servos'], row['op'])
+    before = dict((key(row), row) for row in baseline['results'])
+
+    regressions = []
+    for row in results:
+        old = before.get(key(row))
+        if old and row['txn_per_s'] < old['txn_per_s'] * (1.0 - threshold):
+            regressions.append((row, old))
+
+    print("\n%d regression(s) over %.0f%% against %s" % (len(regressions), threshold * 100, baseline_path))
+    for row, old in regressions:
+        print("  %-9s %8d %7d %-26s %10.0f -> %.0f txn/s" % (
+            row['transport'], row['baud'], row['servos'], row['op'], old['txn_per_s'], row['txn_per_s']))
+    return not regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="STservo_sdk bus benchmark suite")
+    parser.add_argument("--bauds", type=int, nargs="+", default=[1000000, 500000, 115200])
+    parser.add_argument("--servos", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=0.3, help="seconds per case")
+    parser.add_argument("--out", help="JSON file to write the results to")
+    parser.add_argument("--compare", help="baseline JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed txn/s drop vs the baseline")
+    args = parser.parse_args()
+
+    ids = list(range(1, max(args.servos) + 1))
+    results = []
+    print("%-9s %8s %7s %-26s %10s %9s %9s %9s %7s" % (
+        "transport", "baud", "servos", "op", "txn/s", "p50 us", "p99 us", "CPU us", "errors"))
+
+    for baud in args.bauds:
+        if PortHandler("").getCFlagBaud(baud) <= 0:
+            print("Skipping unsupported baud rate %d" % baud)
+            continue
+        with FakeBus(ids, response_delay=RESPONSE_DELAY, baudrate=baud) as bus:
+            portHandler = PortHandler(bus.port_name)
+            packetHandler = sts(portHandler)
+            if not portHandler.openPort() or not portHandler.setBaudRate(baud):
+                print("Failed to open the port")
+                return 1
+            portHandler.setRxBlocking(True)
+            run_cases(packetHandler, "pty", baud, args.servos, args.duration, results)
+            portHandler.closePort()
+
+    portHandler = LoopbackPortHandler(FakeServoChain(ids))
+    packetHandler = sts(portHandler)
+    portHandler.openPort()
+    run_cases(packetHandler, "loopback", portHandler.getBaudRate(), args.servos, args.duration, results)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({'python': platform.python_version(), 'platform': platform.platform(),
+                       'time': time.strftime("%Y-%m-%dT%H:%M:%S"), 'duration': args.duration,
+                       'results': results}, f, indent=1)
+        print("\nWrote %d results to %s" % (len(results), args.out))
+
+    if args.compare:
+        return 0 if compare(results, args.compare, args.threshold) else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
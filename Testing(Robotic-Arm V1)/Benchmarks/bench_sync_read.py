@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+#
+# Full-state read rate for N servos: per-servo polling vs SyncReadState.
+#
+# "polling" reads position/speed, load, voltage/temperature, moving and
+# current one register group at a time per servo, as the scripts do today.
+# "sync read" fetches the same fields for every servo with one
+# INST_SYNC_READ.
+#
+
+import sys
+import time
+
+sys.path.append("..")
+from STservo_sdk import *
+from fake_bus import FakeBus
+
+SERVO_COUNTS = [1, 5, 10, 20]
+DURATION = 1.0            # seconds per measurement
+RESPONSE_DELAY = 0.0001   # seconds before each status packet
+
+
+def poll_state(packetHandler, sts_ids):
+    for sts_id in sts_ids:
+        packetHandler.ReadPosSpeed(sts_id)
+        packetHandler.read2ByteTxRx(sts_id, STS_PRESENT_LOAD_L)
+        packetHandler.read2ByteTxRx(sts_id, STS_PRESENT_VOLTAGE)
+        packetHandler.ReadMoving(sts_id)
+        packetHandler.read2ByteTxRx(sts_id, STS_PRESENT_CURRENT_L)
+
+
+def sync_state(packetHandler, sts_ids):
+    states, sts_comm_result = packetHandler.SyncReadState(sts_ids)
+    if sts_comm_result != COMM_SUCCESS or None in states.values():
+        raise RuntimeError(packetHandler.getTxRxResult(sts_comm_result))
+
+
+def rate(fn, packetHandler, sts_ids):
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < DURATION:
+        fn(packetHandler, sts_ids)
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    print("%8s %14s %14s %8s" % ("servos", "polling Hz", "sync read Hz", "speedup"))
+    for n in SERVO_COUNTS:
+        sts_ids = list(range(1, n + 1))
+        with FakeBus(sts_ids, response_delay=RESPONSE_DELAY) as bus:
+            portHandler = PortHandler(bus.port_name)
+            packetHandler = sts(portHandler)
+            if not portHandler.openPort():
+                print("Failed to open the port")
+                return
+            portHandler.setRxBlocking(True)
+
+            poll_hz = rate(poll_state, packetHandler, sts_ids)
+            sync_hz = rate(sync_state, packetHandler, sts_ids)
+            print("%8d %14.1f %14.1f %7.1fx" % (n, poll_hz, sync_hz, sync_hz / poll_hz))
+
+            portHandler.closePort()
+
+
+if __name__ == "__main__":
+    main()
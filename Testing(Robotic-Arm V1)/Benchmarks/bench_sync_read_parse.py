@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+#
+# Decode time for GroupSyncRead responses of 1, 5, 20 and 50 servos.
+#
+# "rescan" is the previous GroupSyncRead.readRx, which searched the whole
+# buffer from index 0 for each ID. "single pass" is the current
+# GroupSyncRead.readRx. No port is opened; the responses are built here.
+#
+
+import sys
+import timeit
+
+sys.path.append("..")
+from STservo_sdk import *
+
+SERVO_COUNTS = [1, 5, 20, 50]
+DATA_LENGTH = 15  # STS_PRESENT_POSITION_L .. STS_PRESENT_CURRENT_H
+
+
+def build_response(sts_ids, data_length):
+    rxpacket = []
+    for sts_id in sts_ids:
+        packet = [0xFF, 0xFF, sts_id, data_length + 2, 0] + [(sts_id + i) & 0xFF for i in range(data_length)]
+        packet.append(~sum(packet[2:]) & 0xFF)
+        rxpacket.extend(packet)
+    return rxpacket
+
+
+def rescan_readRx(rxpacket, sts_id, data_length):
+    data = []
+    rx_length = len(rxpacket)
+    rx_index = 0
+    while (rx_index+6+data_length) <= rx_length:
+        headpacket = [0x00, 0x00, 0x00]
+        while rx_index < rx_length:
+            headpacket[2] = headpacket[1]
+            headpacket[1] = headpacket[0]
+            headpacket[0] = rxpacket[rx_index]
+            rx_index += 1
+            if (headpacket[2] == 0xFF) and (headpacket[1] == 0xFF) and headpacket[0] == sts_id:
+                break
+        if (rx_index+3+data_length) > rx_length:
+            break
+        if rxpacket[rx_index] != (data_length+2):
+            rx_index += 1
+            continue
+        rx_index += 1
+        Error = rxpacket[rx_index]
+        rx_index += 1
+        calSum = sts_id + (data_length+2) + Error
+        data = [Error]
+        data.extend(rxpacket[rx_index : rx_index+data_length])
+        for i in range(0, data_length):
+            calSum += rxpacket[rx_index]
+            rx_index += 1
+        calSum = ~calSum & 0xFF
+        if calSum != rxpacket[rx_index]:
+            return None, COMM_RX_CORRUPT
+        return data, COMM_SUCCESS
+    return None, COMM_RX_CORRUPT
+
+
+def rescan(groupSyncRead, rxpacket):
+    for sts_id in groupSyncRead.data_dict:
+        groupSyncRead.data_dict[sts_id], _ = rescan_readRx(rxpacket, sts_id, groupSyncRead.data_length)
+
+
+def single_pass(groupSyncRead, rxpacket):
+    groupSyncRead.readRx(rxpacket)
+
+
+def main():
+    print("%8s %14s %14s %8s" % ("servos", "rescan us", "single us", "speedup"))
+    for n in SERVO_COUNTS:
+        sts_ids = list(range(1, n + 1))
+        groupSyncRead = GroupSyncRead(None, STS_PRESENT_POSITION_L, DATA_LENGTH)
+        for sts_id in sts_ids:
+            groupSyncRead.addParam(sts_id)
+        rxpacket = build_response(sts_ids, DATA_LENGTH)
+
+        single_pass(groupSyncRead, rxpacket)
+        if not all(groupSyncRead.getRxResult(sts_id) == COMM_SUCCESS for sts_id in sts_ids):
+            raise RuntimeError("single pass decode failed")
+
+        number = max(10, 2000 // n)
+        t_rescan = min(timeit.repeat(lambda: rescan(groupSyncRead, rxpacket), number=number, repeat=5)) / number
+        t_single = min(timeit.repeat(lambda: single_pass(groupSyncRead, rxpacket), number=number, repeat=5)) / number
+        print("%8d %14.1f %14.1f %7.1fx" % (n, t_rescan * 1e6, t_single * 1e6, t_rescan / t_single))
+
+
+if __name__ == "__main__":
+    main()
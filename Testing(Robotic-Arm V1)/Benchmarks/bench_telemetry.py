@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+#
+# Round trips and wall time per telemetry sample (position, speed, ACC,
+# current and register 67) for one servo and for 5 servos.
+#
+# "separate reads" is today's pattern: ReadPosSpeed + ReadByte(STS_ACC) +
+# Read2Byte(current) (the old ReadPosSpeedAccCurrent) + Read2Byte(67)
+# (mfw.py's showPosition). "ReadTelemetry" reads 41-70 in one packet;
+# "SyncReadTelemetry" does the same for every servo in one sync read.
+#
+
+import sys
+import time
+
+sys.path.append("..")
+from STservo_sdk import *
+from fake_bus import FakeBus
+
+MOTOR_IDS = [1, 2, 3, 4, 5]
+BAUDRATE = 1000000
+RESPONSE_DELAY = 0.0001   # seconds before each status packet
+DURATION = 1.0            # seconds per measurement
+
+
+def separate(packetHandler, ids):
+    for sid in ids:
+        packetHandler.ReadPosSpeed(sid)
+        packetHandler.ReadByte(sid, STS_ACC)
+        packetHandler.Read2Byte(sid, STS_PRESENT_CURRENT_L)
+        packetHandler.Read2Byte(sid, STS_MULTI_TURN_L)
+    return 4 * len(ids)
+
+
+def fused(packetHandler, ids):
+    for sid in ids:
+        packetHandler.ReadTelemetry(sid, with_acc=True)
+    return len(ids)
+
+
+def fused_sync(packetHandler, ids):
+    packetHandler.SyncReadTelemetry(ids, with_acc=True)
+    return 1
+
+
+def measure(packetHandler, fn, ids):
+    samples = 0
+    round_trips = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < DURATION:
+        round_trips += fn(packetHandler, ids)
+        samples += 1
+    return round_trips / samples, (time.perf_counter() - start) / samples
+
+
+def main():
+    with FakeBus(MOTOR_IDS, response_delay=RESPONSE_DELAY, baudrate=BAUDRATE) as bus:
+        portHandler = PortHandler(bus.port_name)
+        packetHandler = sts(portHandler)
+        if not portHandler.openPort():
+            print("Failed to open the port")
+            return
+        portHandler.setRxBlocking(True)
+
+        print("%-20s %7s %18s %14s" % ("method", "servos", "round trips/sample", "us/sample"))
+        for ids in ([1], MOTOR_IDS):
+            for name, fn in (("separate reads", separate), ("ReadTelemetry", fused),
+                             ("SyncReadTelemetry", fused_sync)):
+                round_trips, seconds = measure(packetHandler, fn, ids)
+                print("%-20s %7d %18.0f %14.0f" % (name, len(ids), round_trips, seconds * 1e6))
+
+        portHandler.closePort()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+#
+# Accuracy logging over a long session: cost per logged sample and memory.
+#
+# "lists" is the old positionController.py logging: per-joint Python
+# lists of target, actual and error angle plus velocity and acceleration
+# worked out in the loop for every sample. "TelemetryRecorder"
+# (Maths/telemetry.py) writes one row of a preallocated ring buffer per
+# sample; "+ spill" also saves every 1024 samples to a .npy file in a
+# temporary directory.
+#
+# 5 joints, SAMPLES samples (about 14 h at the 0.1 s log interval). "us
+# first/last" is the mean cost per sample over the first and last 10000
+# samples; "p99"/"max" are over all samples (spills included). "MB" is
+# the memory held at the end (tracemalloc, in a second run so it does
+# not slow the timed one). The last part times velocity
+# and acceleration worked out on demand.
+#
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.append("..")
+from Maths.telemetry import TelemetryRecorder
+
+MOTOR_IDS = [1, 2, 3, 4, 5]
+SAMPLES = 500000
+WINDOW = 10000
+DT = 0.1
+
+
+def angles(k):
+    return np.sin(k * DT * np.array([0.1, 0.2, 0.3, 0.4, 0.5])) * 90.0
+
+
+class ListLog(object):
+    # the old positionController.py logging
+    def __init__(self):
+        self.time_log = []
+        self.target_angle_log = {sid: [] for sid in MOTOR_IDS}
+        self.actual_angle_log = {sid: [] for sid in MOTOR_IDS}
+        self.error_angle_log = {sid: [] for sid in MOTOR_IDS}
+        self.velocity_log = {sid: [] for sid in MOTOR_IDS}
+        self.acceleration_log = {sid: [] for sid in MOTOR_IDS}
+
+    def append(self, now, target_angle, actual_angles):
+        abs_angle_positions = dict(zip(MOTOR_IDS, actual_angles.tolist()))
+        time_log = self.time_log
+        time_log.append(now)
+        for i, sid in enumerate(MOTOR_IDS):
+            tgt_angle = target_angle[i]
+            act_angle = abs_angle_positions[sid]
+            self.target_angle_log[sid].append(tgt_angle)
+            self.actual_angle_log[sid].append(act_angle)
+            self.error_angle_log[sid].append(tgt_angle - act_angle)
+        for sid in MOTOR_IDS:
+            angle_list = self.actual_angle_log[sid]
+            if len(time_log) >= 2:
+                velocity = (angle_list[-1] - angle_list[-2]) / (time_log[-1] - time_log[-2])
+            else:
+                velocity = 0.0
+            self.velocity_log[sid].append(velocity)
+            if len(time_log) >= 3:
+                acceleration = (self.velocity_log[sid][-1] - self.velocity_log[sid][-2]) / (time_log[-2] - time_log[-3])
+            else:
+                acceleration = 0.0
+            self.acceleration_log[sid].append(acceleration)
+
+
+class RecorderLog(object):
+    def __init__(self, spill_dir=None):
+        self.telemetry = TelemetryRecorder(MOTOR_IDS, ['target', 'actual', 'error'], spill_dir=spill_dir)
+
+    def append(self, now, target_angle, actual_angles):
+        target_angles = np.array(target_angle, dtype=float)
+        self.telemetry.append(now, target=target_angles, actual=actual_angles, error=target_angles - actual_angles)
+
+
+def run(make, trace=False):
+    samples = [angles(k) for k in range(0, SAMPLES, 997)]  # a few distinct readings, reused
+    target = [10.0, 20.0, 30.0, 40.0, 50.0]
+    if trace:
+        tracemalloc.start()
+    log = make()
+    costs = np.empty(SAMPLES)
+    for k in range(SAMPLES):
+        actual = samples[k % len(samples)]
+        start = time.perf_counter_ns()
+        log.append(k * DT, target, actual)
+        costs[k] = time.perf_counter_ns() - start
+    if trace:
+        held = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return held / 1e6, log
+    costs /= 1e3
+    return (costs[:WINDOW].mean(), costs[-WINDOW:].mean(), np.percentile(costs, 99), costs.max()), log
+
+
+def main():
+    spill_dir = tempfile.mkdtemp()
+    try:
+        print("%-24s %9s %9s %9s %9s %9s" % ("log", "us first", "us last", "p99 us", "max us", "MB"))
+        for name, make in (("lists", ListLog), ("TelemetryRecorder", RecorderLog),
+                           ("TelemetryRecorder+spill", lambda: RecorderLog(spill_dir))):
+            row, log = run(make)
+            held, _ = run(make, trace=True)
+            print("%-24s %9.2f %9.2f %9.2f %9.1f %9.1f" % ((name,) + row + (held,)))
+
+        telemetry = log.telemetry
+        telemetry.flush()
+        print("\nspilled %d files, %.1f MB" % (len(telemetry.files), sum(os.path.getsize(p) for p in telemetry.files) / 1e6))
+        for label, history in (("window (%d samples)" % telemetry.capacity, False), ("history (%d samples)" % SAMPLES, True)):
+            start = time.perf_counter()
+            telemetry.velocity('actual', history=history)
+            telemetry.acceleration('actual', history=history)
+            print("velocity + acceleration, %-28s %8.1f ms" % (label, (time.perf_counter() - start) * 1e3))
+    finally:
+        shutil.rmtree(spill_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+#
+# Trajectory streaming: planning time, cost per control tick, and how the
+# simulated servos follow.
+#
+# Part 1 plans a 5-joint move (every joint to the middle of its range,
+# up to about 2000 steps away) at 100 Hz with each profile.
+#
+# Part 2 times one control tick, SDK only (the port drops what is
+# written): "evaluate + addParam" computes each joint's setpoint from the
+# profile and builds the sync write with GroupSyncWrite.addParam,
+# "precomputed + addParam" reads the setpoints from the sampled arrays,
+# "TrajectoryPlayer.write" sends the prebuilt param block of the tick.
+#
+# Part 3 streams the move to a simulated chain (LoopbackPortHandler on a
+# SimClock) and compares it with one WriteSignedPosEx per servo at speed
+# 3400 / ACC 50: time until every servo is at its goal, spread of the
+# arrival times, and the largest gap between setpoint and servo.
+#
+
+import sys
+import time
+
+sys.path.append("..")
+from STservo_sdk import *
+from STservo_sdk.trajectory import _scurveAt
+from fake_bus import FakeServoChain, LoopbackPortHandler, SimClock
+
+MOTOR_IDS = [1, 2, 3, 4, 5]
+STARTS = {1: 300, 2: 3500, 3: 4000, 4: 1200, 5: 2600}
+GOALS = {1: 2048, 2: 2048, 3: 2048, 4: 2048, 5: 2048}
+RATE_HZ = 100
+BAUDRATE = 1000000
+RESPONSE_DELAY = 0.0001
+TICKS = 20000
+PROFILES = [("trapezoid", TRAJ_TRAPEZOID), ("s-curve", TRAJ_SCURVE), ("quintic", TRAJ_QUINTIC)]
+
+
+def plan_time(profile, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        trajectory = Trajectory(STARTS, GOALS, RATE_HZ, profile)
+    return (time.perf_counter() - start) / repeat, trajectory
+
+
+class NullPortHandler(LoopbackPortHandler):
+    # sync writes get no reply, so nothing needs to see the packet
+    def writePort(self, packet):
+        return len(packet)
+
+
+def null_port():
+    portHandler = NullPortHandler(FakeServoChain(MOTOR_IDS))
+    portHandler.openPort()
+    portHandler.setBaudRate(BAUDRATE)
+    return sts(portHandler)
+
+
+def tick_evaluate(trajectory):
+    groupSyncWrite = GroupSyncWrite(null_port(), STS_ACC, 7)
+    joints = trajectory.joints
+    start = time.perf_counter_ns()
+    for i in range(TICKS):
+        t = (i % trajectory.count) / trajectory.rate_hz
+        groupSyncWrite.clearParam()
+        for sts_id in trajectory.ids:
+            distance, duration, v, a, j = joints[sts_id]
+            position = trajectory.goals[sts_id]
+            if distance:
+                s = _scurveAt(min(t * duration / trajectory.duration, duration), distance, duration, v, a, j)
+                position = trajectory.starts[sts_id] + (1 if position > trajectory.starts[sts_id] else -1) * int(round(s))
+            position &= 0xFFFF
+            groupSyncWrite.addParam(sts_id, [0, position & 0xFF, position >> 8, 0, 0, 0xFF, 0x0F])
+        groupSyncWrite.txPacket()
+    return (time.perf_counter_ns() - start) / TICKS
+
+
+def tick_precomputed(trajectory):
+    groupSyncWrite = GroupSyncWrite(null_port(), STS_ACC, 7)
+    start = time.perf_counter_ns()
+    for i in range(TICKS):
+        index = i % trajectory.count
+        groupSyncWrite.clearParam()
+        for sts_id in trajectory.ids:
+            position = trajectory.positions[sts_id][index] & 0xFFFF
+            speed = trajectory.speeds[sts_id][index]
+            groupSyncWrite.addParam(sts_id, [0, position & 0xFF, position >> 8, 0, 0, speed & 0xFF, speed >> 8])
+        groupSyncWrite.txPacket()
+    return (time.perf_counter_ns() - start) / TICKS
+
+
+def tick_player(trajectory):
+    player = TrajectoryPlayer(null_port())
+    start = time.perf_counter_ns()
+    for i in range(TICKS):
+        if player.isDone():
+            player.start(trajectory)
+        player.write()
+    return (time.perf_counter_ns() - start) / TICKS
+
+
+def simulated_chain():
+    clock = SimClock()
+    chain = FakeServoChain(MOTOR_IDS, clock=clock.monotonic)
+    portHandler = LoopbackPortHandler(chain, clock=clock, response_delay=RESPONSE_DELAY)
+    portHandler.openPort()
+    portHandler.setBaudRate(BAUDRATE)
+    for sts_id in MOTOR_IDS:
+        chain.servo(sts_id).setPosition(STARTS[sts_id])
+    return clock, chain, sts(portHandler)
+
+
+def follow(clock, chain, setpoints=None, limit=30.0):
+    # step the simulation 1 ms at a time until every servo is at its goal;
+    # returns (arrival time per ID, largest |setpoint - position|)
+    arrivals = {}
+    gap = 0.0
+    start = clock.monotonic()
+    while len(arrivals) < len(MOTOR_IDS) and clock.monotonic() - start < limit:
+        clock.advance(1000000)
+        current = setpoints() if setpoints is not None else {}
+        for sts_id in MOTOR_IDS:
+            servo = chain.servo(sts_id)
+            servo.update()
+            if sts_id in current:
+                gap = max(gap, abs(current[sts_id] - servo.position))
+            if sts_id not in arrivals and servo.position == GOALS[sts_id] and servo.velocity == 0.0:
+                arrivals[sts_id] = clock.monotonic() - start
+    return arrivals, gap
+
+
+def move_single_write():
+    clock, chain, packetHandler = simulated_chain()
+    for sts_id in MOTOR_IDS:
+        packetHandler.WriteSignedPosEx(sts_id, GOALS[sts_id], 3400, 50)
+    return follow(clock, chain)
+
+
+def move_streamed(profile):
+    clock, chain, packetHandler = simulated_chain()
+    player = TrajectoryPlayer(packetHandler)
+    player.start(Trajectory(STARTS, GOALS, RATE_HZ, profile))
+    period_ns = int(1e9 / RATE_HZ)
+    next_tick = [clock.monotonic_ns()]
+
+    def setpoints():
+        # the control loop: one sample per period
+        if clock.monotonic_ns() >= next_tick[0]:
+            player.write()
+            next_tick[0] += period_ns
+        return player.setpoints()
+
+    return follow(clock, chain, setpoints)
+
+
+def main():
+    print("%d-joint move, largest %d steps, %d Hz" % (len(MOTOR_IDS), max(abs(GOALS[i] - STARTS[i]) for i in MOTOR_IDS), RATE_HZ))
+    print("%-12s %10s %8s %10s" % ("profile", "plan ms", "ticks", "move s"))
+    trajectories = {}
+    for name, profile in PROFILES:
+        seconds, trajectory = plan_time(profile)
+        trajectories[profile] = trajectory
+        print("%-12s %10.2f %8d %10.2f" % (name, seconds * 1e3, trajectory.count, trajectory.duration))
+
+    trajectory = trajectories[TRAJ_SCURVE]
+    print("\n%-26s %10s" % ("per tick (s-curve)", "us/tick"))
+    print("%-26s %10.1f" % ("evaluate + addParam", tick_evaluate(trajectory) / 1e3))
+    print("%-26s %10.1f" % ("precomputed + addParam", tick_precomputed(trajectory) / 1e3))
+    print("%-26s %10.1f" % ("TrajectoryPlayer.write", tick_player(trajectory) / 1e3))
+
+    print("\n%-26s %10s %10s %10s" % ("simulated move", "done s", "spread s", "gap steps"))
+    arrivals, _ = move_single_write()
+    print("%-26s %10.3f %10.3f %10s" % ("WriteSignedPosEx x5", max(arrivals.values()),
+                                        max(arrivals.values()) - min(arrivals.values()), "-"))
+    for name, profile in PROFILES:
+        arrivals, gap = move_streamed(profile)
+        print("%-26s %10.3f %10.3f %10.1f" % ("streamed " + name, max(arrivals.values()),
+                                              max(arrivals.values()) - min(arrivals.values()), gap))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+#
+# Transactions/second for the positionController.py loop pattern:
+# write a goal to each of 5 servos, then read each position back.
+#
+# "stop-and-wait" calls sts.WriteSignedPosEx / sts.ReadPos one at a time.
+# "engine" submits the whole cycle to a TransactionEngine and waits on the
+# futures, with 1 (half-duplex safe) and 5 requests on the wire.
+#
+
+import sys
+import time
+
+sys.path.append("..")
+from STservo_sdk import *
+from fake_bus import FakeBus
+
+MOTOR_IDS = [1, 2, 3, 4, 5]
+BAUDRATE = 1000000
+RESPONSE_DELAY = 0.0001   # seconds before each status packet
+DURATION = 2.0            # seconds per measurement
+SPEED = 1200
+ACC = 50
+
+
+def stop_and_wait(packetHandler, goal):
+    for sid in MOTOR_IDS:
+        packetHandler.WriteSignedPosEx(sid, goal, SPEED, ACC)
+    for sid in MOTOR_IDS:
+        packetHandler.ReadPos(sid)
+
+
+def pipelined(engine, goal):
+    futures = [engine.WriteSignedPosEx(sid, goal, SPEED, ACC) for sid in MOTOR_IDS]
+    futures += [engine.ReadPos(sid) for sid in MOTOR_IDS]
+    for future in futures:
+        future.result()
+
+
+def rate(fn, target):
+    cycles = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < DURATION:
+        fn(target, cycles & 0x3FF)
+        cycles += 1
+    return cycles * 2 * len(MOTOR_IDS) / (time.perf_counter() - start)
+
+
+def main():
+    with FakeBus(MOTOR_IDS, response_delay=RESPONSE_DELAY, baudrate=BAUDRATE) as bus:
+        portHandler = PortHandler(bus.port_name)
+        packetHandler = sts(portHandler)
+        if not portHandler.openPort():
+            print("Failed to open the port")
+            return
+        portHandler.setRxBlocking(True)
+
+        print("%-22s %12s" % ("mode", "txn/s"))
+        print("%-22s %12.0f" % ("stop-and-wait", rate(stop_and_wait, packetHandler)))
+        for window in (1, len(MOTOR_IDS)):
+            with TransactionEngine(packetHandler, window=window) as engine:
+                print("%-22s %12.0f" % ("engine, window=%d" % window, rate(pipelined, engine)))
+
+        portHandler.closePort()
+
+
+if __name__ == "__main__":
+    main()
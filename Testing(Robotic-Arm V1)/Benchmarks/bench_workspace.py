@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+#
+# WorkspaceMap (Maths/workspace.py) build, storage, queries and clamping.
+#
+# Builds 1 cm reachability maps for the arm's joint limits (servo tick
+# limits from ServoPythonCode/README.md), for any end-effector orientation
+# and for 3DIK.py's phi = -90 deg, saves them and memory-maps them back.
+# It then reports:
+# - query time: isReachable() one target at a time, reachable() in a batch
+# - recall: FK of random joint configurations within limits must land
+#   in reachable voxels
+# - clamp: for random targets outside the workspace, the clamped
+#   point's distance vs the true nearest reachable voxel (brute force)
+#
+
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+
+sys.path.append("..")
+from Maths.batch_ik import *
+from Maths.workspace import *
+
+# 3DIK.py's link lengths (cm), passed explicitly to the Maths functions
+l1 = 22.85
+l2 = 22.85
+l3 = 24.25
+
+QUERIES = 100000
+CLAMPS = 2000
+
+
+def main():
+    rng = np.random.default_rng(0)
+    limits = joint_limits_from_ticks()
+    print("joint limits (deg):", ", ".join("%.1f..%.1f" % tuple(np.degrees(l)) for l in limits))
+
+    for name, phi in (("any phi", None), ("phi -90 deg", -np.pi / 2)):
+        start = time.perf_counter()
+        workspace = WorkspaceMap.build(limits, phi=phi, l1=l1, l2=l2, l3=l3)
+        build_s = time.perf_counter() - start
+        path = os.path.join(tempfile.mkdtemp(), "workspace.npy")
+        workspace.save(path)
+        workspace = WorkspaceMap.load(path)
+        size = sum(os.path.getsize(os.path.join(os.path.dirname(path), f)) for f in os.listdir(os.path.dirname(path)))
+        print("\n%s: voxels %s, %.1f%% reachable, %.1f MB on disk, built in %.2f s" % (
+            name, workspace.occupancy.shape, 100 * workspace.occupancy.mean(), size / 1e6, build_s))
+
+        # query time
+        x, y, z = (rng.uniform(-75, 75, QUERIES) for _ in range(3))
+        targets = list(zip(x.tolist(), y.tolist(), z.tolist()))[:10000]
+        start = time.perf_counter()
+        for target in targets:
+            workspace.isReachable(*target)
+        single_us = (time.perf_counter() - start) * 1e6 / len(targets)
+        start = time.perf_counter()
+        workspace.reachable(x, y, z)
+        batch_us = (time.perf_counter() - start) * 1e6 / QUERIES
+        print("  isReachable %.2f us/query, reachable() %.3f us/query" % (single_us, batch_us))
+
+        # recall on FK of random joint configurations
+        angles = rng.uniform(limits[:, 0], limits[:, 1], (QUERIES, 4))
+        if phi is not None:
+            angles[:, 3] = phi - angles[:, 1] - angles[:, 2]
+            angles = angles[in_limits(angles[:, 3], *limits[3])]
+        position, _ = batch_fk_3dof_with_base(angles, l1, l2, l3)
+        recall = workspace.reachable(*position.T).mean()
+        print("  FK of %d joint configurations within limits: %.2f%% in reachable voxels" % (len(angles), 100 * recall))
+
+        # clamp vs brute-force nearest reachable voxel
+        outside = np.stack([x, y, z], axis=-1)[~workspace.reachable(x, y, z)][:CLAMPS]
+        cx, cy, cz = workspace.clamp(*outside.T)
+        clamped = np.stack([cx, cy, cz], axis=-1)
+        voxels = np.argwhere(np.asarray(workspace.occupancy) > 0) * workspace.resolution + \
+            np.array([workspace.r0, workspace.r0, workspace.z0])
+        best = np.array([np.min(np.linalg.norm(voxels - t, axis=1)) for t in outside])
+        got = np.linalg.norm(clamped - outside, axis=1)
+        start = time.perf_counter()
+        for t in outside[:200]:
+            workspace.clamp(*t)
+        clamp_us = (time.perf_counter() - start) * 1e6 / 200
+        print("  clamp: %.0f us/target; clamped point reachable %.1f%%; extra distance vs true nearest: "
+              "mean %.2f cm, p99 %.2f cm" % (clamp_us, 100 * workspace.reachable(cx, cy, cz).mean(),
+                                            np.mean(got - best), np.percentile(got - best, 99)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,484 @@
+#!/usr/bin/env python
+#
+# Simulated STS servo bus.
+#
+# FakeServoChain answers instruction packets like a chain of STS servos:
+# PING, READ, WRITE, REG_WRITE, ACTION, SYNC_READ and SYNC_WRITE over the
+# full memory table, with simple position dynamics that honour the goal
+# speed and ACC.
+# FakeBus puts a chain behind a pty pair: PortHandler opens the slave path
+# (fakeBus.port_name) exactly as it would open 'COM3' or '/dev/ttyUSB0'.
+# It adds wire time at the configured baud rate, a response delay, and
+# optional byte noise and drops in both directions.
+# LoopbackPortHandler talks to a chain in-process, with no OS I/O at all,
+# for measuring the SDK's own per-packet cost. Given a SimClock it also
+# models wire time and response delay in simulated time: the host's
+# waits, timeouts and sleeps cost no real time, so a scenario runs as
+# fast as the SDK and the simulation can go.
+#
+# Run it on its own to give any script a bus to talk to:
+#   python fake_bus.py --ids 1 2 3 4 5
+# then set the script's DEVICENAME to the printed port.
+#
+
+import os
+import pty
+import tty
+import sys
+import math
+import time
+import random
+import argparse
+import threading
+
+sys.path.append("..")
+from STservo_sdk.stservo_def import *
+from STservo_sdk.port_handler import PortHandler
+from STservo_sdk.sts import *
+
+CONTROL_TABLE_SIZE = 256
+MAX_SPEED = 3400        # steps/s used when the goal speed is 0
+ACC_UNIT = 100          # steps/s^2 per ACC unit; ACC 0 = no limit
+RETURN_DELAY_UNIT = 2e-6  # seconds per unit of the return delay register
+RX_GAP = 0.005          # a servo drops a partial packet after this much silence
+
+# Address 7 (return delay) and 8 (status return level) are not in sts.py
+STS_RETURN_DELAY = 7
+STS_STATUS_RETURN_LEVEL = 8
+
+# Power-on memory table, address -> byte
+DEFAULT_TABLE = {
+    0: 3, 1: 6,                     # firmware version
+    STS_BAUD_RATE: STS_1M,
+    STS_RETURN_DELAY: 0,
+    STS_STATUS_RETURN_LEVEL: 1,     # reply to every instruction
+    STS_MAX_ANGLE_LIMIT_L: 0xFF, STS_MAX_ANGLE_LIMIT_H: 0x0F,  # 4095
+    13: 70,                         # max temperature
+    14: 140, 15: 40,                # max/min voltage (0.1V)
+    16: 0xE8, 17: 0x03,             # max torque 1000
+    21: 32, 22: 32,                 # P, D
+    STS_CW_DEAD: 1, STS_CCW_DEAD: 1,
+    STS_TORQUE_ENABLE: 1,
+    STS_PRESENT_VOLTAGE: 120,       # 12.0V
+    STS_PRESENT_TEMPERATURE: 30,
+}
+
+
+def sign_magnitude(value, sign_bit):
+    # host int -> STS sign-magnitude word (inverse of sts_tohost)
+    magnitude = min(abs(int(value)), (1 << sign_bit) - 1)
+    return magnitude | (1 << sign_bit) if value < 0 else magnitude
+
+
+def from_sign_magnitude(value, sign_bit):
+    return -(value & ~(1 << sign_bit)) if value & (1 << sign_bit) else value
+
+
+class FakeServo(object):
+    def __init__(self, sts_id, model_number=777, clock=time.monotonic):
+        self.sts_id = sts_id
+        self.clock = clock
+        self.mem = bytearray(CONTROL_TABLE_SIZE)
+        for address, value in DEFAULT_TABLE.items():
+            self.mem[address] = value
+        self.mem[STS_MODEL_L] = model_number & 0xFF
+        self.mem[STS_MODEL_H] = (model_number >> 8) & 0xFF
+        self.mem[STS_ID] = sts_id
+
+        self.error = 0            # error byte returned in status packets
+        self.registered = None    # (address, data) from REG_WRITE, run on ACTION
+
+        self.position = 0.0       # steps, not wrapped
+        self.velocity = 0.0       # steps/s
+        self.goal = 0.0
+        self.last_update = clock()
+
+    def word(self, address):
+        return self.mem[address] | (self.mem[address + 1] << 8)
+
+    def setWord(self, address, value):
+        self.mem[address] = value & 0xFF
+        self.mem[address + 1] = (value >> 8) & 0xFF
+
+    def returnDelay(self):
+        return self.mem[STS_RETURN_DELAY] * RETURN_DELAY_UNIT
+
+    def read(self, address, length):
+        self.update()
+        return bytes(self.mem[address:address + length])
+
+    def write(self, address, data):
+        # host write: store, then apply what the registers mean
+        self.update()
+        self.mem[address:address + len(data)] = data
+        end = address + len(data)
+        if address <= STS_ID < end:
+            self.sts_id = self.mem[STS_ID]
+        if (address < STS_GOAL_SPEED_H + 1) and (end > STS_TORQUE_ENABLE):
+            self.setGoal()
+
+    def setPosition(self, position):
+        # move the simulated shaft, e.g. to start a test away from zero
+        self.position = self.goal = float(position)
+        self.velocity = 0.0
+        self.last_update = self.clock()
+        self.writePresent()
+
+    def setGoal(self):
+        goal = from_sign_magnitude(self.word(STS_GOAL_POSITION_L), 15)
+        min_limit, max_limit = self.word(STS_MIN_ANGLE_LIMIT_L), self.word(STS_MAX_ANGLE_LIMIT_L)
+        if (self.mem[STS_MODE] == 0) and (min_limit or max_limit):
+            goal = min(max(goal, min_limit), max_limit)
+        self.goal = float(goal)
+
+    def update(self):
+        now = self.clock()
+        dt = now - self.last_update
+        self.last_update = now
+        if dt <= 0:
+            return
+
+        speed = from_sign_magnitude(self.word(STS_GOAL_SPEED_L), 15)
+        acc = self.mem[STS_ACC] * ACC_UNIT or math.inf
+        if not self.mem[STS_TORQUE_ENABLE]:
+            target = 0.0
+        elif self.mem[STS_MODE] == 1:  # wheel mode: goal speed is a velocity
+            target = float(speed)
+        else:
+            if (self.position == self.goal) and (self.velocity == 0.0):
+                return
+            error = self.goal - self.position
+            vmax = abs(speed) or MAX_SPEED
+            # fastest speed that can still stop at the goal
+            target = math.copysign(min(vmax, math.sqrt(2.0 * acc * abs(error)) if acc != math.inf else vmax), error)
+
+        if (target == 0.0) and (self.velocity == 0.0):
+            return
+
+        dv = target - self.velocity
+        self.velocity += math.copysign(min(abs(dv), acc * dt), dv)
+        step = self.velocity * dt
+        error = self.goal - self.position
+        if (self.mem[STS_MODE] != 1) and self.mem[STS_TORQUE_ENABLE] and (step * error >= 0) and (abs(step) >= abs(error)):
+            self.position = self.goal  # arrived within this step
+            self.velocity = 0.0
+        else:
+            self.position += step
+        self.writePresent(abs(dv) > acc * dt / 2)
+
+    def writePresent(self, accelerating=False):
+        position = int(round(self.position))
+        if self.mem[STS_MODE] == 3:  # step mode reports the multi-turn position
+            self.setWord(STS_PRESENT_POSITION_L, sign_magnitude(position, 15))
+        else:
+            self.setWord(STS_PRESENT_POSITION_L, position % 4096)
+        self.setWord(STS_MULTI_TURN_L, position & 0xFFFF)
+        self.setWord(STS_PRESENT_SPEED_L, sign_magnitude(self.velocity, 15))
+        load = min(1000, int(abs(self.velocity) * 300 / MAX_SPEED) + (300 if accelerating else 0))
+        self.setWord(STS_PRESENT_LOAD_L, sign_magnitude(math.copysign(load, self.velocity), 10))
+        self.setWord(STS_PRESENT_CURRENT_L, load // 2)
+        self.mem[STS_MOVING] = 1 if (self.velocity != 0.0 or self.position != self.goal) else 0
+
+
+class FakeServoChain(object):
+    def __init__(self, ids, clock=time.monotonic):
+        self.clock = clock
+        self.servos = dict((sts_id, FakeServo(sts_id, clock=clock)) for sts_id in ids)
+        self.buf = bytearray()
+        self.last_rx = 0.0
+        self.rx_count = 0
+        self.tx_count = 0
+
+    def process(self, data):
+        # Feed bytes from the host, return the status packets to send back.
+        now = self.clock()
+        if now - self.last_rx > RX_GAP:
+            del self.buf[:]  # drop a partial packet left by noise
+        self.last_rx = now
+        self.buf.extend(data)
+        replies = []
+        while True:
+            packet = self.takePacket()
+            if packet is None:
+                break
+            self.rx_count += 1
+            replies.extend(self.handle(packet))
+        self.tx_count += len(replies)
+        return replies
+
+    def takePacket(self):
+        # Drop bytes until a header, then wait for a complete frame.
+        buf = self.buf
+        while True:
+            while len(buf) >= 2 and not (buf[0] == 0xFF and buf[1] == 0xFF):
+                del buf[0]
+            if len(buf) < 4:
+                return None
+            total = buf[3] + 4
+            if len(buf) < total:
+                return None
+            packet = bytes(buf[:total])
+            if (~sum(packet[2:-1]) & 0xFF) != packet[-1]:
+                del buf[0]  # bad frame: resync on the next header
+                continue
+            del buf[:total]
+            return packet
+
+    def status(self, sts_id, params=b"", error=0):
+        packet = bytearray([0xFF, 0xFF, sts_id, len(params) + 2, error])
+        packet.extend(params)
+        packet.append(~sum(packet[2:]) & 0xFF)
+        return packet
+
+    def servo(self, sts_id):
+        for servo in self.servos.values():
+            if servo.sts_id == sts_id:
+                return servo
+        return None
+
+    def handle(self, packet):
+        sts_id = packet[2]
+        instruction = packet[4]
+        params = packet[5:-1]
+
+        if instruction == INST_SYNC_WRITE:
+            address, length = params[0], params[1]
+            for idx in range(2, len(params), length + 1):
+                servo = self.servo(params[idx])
+                if servo is not None:
+                    servo.write(address, params[idx + 1: idx + 1 + length])
+            return []
+
+        if instruction == INST_SYNC_READ:
+            address, length = params[0], params[1]
+            replies = []
+            for i in params[2:]:
+                servo = self.servo(i)
+                if servo is not None:
+                    replies.append(self.status(i, servo.read(address, length), servo.error))
+            return replies
+
+        if sts_id == BROADCAST_ID:
+            targets = list(self.servos.values())
+        else:
+            servo = self.servo(sts_id)
+            targets = [servo] if servo is not None else []
+
+        replies = []
+        for servo in targets:
+            reply = self.execute(servo, instruction, params)
+            if (reply is None) or (sts_id == BROADCAST_ID):
+                continue
+            if (instruction not in (INST_PING, INST_READ)) and (servo.mem[STS_STATUS_RETURN_LEVEL] == 0):
+                continue
+            replies.append(self.status(sts_id, reply, servo.error))
+        return replies
+
+    def execute(self, servo, instruction, params):
+        # -> status packet parameters, or None for no reply
+        if instruction == INST_PING:
+            return b""
+        elif instruction == INST_READ:
+            return servo.read(params[0], params[1])
+        elif instruction == INST_WRITE:
+            servo.write(params[0], params[1:])
+            return b""
+        elif instruction == INST_REG_WRITE:
+            servo.registered = (params[0], bytes(params[1:]))
+            return b""
+        elif instruction == INST_ACTION:
+            if servo.registered is not None:
+                servo.write(*servo.registered)
+                servo.registered = None
+            return b""
+        return None
+
+
+class FakeBus(object):
+    def __init__(self, ids, response_delay=0.0, baudrate=1000000, noise_rate=0.0, drop_rate=0.0, seed=None,
+                 clock=time.monotonic):
+        self.chain = FakeServoChain(ids, clock=clock)
+        self.servos = self.chain.servos
+        self.response_delay = response_delay   # seconds, per status packet (at least the servo's return delay)
+        self.baudrate = baudrate
+        self.noise_rate = noise_rate           # chance of a bit flip per byte
+        self.drop_rate = drop_rate             # chance of losing a byte
+        self.random = random.Random(seed)
+
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        self.port_name = os.ttyname(self.slave)
+
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="fake_bus", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        os.close(self.master)
+        os.close(self.slave)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def wireTime(self, length):
+        return (length * 10.0) / self.baudrate
+
+    def disturb(self, data):
+        # apply byte noise and drops
+        if not (self.noise_rate or self.drop_rate):
+            return data
+        out = bytearray()
+        for byte in data:
+            if self.random.random() < self.drop_rate:
+                continue
+            if self.random.random() < self.noise_rate:
+                byte ^= 1 << self.random.randrange(8)
+            out.append(byte)
+        return bytes(out)
+
+    def _run(self):
+        while self._running:
+            try:
+                data = os.read(self.master, 1024)
+            except OSError:
+                break
+            time.sleep(self.wireTime(len(data)))  # the servos see the packet once it is on the wire
+            self._reply(self.chain.process(self.disturb(data)))
+
+    def _reply(self, packets):
+        for packet in packets:
+            servo = self.chain.servo(packet[2])
+            delay = max(self.response_delay, servo.returnDelay() if servo else 0.0) + self.wireTime(len(packet))
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                os.write(self.master, self.disturb(packet))
+            except OSError:
+                return
+
+
+class SimClock(object):
+    # Simulated time, moved on only by advance()/sleep(). Hand monotonic to
+    # FakeServoChain and monotonic_ns to PortHandler.setClock.
+    def __init__(self, start_ns=0):
+        self.now_ns = start_ns
+
+    def monotonic_ns(self):
+        return self.now_ns
+
+    def monotonic(self):
+        return self.now_ns / 1e9
+
+    def advance(self, ns):
+        self.now_ns += int(ns)
+
+    def advanceTo(self, ns):
+        if ns > self.now_ns:
+            self.now_ns = ns
+
+    def sleep(self, seconds):
+        self.advance(seconds * 1e9)
+
+
+class LoopbackPortHandler(PortHandler):
+    def __init__(self, chain, clock=None, response_delay=0.0):
+        PortHandler.__init__(self, "loopback")
+        self.chain = chain
+        self.rx = bytearray()
+        self.sim_clock = clock                 # SimClock, or None for instant replies
+        self.response_delay = response_delay   # seconds, with a SimClock
+        self.pending = []                      # [(arrival ns, status packet)]
+        if clock is not None:
+            self.setClock(clock.monotonic_ns)
+
+    def setupPort(self, cflag_baud):
+        self.is_open = True
+        self.tx_time_per_byte = (1000.0 / self.baudrate) * 10.0
+        return True
+
+    def closePort(self):
+        self.is_open = False
+
+    def clearPort(self):
+        pass
+
+    def wireTime(self, length):
+        return (length * 10 * 1000000000) // self.baudrate  # ns
+
+    def deliver(self):
+        # Move status packets that have arrived by now into rx. With nothing
+        # to read the host would wait, so skip ahead to the next arrival or,
+        # if none is coming, to the packet timeout.
+        if self.sim_clock is None:
+            return
+        if not self.rx and not (self.pending and self.pending[0][0] <= self.sim_clock.now_ns):
+            self.sim_clock.advanceTo(self.pending[0][0] if self.pending else self.packet_deadline + 1)
+        while self.pending and self.pending[0][0] <= self.sim_clock.now_ns:
+            self.rx.extend(self.pending.pop(0)[1])
+
+    def getBytesAvailable(self):
+        return len(self.rx)
+
+    def readPort(self, length):
+        self.deliver()
+        data = bytes(self.rx[:length])
+        del self.rx[:length]
+        return data
+
+    def readPortInto(self, buffer):
+        self.deliver()
+        length = min(len(buffer), len(self.rx))
+        buffer[:length] = self.rx[:length]
+        del self.rx[:length]
+        return length
+
+    def writePort(self, packet):
+        if self.sim_clock is None:
+            for reply in self.chain.process(packet):
+                self.rx.extend(reply)
+            return len(packet)
+
+        # the servos see the packet once it is on the wire, then answer in turn
+        clock = self.sim_clock
+        clock.advance(self.wireTime(len(packet)))
+        arrival = clock.now_ns
+        for reply in self.chain.process(packet):
+            servo = self.chain.servo(reply[2])
+            delay = max(self.response_delay, servo.returnDelay() if servo else 0.0)
+            arrival += int(delay * 1e9) + self.wireTime(len(reply))
+            self.pending.append((arrival, reply))
+        return len(packet)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated STS servo bus on a pty")
+    parser.add_argument("--ids", type=int, nargs="+", default=[1, 2, 3, 4, 5])
+    parser.add_argument("--baud", type=int, default=1000000)
+    parser.add_argument("--delay", type=float, default=0.0001, help="response delay, seconds")
+    parser.add_argument("--noise", type=float, default=0.0, help="bit flip chance per byte")
+    parser.add_argument("--drop", type=float, default=0.0, help="byte drop chance")
+    args = parser.parse_args()
+
+    with FakeBus(args.ids, response_delay=args.delay, baudrate=args.baud,
+                 noise_rate=args.noise, drop_rate=args.drop) as bus:
+        print("Fake STS bus with IDs %s on %s (Ctrl-C to stop)" % (args.ids, bus.port_name))
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+#
+# Replay a bus trace written by BusTracer.flush() through the SDK parser.
+#
+#   python trace_replay.py bus.trace            summary
+#   python trace_replay.py bus.trace -v         plus one line per transaction
+#   python trace_replay.py --demo bus.trace     record a short capture from the
+#                                               fake bus (with an absent ID and
+#                                               line noise) and replay it
+#
+# Each transaction shows the instruction sent, the status packets the parser
+# finds in the bytes that came back, and the result codes recorded live.
+# Transactions where the replayed and recorded results differ are counted
+# as mismatches.
+#
+
+import sys
+import argparse
+
+sys.path.append("..")
+from STservo_sdk import *
+
+INSTRUCTIONS = {INST_PING: "PING", INST_READ: "READ", INST_WRITE: "WRITE", INST_REG_WRITE: "REG_WRITE",
+                INST_ACTION: "ACTION", INST_SYNC_READ: "SYNC_READ", INST_SYNC_WRITE: "SYNC_WRITE"}
+RESULTS = {COMM_SUCCESS: "SUCCESS", COMM_PORT_BUSY: "PORT_BUSY", COMM_TX_FAIL: "TX_FAIL", COMM_RX_FAIL: "RX_FAIL",
+           COMM_TX_ERROR: "TX_ERROR", COMM_RX_WAITING: "RX_WAITING", COMM_RX_TIMEOUT: "RX_TIMEOUT",
+           COMM_RX_CORRUPT: "RX_CORRUPT", COMM_NOT_AVAILABLE: "NOT_AVAILABLE"}
+
+
+def replay_result(step):
+    # overall result the parser gives for the replayed bytes
+    replayed = [result for _, result in step['packets']]
+    expected = 1
+    if step['instruction'] == INST_SYNC_READ:
+        expected = len(step['tx']) - 8  # one status packet per ID parameter
+    if not replayed:
+        return COMM_RX_TIMEOUT
+    failed = [result for result in replayed if result != COMM_SUCCESS]
+    if failed:
+        return failed[0]
+    return COMM_SUCCESS if len(replayed) >= expected else COMM_RX_CORRUPT
+
+
+def demo(path):
+    from fake_bus import FakeBus
+    with FakeBus([1, 2, 3], response_delay=0.0001, noise_rate=0.002, seed=7) as bus:
+        portHandler = PortHandler(bus.port_name)
+        packetHandler = sts(portHandler)
+        portHandler.openPort()
+        portHandler.setRxBlocking(True)
+        tracer = BusTracer()
+        portHandler.setTracer(tracer)
+        for cycle in range(100):
+            for sid in (1, 2, 3, 4):  # ID 4 is absent
+                packetHandler.ReadPos(sid)
+            packetHandler.WritePosEx(1, cycle * 10, 0, 0)
+            packetHandler.SyncReadState([1, 2, 3], ['position', 'speed'])
+        tracer.flush(path)
+        portHandler.closePort()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a bus trace through the STservo_sdk parser")
+    parser.add_argument("trace")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    parser.add_argument("--demo", action="store_true", help="record a capture from the fake bus first")
+    args = parser.parse_args()
+
+    if args.demo:
+        demo(args.trace)
+
+    steps = 0
+    mismatches = 0
+    by_result = {}
+    durations = {}
+    start = None
+    for step in replayTrace(readTrace(args.trace)):
+        start = step['time'] if start is None else start
+        steps += 1
+        recorded = step['recorded']
+        name = INSTRUCTIONS.get(step['instruction'], str(step['instruction']))
+        for result in recorded:
+            by_result[result] = by_result.get(result, 0) + 1
+        durations.setdefault(name, []).append(step['duration'])
+        if recorded and replay_result(step) != recorded[-1]:
+            mismatches += 1
+
+        if args.verbose:
+            print("%10.3fms id=%-3s %-10s tx=%s" % ((step['time'] - start) / 1e6, step['id'], name, step['tx'].hex()))
+            for packet, result in step['packets']:
+                print("%14s <- %s %s" % ("", packet.hex(), RESULTS.get(result, result)))
+            print("%14s recorded %s in %.0fus" % ("", " ".join(RESULTS.get(r, str(r)) for r in recorded) or "-",
+                                                  step['duration'] / 1e3))
+
+    print("%d transactions, %d replay mismatches" % (steps, mismatches))
+    for result, count in sorted(by_result.items(), reverse=True):
+        print("  %-14s %6d" % (RESULTS.get(result, result), count))
+    print("%-12s %8s %10s %10s" % ("instruction", "count", "p50 us", "max us"))
+    for name, values in sorted(durations.items()):
+        values.sort()
+        print("%-12s %8d %10.0f %10.0f" % (name, len(values), values[len(values) // 2] / 1e3, values[-1] / 1e3))
+
+
+if __name__ == "__main__":
+    main()
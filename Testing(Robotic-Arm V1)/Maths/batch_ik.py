@@ -0,0 +1,92 @@
+import numpy as np
+
+# Default link lengths in cm: ServoPythonCode/3DIK.py's (and 2DIK.py's).
+# Maths/3DOFIK.py uses l1 = l2 = 22.65; pass l1, l2, l3 to match another arm.
+l1 = 22.85
+l2 = 22.85
+l3 = 24.25  # End effector offset
+
+# Elbow branches, by the sign of θ2
+ELBOW_DOWN = 1   # θ2 >= 0, the solution analytical_ik_3dof_with_base returns
+ELBOW_UP = -1    # θ2 <= 0
+
+def batch_ik_3dof(x, y, phi=0.0, elbow=ELBOW_DOWN, l1=l1, l2=l2, l3=l3):
+    """
+    Vectorised planar analytical_ik_3dof (Maths/3DOFIK.py, 2DIK.py).
+    The default l1, l2, l3 are 3DIK.py's; Maths/3DOFIK.py's l1 and l2
+    (22.65 cm) differ, so pass its lengths to reproduce it.
+
+    x, y, phi and elbow are arrays (or scalars) that broadcast together:
+    - x, y: desired end-effector position in the arm's plane (cm)
+    - phi: desired end-effector orientation (radians)
+    - elbow: ELBOW_DOWN or ELBOW_UP per target
+
+    Returns (angles, reachable):
+    - angles: [..., 3] array of θ1, θ2, θ3 in radians, NaN where unreachable
+    - reachable: boolean array of the broadcast shape
+    """
+    x, y, phi, elbow = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (x, y, phi, elbow)))
+
+    # Compute wrist position
+    wx = x - l3 * np.cos(phi)
+    wy = y - l3 * np.sin(phi)
+
+    # Solve θ1 and θ2 with the 2-link arm IK, every target at once
+    cos_theta2 = (wx**2 + wy**2 - l1**2 - l2**2) / (2 * l1 * l2)
+    reachable = np.abs(cos_theta2) <= 1
+
+    theta2 = np.copysign(np.arccos(np.clip(cos_theta2, -1.0, 1.0)), elbow)
+    k1 = l1 + l2 * np.cos(theta2)
+    k2 = l2 * np.sin(theta2)
+    theta1 = np.arctan2(wy, wx) - np.arctan2(k2, k1)
+    theta3 = phi - theta1 - theta2
+
+    angles = np.stack([theta1, theta2, theta3], axis=-1)
+    angles[~reachable] = np.nan
+    return angles, reachable
+
+def batch_ik_3dof_with_base(x, y, z, phi=0.0, elbow=ELBOW_DOWN, l1=l1, l2=l2, l3=l3):
+    """
+    Vectorised analytical_ik_3dof_with_base (3DIK.py); l1, l2, l3 as in
+    batch_ik_3dof.
+
+    x, y, z, phi and elbow are arrays (or scalars) that broadcast together:
+    - x, y: horizontal coordinates (base plane, cm)
+    - z: height (cm)
+    - phi: desired orientation in the XZ plane (radians)
+    - elbow: ELBOW_DOWN or ELBOW_UP per target. Pass a column such as
+      np.array([[ELBOW_DOWN], [ELBOW_UP]]) to solve both branches at once.
+
+    Returns (angles, reachable):
+    - angles: [..., 4] array of θ0, θ1, θ2, θ3 in radians, NaN where unreachable
+    - reachable: boolean array of the broadcast shape
+    """
+    x, y = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+
+    theta0 = np.arctan2(y, x)  # Base rotation
+    r = np.hypot(x, y)         # Horizontal distance from base
+
+    planar, reachable = batch_ik_3dof(r, z, phi, elbow, l1, l2, l3)
+    theta0 = np.broadcast_to(theta0, reachable.shape)
+    angles = np.concatenate([np.where(reachable, theta0, np.nan)[..., None], planar], axis=-1)
+    return angles, reachable
+
+def batch_fk_3dof_with_base(angles, l1=l1, l2=l2, l3=l3):
+    """
+    Forward kinematics for [..., 4] arrays of θ0, θ1, θ2, θ3 (radians),
+    with l1, l2, l3 as in batch_ik_3dof.
+
+    Returns (position, phi): [..., 3] end-effector x, y, z (cm) and the
+    end-effector orientation in the XZ plane.
+    """
+    angles = np.asarray(angles, dtype=float)
+    theta0, theta1, theta2, theta3 = np.moveaxis(angles, -1, 0)
+
+    a1 = theta1
+    a2 = a1 + theta2
+    phi = a2 + theta3
+    r = l1 * np.cos(a1) + l2 * np.cos(a2) + l3 * np.cos(phi)
+    z = l1 * np.sin(a1) + l2 * np.sin(a2) + l3 * np.sin(phi)
+
+    position = np.stack([r * np.cos(theta0), r * np.sin(theta0), z], axis=-1)
+    return position, phi
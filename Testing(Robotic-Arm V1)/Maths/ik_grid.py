@@ -0,0 +1,220 @@
+import math
+
+import numpy as np
+
+from .batch_ik import *
+
+# The arm's IK only depends on the target's position in the arm's plane
+# (horizontal reach u, height v) and phi; the base angle is atan2(y, x).
+# So the grid is 3D over (phi, u, v), interpolated trilinearly, and the
+# same table serves 3DIK.py (u = sqrt(x² + y²), v = z) and 2DIK.py
+# (u = x, v = y).
+
+GRID_CHANNELS = 4  # θ1, θ2, θ3, 1.0 if the cell at this corner can be interpolated
+PHI_EDGE = 1e-9     # grid steps past the last phi still taken as on it (rounding)
+
+def _cell_ok(table, ok, wrap_limit):
+    """
+    A cell (the box between grid points i..i+1 on each axis) can be
+    interpolated when all its corners are well inside the workspace and no
+    angle jumps across it (θ1 wraps at ±π behind the base).
+    """
+    n_phi, n_u, n_v = ok.shape
+    steps = [(a, b, c) for a in ((0, 1) if n_phi > 1 else (0,)) for b in (0, 1) for c in (0, 1)]
+    shape = (max(n_phi - 1, 1), n_u - 1, n_v - 1)
+    corners = [table[a:a + shape[0], b:b + shape[1], c:c + shape[2]] for a, b, c in steps]
+    corner_ok = [ok[a:a + shape[0], b:b + shape[1], c:c + shape[2]] for a, b, c in steps]
+
+    angles = np.nan_to_num(np.stack(corners))  # unreachable corners fail corner_ok anyway
+    spread = angles.max(axis=0) - angles.min(axis=0)
+    cell = np.logical_and.reduce(corner_ok) & np.all(spread < wrap_limit, axis=-1)
+
+    out = np.zeros(ok.shape, dtype=bool)
+    out[:shape[0], :shape[1], :shape[2]] = cell
+    return out
+
+class IKGrid(object):
+    """
+    Precomputed IK over (phi, u, v) with trilinear interpolation.
+
+    Lookups inside an interpolable cell read 8 corners of the table; any
+    other target (outside the grid, near the workspace edge where θ2 → 0
+    or π, or where θ1 wraps) is solved with the analytic IK instead, so the
+    answer is always either interpolated or exact.
+
+    The table is a float32 array [n_phi, n_u, n_v, GRID_CHANNELS]. save()
+    writes it as a .npy (plus a small .axes.npy) and load() memory-maps it.
+    """
+
+    def __init__(self, table, axes):
+        self.table = table
+        # phi0, dphi, n_phi, u0, du, n_u, v0, dv, n_v, elbow, l1, l2, l3
+        self.axes = np.asarray(axes, dtype=float)
+        (self.phi0, self.dphi, n_phi, self.u0, self.du, n_u,
+         self.v0, self.dv, n_v, self.elbow, self.l1, self.l2, self.l3) = [float(a) for a in self.axes]
+        self.n_phi, self.n_u, self.n_v = int(n_phi), int(n_u), int(n_v)
+        self.flat = table.reshape(-1)
+
+        self.lookup_count = 0
+        self.fallback_count = 0
+
+    @classmethod
+    def build(cls, phis, u_range=(-75.0, 75.0), v_range=(-75.0, 75.0), resolution=0.5,
+              elbow=ELBOW_DOWN, margin=0.02, wrap_limit=np.pi / 2, l1=l1, l2=l2, l3=l3):
+        """
+        phis: evenly spaced orientations (radians) to tabulate, one or more
+        u_range, v_range: plane extent (cm); resolution: grid step (cm)
+        margin: points with |cos θ2| > 1 - margin are left to the analytic IK
+        """
+        phis = np.atleast_1d(np.asarray(phis, dtype=float))
+        dphi = (phis[-1] - phis[0]) / (len(phis) - 1) if len(phis) > 1 else 0.0
+        n_u = int(round((u_range[1] - u_range[0]) / resolution)) + 1
+        n_v = int(round((v_range[1] - v_range[0]) / resolution)) + 1
+        u = u_range[0] + resolution * np.arange(n_u)
+        v = v_range[0] + resolution * np.arange(n_v)
+
+        phi_g, u_g, v_g = np.meshgrid(phis, u, v, indexing='ij')
+        angles, reachable = batch_ik_3dof(u_g, v_g, phi_g, elbow, l1, l2, l3)
+
+        # keep off the workspace edge, where arccos is too steep to interpolate
+        wx = u_g - l3 * np.cos(phi_g)
+        wy = v_g - l3 * np.sin(phi_g)
+        cos_theta2 = (wx**2 + wy**2 - l1**2 - l2**2) / (2 * l1 * l2)
+        ok = reachable & (np.abs(cos_theta2) <= 1 - margin)
+
+        table = np.empty(angles.shape[:-1] + (GRID_CHANNELS,), dtype=np.float32)
+        table[..., :3] = angles
+        table[..., 3] = _cell_ok(angles, ok, wrap_limit)
+
+        axes = [phis[0], dphi, len(phis), u_range[0], resolution, n_u,
+                v_range[0], resolution, n_v, elbow, l1, l2, l3]
+        return cls(table, axes)
+
+    def save(self, path):
+        np.save(path, self.table)
+        np.save(path + '.axes.npy', self.axes)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        return cls(np.load(path, mmap_mode=mmap_mode), np.load(path + '.axes.npy'))
+
+    def lookup_planar(self, u, v, phi):
+        """
+        Batch lookup in the arm's plane. u, v, phi broadcast together.
+        Returns (angles [..., 3] θ1, θ2, θ3 in radians, NaN if unreachable, reachable)
+        """
+        u, v, phi = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (u, v, phi)))
+        fp = (phi - self.phi0) / self.dphi if self.n_phi > 1 else np.where(phi == self.phi0, 0.0, -1.0)
+        fu = (u - self.u0) / self.du
+        fv = (v - self.v0) / self.dv
+
+        ip = np.floor(fp).astype(np.intp)
+        if self.n_phi > 1:
+            # phi on the last grid value (not past it, that would extrapolate)
+            ip = np.where((ip == self.n_phi - 1) & (fp <= self.n_phi - 1 + PHI_EDGE), ip - 1, ip)
+        iu = np.floor(fu).astype(np.intp)
+        iv = np.floor(fv).astype(np.intp)
+        inside = ((ip >= 0) & (ip < max(self.n_phi - 1, 1)) & (iu >= 0) & (iu < self.n_u - 1)
+                  & (iv >= 0) & (iv < self.n_v - 1))
+        ip = np.where(inside, ip, 0)
+        iu = np.where(inside, iu, 0)
+        iv = np.where(inside, iv, 0)
+        use = inside & (self.table[ip, iu, iv, 3] > 0)
+
+        angles = np.empty(u.shape + (3,))
+        reachable = np.empty(u.shape, dtype=bool)
+
+        ip, iu, iv = ip[use], iu[use], iv[use]
+        tp = (fp[use] - ip)[:, None] if self.n_phi > 1 else 0.0
+        tu = (fu[use] - iu)[:, None]
+        tv = (fv[use] - iv)[:, None]
+        table = self.table
+        result = 0.0
+        for a, wa in ((0, 1 - tp), (1, tp)) if self.n_phi > 1 else ((0, 1.0),):
+            for b, wb in ((0, 1 - tu), (1, tu)):
+                for c, wc in ((0, 1 - tv), (1, tv)):
+                    result = result + (wa * wb * wc) * table[ip + a, iu + b, iv + c, :3]
+        angles[use] = result
+        reachable[use] = True
+
+        fallback = ~use
+        if fallback.any():
+            angles[fallback], reachable[fallback] = batch_ik_3dof(
+                u[fallback], v[fallback], phi[fallback], self.elbow, self.l1, self.l2, self.l3)
+
+        self.lookup_count += u.size
+        self.fallback_count += int(fallback.sum())
+        return angles, reachable
+
+    def lookup(self, x, y, z, phi):
+        """
+        Batch lookup for the 3-DOF + base arm, as batch_ik_3dof_with_base.
+        Returns (angles [..., 4] θ0..θ3 in radians, NaN if unreachable, reachable)
+        """
+        x, y = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+        planar, reachable = self.lookup_planar(np.hypot(x, y), z, phi)
+        theta0 = np.broadcast_to(np.arctan2(y, x), reachable.shape)
+        angles = np.concatenate([np.where(reachable, theta0, np.nan)[..., None], planar], axis=-1)
+        return angles, reachable
+
+    def solve_planar(self, u, v, phi):
+        """
+        One target, as 2DIK.py's analytical_ik_3dof: [θ1, θ2, θ3] in
+        degrees or None if unreachable. Plain Python on the table, so a
+        single lookup skips NumPy's per-call overhead.
+        """
+        self.lookup_count += 1
+        if self.n_phi > 1:
+            fp = (phi - self.phi0) / self.dphi
+            ip = int(math.floor(fp))
+            if ip == self.n_phi - 1 and fp <= self.n_phi - 1 + PHI_EDGE:
+                ip -= 1  # phi on the last grid value (not past it, that would extrapolate)
+        else:
+            fp = ip = 0 if phi == self.phi0 else -1
+        fu = (u - self.u0) / self.du
+        fv = (v - self.v0) / self.dv
+        iu = int(math.floor(fu))
+        iv = int(math.floor(fv))
+
+        n_u, n_v = self.n_u, self.n_v
+        if (0 <= ip < max(self.n_phi - 1, 1)) and (0 <= iu < n_u - 1) and (0 <= iv < n_v - 1):
+            flat = self.flat
+            base = ((ip * n_u + iu) * n_v + iv) * GRID_CHANNELS
+            if flat[base + 3] > 0:
+                tp, tu, tv = fp - ip, fu - iu, fv - iv
+                stride_v = GRID_CHANNELS
+                stride_u = n_v * GRID_CHANNELS
+                stride_p = n_u * stride_u
+                t1 = t2 = t3 = 0.0
+                for a, wa in ((0, 1 - tp), (stride_p, tp)) if self.n_phi > 1 else ((0, 1.0),):
+                    for b, wb in ((0, 1 - tu), (stride_u, tu)):
+                        for c, wc in ((0, 1 - tv), (stride_v, tv)):
+                            w = wa * wb * wc
+                            i = base + a + b + c
+                            t1 += w * flat.item(i)
+                            t2 += w * flat.item(i + 1)
+                            t3 += w * flat.item(i + 2)
+                return [math.degrees(t1), math.degrees(t2), math.degrees(t3)]
+
+        # analytic fallback
+        self.fallback_count += 1
+        l1, l2, l3 = self.l1, self.l2, self.l3
+        wx = u - l3 * math.cos(phi)
+        wy = v - l3 * math.sin(phi)
+        cos_theta2 = (wx**2 + wy**2 - l1**2 - l2**2) / (2 * l1 * l2)
+        if abs(cos_theta2) > 1:
+            return None
+        theta2 = math.copysign(math.acos(cos_theta2), self.elbow)
+        theta1 = math.atan2(wy, wx) - math.atan2(l2 * math.sin(theta2), l1 + l2 * math.cos(theta2))
+        theta3 = phi - theta1 - theta2
+        return [math.degrees(theta1), math.degrees(theta2), math.degrees(theta3)]
+
+    def solve(self, x, y, z, phi):
+        """
+        One target, as 3DIK.py's analytical_ik_3dof_with_base:
+        [θ0, θ1, θ2, θ3] in degrees or None if unreachable.
+        """
+        angles = self.solve_planar(math.hypot(x, y), z, phi)
+        if angles is None:
+            return None
+        return [math.degrees(math.atan2(y, x))] + angles
@@ -0,0 +1,140 @@
+import collections
+import threading
+
+import numpy as np
+
+TICKS_PER_TURN = 4096
+
+# One published view of every joint, index i is ids[i]. The arrays are
+# read-only and never change once published.
+MultiTurnState = collections.namedtuple('MultiTurnState', ['raw', 'steps', 'rotations', 'targets', 'valid', 'count'])
+
+def _frozen(array):
+    array.flags.writeable = False
+    return array
+
+class MultiTurnTracker(object):
+    """
+    Multi-turn positions of N joints from raw reads that wrap.
+
+    Each raw read is compared with the last one; the difference, taken the
+    short way round modulo `wrap`, is added to the joint's unwrapped step
+    count. So a joint may move at most wrap / 2 between two reads. All
+    joints are unwrapped in one vectorised update().
+
+    - wrap: range of the raw value, 4096 for present position in position
+      mode, 65536 for a 16-bit multi-turn register
+    - ticks_per_turn: steps per output turn, for rotations = steps // ticks_per_turn
+
+    State lives in int64 arrays (index i is ids[i]) and is published as a
+    whole: every update builds new arrays and swaps in one MultiTurnState,
+    so snapshot() is a single attribute read, never blocks and never sees
+    half an update. Writers (update and the target setters) take one lock
+    for the whole vector, so a control loop and other threads may both
+    write without per-joint locks.
+    """
+
+    def __init__(self, ids, wrap=TICKS_PER_TURN, ticks_per_turn=TICKS_PER_TURN):
+        self.ids = list(ids)
+        self.index = dict((sts_id, i) for i, sts_id in enumerate(self.ids))
+        self.wrap = int(wrap)
+        self.half = self.wrap // 2
+        self.ticks_per_turn = int(ticks_per_turn)
+        self.lock = threading.Lock()
+
+        self.complete = False  # every joint has been read
+        zeros = np.zeros(len(self.ids), dtype=np.int64)
+        self.state = MultiTurnState(_frozen(zeros.copy()), _frozen(zeros.copy()), _frozen(zeros.copy()),
+                                    _frozen(zeros.copy()), _frozen(np.zeros(len(self.ids), dtype=bool)), 0)
+
+    def _publish(self, state, raw=None, steps=None, targets=None, valid=None):
+        steps = state.steps if steps is None else _frozen(steps)
+        self.state = MultiTurnState(state.raw if raw is None else _frozen(raw), steps,
+                                    state.rotations if steps is state.steps else _frozen(steps // self.ticks_per_turn),
+                                    state.targets if targets is None else _frozen(targets),
+                                    state.valid if valid is None else _frozen(valid), state.count + 1)
+        return self.state
+
+    def snapshot(self):
+        """The current MultiTurnState, consistent across all joints."""
+        return self.state
+
+    def reset(self, raw, rotations=None):
+        """
+        Start tracking from raw reads (one per joint, in ids order).
+        Steps start at the raw value itself, or at rotations * ticks_per_turn
+        + raw % ticks_per_turn when the turn each joint is on is known.
+        Targets are set to the positions.
+        """
+        raw = np.asarray(raw, dtype=np.int64)
+        if rotations is None:
+            steps = raw.copy()
+        else:
+            steps = np.asarray(rotations, dtype=np.int64) * self.ticks_per_turn + raw % self.ticks_per_turn
+        raw = raw % self.wrap
+        with self.lock:
+            self.complete = True
+            return self._publish(self.state, raw=raw, steps=steps, targets=steps.copy(),
+                                 valid=np.ones(len(self.ids), dtype=bool))
+
+    def update(self, raw, mask=None):
+        """
+        Unwrap one read of every joint. raw holds one value per joint in
+        ids order; mask (optional, boolean) marks the joints read this time,
+        the others keep their state. A joint's first read sets its steps to
+        the raw value. Returns the new MultiTurnState.
+        """
+        raw = np.array(raw, dtype=np.int64)
+        with self.lock:
+            state = self.state
+            delta = raw - state.raw
+            delta += self.half
+            delta %= self.wrap
+            delta -= self.half
+            steps = delta
+            steps += state.steps
+            if mask is None and self.complete:
+                return self._publish(state, raw=raw, steps=steps)
+
+            fresh = ~state.valid if mask is None else mask & ~state.valid
+            steps = np.where(fresh, raw, steps)
+            if mask is not None:
+                steps = np.where(mask, steps, state.steps)
+                raw = np.where(mask, raw, state.raw)
+            valid = state.valid | (True if mask is None else mask)
+            self.complete = bool(valid.all())
+            return self._publish(state, raw=raw, steps=steps, valid=np.asarray(valid, dtype=bool))
+
+    def update_values(self, values):
+        """update() from {id: raw}; IDs missing or None were not read."""
+        mask = np.fromiter((values.get(sts_id) is not None for sts_id in self.ids), dtype=bool, count=len(self.ids))
+        raw = np.fromiter((values[sts_id] if ok else 0 for sts_id, ok in zip(self.ids, mask)),
+                          dtype=np.int64, count=len(self.ids))
+        return self.update(raw, mask)
+
+    def update_states(self, states, field='position'):
+        """update() from a sts.SyncReadState result ({id: state or None})."""
+        return self.update_values(dict((sts_id, None if state is None else state[field])
+                                       for sts_id, state in states.items()))
+
+    def set_targets(self, targets):
+        """Set every joint's target (steps, in ids order)."""
+        with self.lock:
+            return self._publish(self.state, targets=np.asarray(targets, dtype=np.int64).copy())
+
+    def move_target(self, sts_id, delta):
+        """Move one joint's target by delta steps; returns the new target."""
+        with self.lock:
+            targets = self.state.targets.copy()
+            targets[self.index[sts_id]] += int(delta)
+            self._publish(self.state, targets=targets)
+        return int(targets[self.index[sts_id]])
+
+    def steps(self, sts_id):
+        return int(self.state.steps[self.index[sts_id]])
+
+    def rotation(self, sts_id):
+        return int(self.state.rotations[self.index[sts_id]])
+
+    def target(self, sts_id):
+        return int(self.state.targets[self.index[sts_id]])
@@ -0,0 +1,154 @@
+import glob
+import os
+import time
+
+import numpy as np
+
+TELEMETRY_CAPACITY = 4096  # samples kept in RAM
+TELEMETRY_CHUNK = 1024     # samples per spilled file
+
+def backward_difference(values, times):
+    """
+    d values / d t per sample: (x[k] - x[k-1]) / (t[k] - t[k-1]), 0 for the
+    first sample. values is [N] or [N, joints], times is [N].
+    """
+    values = np.asarray(values, dtype=float)
+    result = np.zeros_like(values)
+    if len(values) > 1:
+        dt = np.diff(np.asarray(times, dtype=float))
+        result[1:] = np.diff(values, axis=0) / (dt[:, None] if values.ndim > 1 else dt)
+    return result
+
+def telemetry_runs(spill_dir):
+    """The run directories a TelemetryRecorder made in spill_dir, oldest first."""
+    return sorted(path for path in glob.glob(os.path.join(spill_dir, 'run_*')) if os.path.isdir(path))
+
+def load_telemetry(run_dir):
+    """
+    Every sample of one run (a TelemetryRecorder's run_dir, see
+    telemetry_runs()), in order, as one record array with a 'time' field
+    and one [N, joints] field per channel.
+    """
+    files = sorted(glob.glob(os.path.join(run_dir, 'telemetry_*.npy')))
+    if not files:
+        return None
+    return np.concatenate([np.load(path, mmap_mode='r') for path in files])
+
+class TelemetryRecorder(object):
+    """
+    Fixed-size log of per-joint channels (e.g. target, actual and error
+    angle) against time.
+
+    Samples live in one preallocated record array used as a ring: append()
+    writes one row and moves the head, so its cost and the memory used do
+    not grow with the length of the run. Once capacity samples are logged
+    the oldest are overwritten; window() is the last capacity samples.
+
+    With spill_dir set, every chunk of samples is also saved as one .npy
+    file (telemetry_000000.npy, ...) as soon as it is complete, so a long
+    run keeps all of its history on disk at constant RAM. Each recorder
+    writes to a new run_dir under spill_dir (run_<date>_<time>), so runs
+    sharing a spill_dir never mix. history() and load_telemetry() read the
+    files back memory-mapped. Call flush() at the
+    end to save the last, partial chunk.
+
+    Velocity and acceleration are not logged; velocity() and acceleration()
+    compute them from a channel for the samples asked for, in one
+    vectorised pass.
+    """
+
+    def __init__(self, ids, channels, capacity=TELEMETRY_CAPACITY, spill_dir=None, chunk=TELEMETRY_CHUNK):
+        self.ids = list(ids)
+        self.channels = list(channels)
+        self.capacity = int(capacity)
+        self.chunk = min(int(chunk), self.capacity)
+        self.spill_dir = spill_dir
+        self.dtype = np.dtype([('time', np.float64)] + [(name, np.float64, (len(self.ids),)) for name in self.channels])
+        self.ring = np.zeros(self.capacity, dtype=self.dtype)
+        self.columns = [(name, self.ring[name]) for name in self.channels]  # field views, written by append()
+        self.time_column = self.ring['time']
+        self.count = 0    # samples appended
+        self.spilled = 0  # samples saved to spill_dir
+        self.files = []
+        self.run_dir = None
+        if spill_dir is not None:
+            os.makedirs(spill_dir, exist_ok=True)
+            self.run_dir = self._new_run_dir(spill_dir)
+
+    @staticmethod
+    def _new_run_dir(spill_dir):
+        name = time.strftime('run_%Y%m%d_%H%M%S')
+        for n in range(1000):
+            path = os.path.join(spill_dir, name if n == 0 else '%s_%03d' % (name, n))
+            try:
+                os.mkdir(path)
+                return path
+            except FileExistsError:
+                continue
+        raise FileExistsError("no free run directory in %s" % spill_dir)
+
+    def __len__(self):
+        return self.count
+
+    def append(self, time, **values):
+        """
+        Log one sample at time: one keyword per channel, each with a value
+        per joint in ids order. Channels left out are logged as 0.
+        """
+        i = self.count % self.capacity
+        self.time_column[i] = time
+        for name, column in self.columns:
+            column[i] = values.get(name, 0.0)
+        self.count += 1
+        if self.spill_dir is not None and self.count - self.spilled >= self.chunk:
+            self.flush()
+
+    def flush(self):
+        """Save the samples not yet spilled to a new file in spill_dir."""
+        if self.spill_dir is None or self.count == self.spilled:
+            return None
+        path = os.path.join(self.run_dir, 'telemetry_%06d.npy' % len(self.files))
+        np.save(path, self.ring[np.arange(self.spilled, self.count) % self.capacity])
+        self.files.append(path)
+        self.spilled = self.count
+        return path
+
+    def window(self):
+        """The samples still in RAM (at most capacity), oldest first."""
+        if self.count <= self.capacity:
+            return self.ring[:self.count]
+        head = self.count % self.capacity
+        return np.concatenate((self.ring[head:], self.ring[:head]))
+
+    def history(self):
+        """
+        Every sample of the run, oldest first: the spilled files, then what
+        is not spilled yet. Without spill_dir this is window().
+        """
+        if not self.files:
+            return self.window()
+        tail = self.ring[np.arange(self.spilled, self.count) % self.capacity]
+        return np.concatenate([np.load(path, mmap_mode='r') for path in self.files] + [tail])
+
+    def samples(self, history=False):
+        return self.history() if history else self.window()
+
+    def times(self, history=False):
+        """Sample times, [N]."""
+        return self.samples(history)['time']
+
+    def channel(self, name, history=False):
+        """One channel, [N, joints] (column i is ids[i])."""
+        return self.samples(history)[name]
+
+    def velocity(self, name, history=False):
+        """Rate of change of a channel per second, [N, joints]; 0 for the first sample."""
+        samples = self.samples(history)
+        return backward_difference(samples[name], samples['time'])
+
+    def acceleration(self, name, history=False):
+        """Rate of change of velocity(name), [N, joints]; 0 for the first two samples."""
+        samples = self.samples(history)
+        acceleration = backward_difference(backward_difference(samples[name], samples['time']), samples['time'])
+        acceleration[:2] = 0.0  # the first velocity is not a measured one
+        return acceleration
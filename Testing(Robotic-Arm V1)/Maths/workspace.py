@@ -0,0 +1,280 @@
+import math
+
+import numpy as np
+
+from .batch_ik import *
+
+# Servo ticks <-> joint angles, as 3DIK.py and positionController.py drive the arm:
+# goal ticks = (servo angle - starting angle) * TICKS_PER_TURN / 18 (20:1 gearing),
+# with servo angles θ0, θ1, -θ2 and 450 - θ3 (degrees) for servos 1-4.
+TICKS_PER_TURN = 4096
+DEGREES_PER_TICK = 18.0 / TICKS_PER_TURN
+STARTING_ANGLES = [0, 67.7, -148, 48]
+JOINT_SIGNS = [1, 1, -1, -1]
+JOINT_OFFSETS = [0, 0, 0, 450]
+
+# Goal range in ticks for servos 1-4 (ServoPythonCode/README.md). Pass the
+# servos' own STS_MIN/MAX_ANGLE_LIMIT values instead where they are set.
+SERVO_TICK_LIMITS = [(0, 32767), (0, 17000), (0, 24000), (0, 26400)]
+
+def joint_limits_from_ticks(tick_limits=SERVO_TICK_LIMITS, starting_angles=STARTING_ANGLES):
+    """
+    Joint angle limits [4, 2] (lo, hi) in radians for θ0..θ3 from servo goal
+    limits in ticks. (0, 0) means the servo has no limit.
+    """
+    limits = np.empty((4, 2))
+    for joint, (lo, hi) in enumerate(tick_limits):
+        if lo == hi == 0:
+            limits[joint] = (-np.pi, np.pi)
+            continue
+        servo = starting_angles[joint] + np.array([lo, hi]) * DEGREES_PER_TICK
+        angles = np.sort(JOINT_SIGNS[joint] * (servo - JOINT_OFFSETS[joint]))
+        limits[joint] = np.radians(angles)
+    return limits
+
+def in_limits(angle, lo, hi):
+    """
+    Whether angle (radians, any turn) lies in [lo, hi] modulo a full turn.
+    """
+    if hi - lo >= 2 * np.pi:
+        return np.ones(np.shape(angle), dtype=bool)
+    return np.mod(angle - lo, 2 * np.pi) <= hi - lo
+
+def clamp_angle(angle, lo, hi):
+    """
+    The angle in [lo, hi] closest to angle, all modulo a full turn.
+    """
+    if hi - lo >= 2 * np.pi:
+        return angle
+    offset = np.mod(angle - lo, 2 * np.pi)
+    past_hi = offset - (hi - lo)
+    before_lo = 2 * np.pi - offset
+    return np.where(offset <= hi - lo, lo + offset, np.where(past_hi < before_lo, hi, lo))
+
+class WorkspaceMap(object):
+    """
+    Voxel reachability map of the 3-DOF + base arm.
+
+    The arm's reach in its own plane comes from sampling θ1..θ3 within the
+    joint limits and running batched FK with θ0 = 0: a planar grid over
+    signed reach r (negative = behind the base) and height z. A voxel is
+    reachable when some θ0 within limits turns that plane onto it: its
+    centre is in the planar reach at +r with θ0 = its azimuth, or at -r
+    with θ0 = its azimuth + π. With a fixed phi, only samples whose
+    θ3 = phi - θ1 - θ2 is within limits count.
+
+    occupancy is a uint8 [n_x, n_y, n_z] grid for O(1) isReachable();
+    nearest maps every planar cell to the closest reachable one for O(1)
+    clamp(). save() writes .npy files (occupancy, .nearest.npy, .planar.npy,
+    .axes.npy) and load() memory-maps them.
+    """
+
+    def __init__(self, occupancy, planar, nearest, axes):
+        self.occupancy = occupancy
+        self.planar = planar
+        self.nearest = nearest
+        # resolution, reach, z0, theta0_lo, theta0_hi, phi (NaN = any),
+        # then l1, l2, l3 and the [4, 2] joint limits the map was built for
+        self.axes = np.asarray(axes, dtype=float)
+        (self.resolution, self.reach, self.z0,
+         self.theta0_lo, self.theta0_hi, self.phi) = [float(a) for a in self.axes[:6]]
+        # None for maps saved before these were stored
+        self.lengths = tuple(float(a) for a in self.axes[6:9]) if len(self.axes) >= 17 else None
+        self.joint_limits = self.axes[9:17].reshape(4, 2) if len(self.axes) >= 17 else None
+        self.n_r, self.n_z = planar.shape  # signed reach -reach..reach, height z0..
+        self.r0 = -self.reach
+
+    @classmethod
+    def build(cls, joint_limits=None, phi=None, resolution=1.0, z_range=(-75.0, 75.0), step=None,
+              chunk=1000000, l1=l1, l2=l2, l3=l3):
+        """
+        joint_limits: [4, 2] radians (joint_limits_from_ticks() by default)
+        phi: fixed end-effector orientation (radians), or None for any
+        resolution: voxel size (cm)
+        step: joint sampling step (radians); by default small enough that
+              neighbouring samples land at most half a voxel apart
+        """
+        if joint_limits is None:
+            joint_limits = joint_limits_from_ticks()
+        joint_limits = np.asarray(joint_limits, dtype=float)
+        reach = resolution * math.ceil((l1 + l2 + l3) / resolution)
+        if step is None:
+            step = 0.5 * resolution / (l1 + l2 + l3)
+
+        n_r = int(round(2 * reach / resolution)) + 1
+        n_z = int(round((z_range[1] - z_range[0]) / resolution)) + 1
+        planar = np.zeros((n_r, n_z), dtype=bool)
+
+        def samples(joint):
+            lo, hi = joint_limits[joint]
+            return np.linspace(lo, hi, int(math.ceil((hi - lo) / step)) + 1)
+
+        # Batched FK over the θ1, θ2 (, θ3) sample grid, one chunk of θ1 at a time
+        theta1, theta2 = samples(1), samples(2)
+        theta3 = samples(3) if phi is None else None
+        per_sample = len(theta2) * (len(theta3) if phi is None else 1)
+        rows = max(1, chunk // per_sample)
+        for start in range(0, len(theta1), rows):
+            if phi is None:
+                t1, t2, t3 = np.meshgrid(theta1[start:start + rows], theta2, theta3, indexing='ij')
+            else:
+                t1, t2 = np.meshgrid(theta1[start:start + rows], theta2, indexing='ij')
+                t3 = phi - t1 - t2
+                keep = in_limits(t3, *joint_limits[3])
+                t1, t2, t3 = t1[keep], t2[keep], t3[keep]
+            angles = np.stack([np.zeros(t1.shape), t1, t2, t3], axis=-1).reshape(-1, 4)
+            position, _ = batch_fk_3dof_with_base(angles, l1, l2, l3)
+            ir = np.rint((position[:, 0] + reach) / resolution).astype(np.intp)
+            iz = np.rint((position[:, 2] - z_range[0]) / resolution).astype(np.intp)
+            inside = (iz >= 0) & (iz < n_z)
+            planar[ir[inside], iz[inside]] = True
+
+        # Revolve the plane over the θ0 limits
+        axis = -reach + resolution * np.arange(n_r)
+        xg, yg = np.meshgrid(axis, axis, indexing='ij')
+        rho = np.hypot(xg, yg)
+        azimuth = np.arctan2(yg, xg)
+        front = np.rint((rho + reach) / resolution).astype(np.intp)
+        back = np.rint((reach - rho) / resolution).astype(np.intp)
+        in_reach = rho <= reach
+        front = np.where(in_reach, front, 0)
+        back = np.where(in_reach, back, 0)
+        front_ok = (in_reach & in_limits(azimuth, *joint_limits[0]))[..., None]
+        back_ok = (in_reach & in_limits(azimuth + np.pi, *joint_limits[0]))[..., None]
+        occupancy = ((planar[front] & front_ok) | (planar[back] & back_ok)).astype(np.uint8)
+
+        axes = [resolution, reach, z_range[0], joint_limits[0][0], joint_limits[0][1],
+                np.nan if phi is None else phi, l1, l2, l3] + joint_limits.ravel().tolist()
+        return cls(occupancy, planar.astype(np.uint8), cls._nearest(planar), axes)
+
+    def matches(self, joint_limits, phi=None, l1=l1, l2=l2, l3=l3):
+        """
+        Whether the map was built for these joint limits ([4, 2] radians),
+        phi and link lengths; a saved map that does not match is stale.
+        """
+        if self.lengths is None or not np.allclose(self.lengths, (l1, l2, l3)):
+            return False
+        if not np.allclose(self.joint_limits, joint_limits):
+            return False
+        if phi is None:
+            return bool(np.isnan(self.phi))
+        return bool(np.isclose(self.phi, phi))
+
+    @staticmethod
+    def _nearest(planar):
+        """
+        Flat index of the closest reachable planar cell, for every cell.
+        Only edge cells can be the closest one to an unreachable cell.
+        """
+        n_z = planar.shape[1]
+        padded = np.pad(planar, 1)
+        interior = padded[:-2, 1:-1] & padded[2:, 1:-1] & padded[1:-1, :-2] & padded[1:-1, 2:]
+        edge = np.flatnonzero(planar & ~interior)
+        nearest = np.arange(planar.size, dtype=np.int32)
+        if not len(edge):
+            return nearest.reshape(planar.shape)
+
+        er, ez = np.divmod(edge, n_z)
+        outside = np.flatnonzero(~planar.ravel())
+        for start in range(0, len(outside), 4096):
+            cells = outside[start:start + 4096]
+            cr, cz = np.divmod(cells, n_z)
+            d = (cr[:, None] - er[None, :])**2 + (cz[:, None] - ez[None, :])**2
+            nearest[cells] = edge[np.argmin(d, axis=1)]
+        return nearest.reshape(planar.shape)
+
+    def save(self, path):
+        np.save(path, self.occupancy)
+        np.save(path + '.planar.npy', self.planar)
+        np.save(path + '.nearest.npy', self.nearest)
+        np.save(path + '.axes.npy', self.axes)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        return cls(np.load(path, mmap_mode=mmap_mode), np.load(path + '.planar.npy', mmap_mode=mmap_mode),
+                   np.load(path + '.nearest.npy', mmap_mode=mmap_mode), np.load(path + '.axes.npy'))
+
+    def reachable(self, x, y, z):
+        """
+        Batch query: boolean array, True where (x, y, z) (cm) is in a reachable voxel.
+        """
+        x, y, z = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (x, y, z)))
+        res = self.resolution
+        ix = np.rint((x - self.r0) / res).astype(np.intp)
+        iy = np.rint((y - self.r0) / res).astype(np.intp)
+        iz = np.rint((z - self.z0) / res).astype(np.intp)
+        n_x, n_y, n_z = self.occupancy.shape
+        inside = (ix >= 0) & (ix < n_x) & (iy >= 0) & (iy < n_y) & (iz >= 0) & (iz < n_z)
+        out = np.zeros(x.shape, dtype=bool)
+        out[inside] = self.occupancy[ix[inside], iy[inside], iz[inside]] > 0
+        return out
+
+    def isReachable(self, x, y, z):
+        res = self.resolution
+        ix = int(round((x - self.r0) / res))
+        iy = int(round((y - self.r0) / res))
+        iz = int(round((z - self.z0) / res))
+        n_x, n_y, n_z = self.occupancy.shape
+        return 0 <= ix < n_x and 0 <= iy < n_y and 0 <= iz < n_z and self.occupancy[ix, iy, iz] > 0
+
+    def clamp(self, x, y, z):
+        """
+        Batch clamp: the nearest reachable point to each (x, y, z) (cm);
+        reachable targets come back unchanged.
+
+        The plane of the arm is tried at up to four base angles: the
+        target's azimuth and the opposite one (if within the θ0 limits) and
+        the two θ0 limits. In each, the target is projected onto the plane
+        and moved to the nearest reachable planar cell; the closest of
+        those wins. Answers are good to about a voxel.
+        """
+        x, y, z = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (x, y, z)))
+        shape = x.shape
+        x, y, z = x.ravel(), y.ravel(), z.ravel()
+        res = self.resolution
+        rho = np.hypot(x, y)
+        azimuth = np.arctan2(y, x)
+        iz = np.clip(np.rint((z - self.z0) / res).astype(np.intp), 0, self.n_z - 1)
+
+        best = np.full(x.shape, np.inf)
+        out_x, out_y, out_z = x.copy(), y.copy(), z.copy()
+        candidates = [clamp_angle(azimuth, self.theta0_lo, self.theta0_hi),
+                      clamp_angle(azimuth + np.pi, self.theta0_lo, self.theta0_hi),
+                      np.full(x.shape, self.theta0_lo), np.full(x.shape, self.theta0_hi)]
+        for theta0 in candidates:
+            along = rho * np.cos(azimuth - theta0)   # signed reach in the plane at theta0
+            across = rho * np.sin(azimuth - theta0)  # distance off that plane
+            ir = np.clip(np.rint((along - self.r0) / res).astype(np.intp), 0, self.n_r - 1)
+            nr, nz = np.divmod(self.nearest[ir, iz], self.n_z)
+            r = self.r0 + nr * res
+            h = self.z0 + nz * res
+            exact = (nr == ir) & (nz == iz) & (np.abs(along - r) <= res) & (np.abs(z - h) <= res)
+            r = np.where(exact, along, r)
+            h = np.where(exact, z, h)
+            d = across**2 + (along - r)**2 + (z - h)**2
+            better = d < best
+            best = np.where(better, d, best)
+            out_x = np.where(better, r * np.cos(theta0), out_x)
+            out_y = np.where(better, r * np.sin(theta0), out_y)
+            out_z = np.where(better, h, out_z)
+
+        # a planar cell turned onto the voxel grid can round into an empty
+        # voxel: take the closest reachable voxel centre around it instead
+        missed = ~self.reachable(out_x, out_y, out_z)
+        if missed.any():
+            target = np.stack([x[missed], y[missed], z[missed]], axis=-1)
+            origin = np.array([self.r0, self.r0, self.z0])
+            centre = np.rint((np.stack([out_x[missed], out_y[missed], out_z[missed]], axis=-1) - origin) / res)
+            offsets = np.stack(np.meshgrid([-1, 0, 1], [-1, 0, 1], [-1, 0, 1], indexing='ij'), axis=-1).reshape(-1, 3)
+            around = centre[:, None, :] + offsets[None, :, :]
+            points = origin + around * res
+            d = np.sum((points - target[:, None, :])**2, axis=-1)
+            d[~self.reachable(points[..., 0], points[..., 1], points[..., 2])] = np.inf
+            pick = np.argmin(d, axis=1)
+            found = np.isfinite(d[np.arange(len(pick)), pick])
+            chosen = points[np.arange(len(pick)), pick]
+            for out, column in ((out_x, 0), (out_y, 1), (out_z, 2)):
+                out[np.flatnonzero(missed)[found]] = chosen[found, column]
+
+        keep = self.reachable(x, y, z)
+        return tuple(np.where(keep, a, out).reshape(shape) for a, out in ((x, out_x), (y, out_y), (z, out_z)))
@@ -6,3 +6,14 @@ from .group_sync_write import *
 from .group_sync_read import *
 from .sts import *
 from .scscl import *
+from .transaction_engine import *
+from .async_sts import *
+from .control_loop import *
+from .goal_cache import *
+from .register_mirror import *
+from .bus_trace import *
+from .adaptive_timeout import *
+from .bus_group import *
+from .trajectory import *
+from .settle import *
+from .state_exchange import *
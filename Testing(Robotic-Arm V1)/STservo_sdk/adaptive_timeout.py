@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+import time
+
+from .stservo_def import *
+from .port_handler import LATENCY_TIMER
+
+
+class AdaptiveTimeout(object):
+    # Per-ID packet timeouts learned from measured response latency.
+    #
+    # Latency is the time from sending an instruction to the end of its
+    # status packet, minus the packet's own wire time. Like TCP's RTO
+    # (RFC 6298) each ID keeps a smoothed latency and its mean deviation:
+    #
+    #   rttvar = (1 - beta) * rttvar + beta * |srtt - sample|
+    #   srtt   = (1 - alpha) * srtt + alpha * sample
+    #   timeout = wire time + clamp(srtt + k * rttvar, floor, ceiling)
+    #
+    # IDs with no samples yet get `initial`. Each timeout doubles the
+    # deviation so a too-tight estimate backs off. After quarantine_after
+    # timeouts in a row an ID is quarantined for quarantine_time seconds:
+    # admit() returns False and the packet handler answers COMM_RX_TIMEOUT
+    # without using the bus. The first request after that is a probe; one
+    # more timeout quarantines it again.
+    #
+    # Times are in ms, like PortHandler.setPacketTimeoutMillis. clock (integer
+    # ns) times the quarantine; pass the port's clock when it is simulated.
+
+    def __init__(self, floor=2.0, ceiling=LATENCY_TIMER, initial=LATENCY_TIMER,
+                 quarantine_after=3, quarantine_time=1.0, alpha=0.125, beta=0.25, k=4.0,
+                 clock=time.monotonic_ns):
+        self.floor = floor
+        self.ceiling = ceiling
+        self.initial = initial
+        self.quarantine_after = quarantine_after
+        self.quarantine_time = quarantine_time
+        self.alpha = alpha
+        self.beta = beta
+        self.k = k
+        self.clock = clock
+
+        self.srtt = {}
+        self.rttvar = {}
+        self.misses = {}
+        self.quarantined_until = {}
+        self.quarantine_count = 0
+        self.skipped_count = 0  # requests answered from quarantine
+
+    def getLatency(self, sts_id):
+        if sts_id not in self.srtt:
+            return self.initial
+        return min(max(self.srtt[sts_id] + self.k * self.rttvar[sts_id], self.floor), self.ceiling)
+
+    def getTimeout(self, sts_ids, packet_length, tx_time_per_byte):
+        # ms to wait for packet_length bytes from sts_ids (an ID or a list)
+        if isinstance(sts_ids, int):
+            latency = self.getLatency(sts_ids)
+        else:
+            latency = max(self.getLatency(sts_id) for sts_id in sts_ids)
+        return (tx_time_per_byte * packet_length) + (tx_time_per_byte * 3.0) + latency
+
+    def isQuarantined(self, sts_id):
+        return sts_id in self.quarantined_until
+
+    def admit(self, sts_id):
+        # False while sts_id is quarantined
+        until = self.quarantined_until.get(sts_id)
+        if until is None:
+            return True
+        if self.clock() >= until:
+            del self.quarantined_until[sts_id]
+            self.misses[sts_id] = self.quarantine_after - 1  # probe: one more miss re-quarantines
+            return True
+        self.skipped_count += 1
+        return False
+
+    def update(self, sts_id, result, latency=None):
+        # Feed the result of a request to sts_id, with its latency (ms) if measured
+        if result == COMM_SUCCESS:
+            self.misses[sts_id] = 0
+            if latency is None:
+                return
+            latency = max(latency, 0.0)
+            if sts_id not in self.srtt:
+                self.srtt[sts_id] = latency
+                self.rttvar[sts_id] = latency / 2.0
+            else:
+                self.rttvar[sts_id] += self.beta * (abs(self.srtt[sts_id] - latency) - self.rttvar[sts_id])
+                self.srtt[sts_id] += self.alpha * (latency - self.srtt[sts_id])
+
+        elif result == COMM_RX_TIMEOUT:
+            if sts_id in self.rttvar:
+                self.rttvar[sts_id] = min(max(self.rttvar[sts_id], self.floor / self.k) * 2.0, self.ceiling)
+            self.misses[sts_id] = self.misses.get(sts_id, 0) + 1
+            if self.misses[sts_id] >= self.quarantine_after:
+                self.quarantined_until[sts_id] = self.clock() + int(self.quarantine_time * 1000000000)
+                self.quarantine_count += 1
+
+    def reset(self, sts_id=None):
+        # Forget what was learned (for every ID by default)
+        for table in (self.srtt, self.rttvar, self.misses, self.quarantined_until):
+            if sts_id is None:
+                table.clear()
+            else:
+                table.pop(sts_id, None)
@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+
+import os
+import select
+import asyncio
+
+from .stservo_def import *
+from .port_handler import *
+from .protocol_packet_handler import *
+from .group_sync_write import *
+from .sts import *
+
+
+class AsyncPortHandler(object):
+    # asyncio transport over an open PortHandler.
+    #
+    # The serial fd is registered with the event loop (loop.add_reader), so
+    # waiting for a status packet yields to other tasks instead of spinning
+    # or blocking a thread. Bus access is serialised with an asyncio.Lock.
+    # Needs a selector event loop and a real fd (POSIX serial ports / ptys).
+
+    def __init__(self, portHandler):
+        self.portHandler = portHandler
+        self.loop = None
+        self.lock = None
+        self.rx_buffer = bytearray()
+        self.rx_waiter = None
+        self.fd = None
+
+    def attach(self, loop=None):
+        self.loop = loop or asyncio.get_running_loop()
+        self.lock = asyncio.Lock()
+        self.fd = self.portHandler.ser.fileno()
+        self.loop.add_reader(self.fd, self._onReadable)
+
+    def detach(self):
+        if self.loop is not None:
+            self.loop.remove_reader(self.fd)
+            self.loop = None
+
+    def _onReadable(self):
+        try:
+            data = os.read(self.fd, 4096)
+        except BlockingIOError:
+            return
+        if data:
+            if self.portHandler.tracer is not None:
+                self.portHandler.tracer.record(TRACE_RX, data)
+            self.rx_buffer.extend(data)
+            self._wake(True)
+
+    def _wake(self, received):
+        if self.rx_waiter is not None and not self.rx_waiter.done():
+            self.rx_waiter.set_result(received)
+
+    def _discardInput(self):
+        # Drop bytes left from earlier requests (e.g. a reply that came in
+        # after its request timed out) so they cannot match the next one
+        while select.select([self.fd], [], [], 0)[0]:
+            try:
+                data = os.read(self.fd, 4096)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            if self.portHandler.tracer is not None:
+                self.portHandler.tracer.record(TRACE_RX, data)
+        self.rx_buffer.clear()
+
+    def _takeStatusPacket(self):
+        # -> (packet, result) for the next complete status packet, or None
+        buf = self.rx_buffer
+        while True:
+            idx = buf.find(b'\xff\xff')
+            if idx < 0:
+                del buf[:-1]  # keep the last byte, it may start a header
+                return None
+            del buf[:idx]
+            if len(buf) < 6:  # HEADER0 HEADER1 ID LENGTH ERROR CHKSUM
+                return None
+            if (buf[PKT_ID] > 0xFD) or (buf[PKT_LENGTH] > RXPACKET_MAX_LEN) or (buf[PKT_ERROR] > 0x7F):
+                del buf[0]
+                continue
+            packet_length = buf[PKT_LENGTH] + PKT_LENGTH + 1
+            if len(buf) < packet_length:
+                return None
+            packet = bytes(buf[:packet_length])
+            del buf[:packet_length]
+            if packet[-1] == ~sum(packet[PKT_ID:-1]) & 0xFF:
+                return packet, COMM_SUCCESS
+            return packet, COMM_RX_CORRUPT
+
+    async def _waitForData(self, deadline):
+        remaining = deadline - self.loop.time()
+        if remaining <= 0:
+            return False
+        self.rx_waiter = self.loop.create_future()
+        timer = self.loop.call_later(remaining, self._wake, False)
+        try:
+            return await self.rx_waiter
+        finally:
+            timer.cancel()
+            self.rx_waiter = None
+
+    def _deadline(self, packet_length):
+        # same budget as PortHandler.setPacketTimeout
+        portHandler = self.portHandler
+        msec = (portHandler.tx_time_per_byte * packet_length) + (portHandler.tx_time_per_byte * 3.0) + LATENCY_TIMER
+        return self.loop.time() + msec / 1000.0
+
+    async def txRxPacket(self, packet, sts_ids, rx_length):
+        # Send packet, then collect one status packet from each of sts_ids.
+        # -> ({id: (packet, result)}, result)
+        async with self.lock:
+            self._discardInput()
+            if self.portHandler.writePort(packet) != len(packet):
+                return {}, COMM_TX_FAIL
+            if not sts_ids:
+                return {}, COMM_SUCCESS
+
+            replies = {}
+            deadline = self._deadline(rx_length * len(sts_ids))
+            while len(replies) < len(sts_ids):
+                status = self._takeStatusPacket()
+                if status is None:
+                    if not await self._waitForData(deadline):
+                        break
+                    continue
+                if status[0][PKT_ID] in sts_ids and replies.get(status[0][PKT_ID], (None, None))[1] != COMM_SUCCESS:
+                    replies[status[0][PKT_ID]] = status
+
+            result = next((r for _, r in replies.values() if r != COMM_SUCCESS), COMM_SUCCESS)
+            if (result == COMM_SUCCESS) and (len(replies) < len(sts_ids)):
+                # a partial packet left in the buffer counts as corrupt, like rxPacket
+                result = COMM_RX_CORRUPT if self.rx_buffer else COMM_RX_TIMEOUT
+            return replies, result
+
+
+class async_sts(object):
+    # async versions of the sts packet API, on top of an AsyncPortHandler.
+    # Results have the same shape as the matching sts methods.
+
+    def __init__(self, asyncPortHandler):
+        self.port = asyncPortHandler
+        self.ph = sts(asyncPortHandler.portHandler)  # packet encoding / decoding helpers
+        self.groupSyncWrite = GroupSyncWrite(self.ph, STS_ACC, 7)
+
+    async def _txRx(self, sts_id, instruction, head=(), param=(), rx_length=6):
+        packet = self.ph.makePacket(sts_id, instruction, head, param)
+        if sts_id == BROADCAST_ID:
+            _, result = await self.port.txRxPacket(packet, (), rx_length)
+            return None, result, 0
+        replies, result = await self.port.txRxPacket(packet, (sts_id,), rx_length)
+        if result != COMM_SUCCESS:
+            return None, result, 0
+        rxpacket = replies[sts_id][0]
+        return rxpacket, result, rxpacket[PKT_ERROR]
+
+    async def ping(self, sts_id):
+        model_number = 0
+        if sts_id >= BROADCAST_ID:
+            return model_number, COMM_NOT_AVAILABLE, 0
+        _, result, error = await self._txRx(sts_id, INST_PING)
+        if result == COMM_SUCCESS:
+            model_number, result, error = await self.read2ByteTxRx(sts_id, STS_MODEL_L)
+        return model_number, result, error
+
+    async def readTxRx(self, sts_id, address, length):
+        if sts_id >= BROADCAST_ID:
+            return [], COMM_NOT_AVAILABLE, 0
+        rxpacket, result, error = await self._txRx(sts_id, INST_READ, (address, length), (), length + 6)
+        if result != COMM_SUCCESS:
+            return [], result, error
+        return list(rxpacket[PKT_PARAMETER0: PKT_PARAMETER0 + length]), result, error
+
+    async def read1ByteTxRx(self, sts_id, address):
+        data, result, error = await self.readTxRx(sts_id, address, 1)
+        return (data[0] if result == COMM_SUCCESS else 0), result, error
+
+    async def read2ByteTxRx(self, sts_id, address):
+        data, result, error = await self.readTxRx(sts_id, address, 2)
+        return (self.ph.sts_makeword(data[0], data[1]) if result == COMM_SUCCESS else 0), result, error
+
+    async def read4ByteTxRx(self, sts_id, address):
+        data, result, error = await self.readTxRx(sts_id, address, 4)
+        data_read = self.ph.sts_makedword(self.ph.sts_makeword(data[0], data[1]),
+                                          self.ph.sts_makeword(data[2], data[3])) if (result == COMM_SUCCESS) else 0
+        return data_read, result, error
+
+    async def writeTxRx(self, sts_id, address, length, data):
+        _, result, error = await self._txRx(sts_id, INST_WRITE, (address,), data[0: length])
+        return result, error
+
+    async def write1ByteTxRx(self, sts_id, address, data):
+        return await self.writeTxRx(sts_id, address, 1, [data])
+
+    async def write2ByteTxRx(self, sts_id, address, data):
+        return await self.writeTxRx(sts_id, address, 2, [self.ph.sts_lobyte(data), self.ph.sts_hibyte(data)])
+
+    async def ReadPos(self, sts_id):
+        sts_present_position, sts_comm_result, sts_error = await self.read2ByteTxRx(sts_id, STS_PRESENT_POSITION_L)
+        return self.ph.sts_tohost(sts_present_position, 15), sts_comm_result, sts_error
+
+    async def ReadSpeed(self, sts_id):
+        sts_present_speed, sts_comm_result, sts_error = await self.read2ByteTxRx(sts_id, STS_PRESENT_SPEED_L)
+        return self.ph.sts_tohost(sts_present_speed, 15), sts_comm_result, sts_error
+
+    async def ReadPosSpeed(self, sts_id):
+        sts_present_position_speed, sts_comm_result, sts_error = await self.read4ByteTxRx(sts_id, STS_PRESENT_POSITION_L)
+        sts_present_position = self.ph.sts_loword(sts_present_position_speed)
+        sts_present_speed = self.ph.sts_hiword(sts_present_position_speed)
+        return self.ph.sts_tohost(sts_present_position, 15), self.ph.sts_tohost(sts_present_speed, 15), sts_comm_result, sts_error
+
+    async def ReadMoving(self, sts_id):
+        return await self.read1ByteTxRx(sts_id, STS_MOVING)
+
+    async def WritePosEx(self, sts_id, position, speed, acc):
+        txpacket = [acc, self.ph.sts_lobyte(position), self.ph.sts_hibyte(position), 0, 0, self.ph.sts_lobyte(speed), self.ph.sts_hibyte(speed)]
+        return await self.writeTxRx(sts_id, STS_ACC, len(txpacket), txpacket)
+
+    async def WriteSignedPosEx(self, sts_id, signed_position, speed, acc):
+        position = signed_position & 0xFFFF  # 2's complement conversion
+        txpacket = [acc, position & 0xFF, (position >> 8) & 0xFF, 0, 0, speed & 0xFF, (speed >> 8) & 0xFF]
+        return await self.writeTxRx(sts_id, STS_ACC, len(txpacket), txpacket)
+
+    def SyncWritePosEx(self, sts_id, position, speed, acc):
+        # queues a goal like sts.SyncWritePosEx; send with SyncWriteTxPacket()
+        txpacket = [acc, self.ph.sts_lobyte(position), self.ph.sts_hibyte(position), 0, 0, self.ph.sts_lobyte(speed), self.ph.sts_hibyte(speed)]
+        return self.groupSyncWrite.addParam(sts_id, txpacket)
+
+    async def SyncWriteTxPacket(self):
+        groupSyncWrite = self.groupSyncWrite
+        if not groupSyncWrite.data_dict:
+            return COMM_NOT_AVAILABLE
+        groupSyncWrite.makeParam()
+        _, result, _ = await self._txRx(BROADCAST_ID, INST_SYNC_WRITE,
+                                        (groupSyncWrite.start_address, groupSyncWrite.data_length),
+                                        groupSyncWrite.param)
+        return result
+
+    async def SyncReadState(self, sts_ids, fields=None):
+        # async sts.SyncReadState
+        if fields is None:
+            fields = list(STS_STATE_FIELDS)
+        start_address = min(STS_STATE_FIELDS[f][0] for f in fields)
+        data_length = max(STS_STATE_FIELDS[f][0] + STS_STATE_FIELDS[f][1] for f in fields) - start_address
+
+        packet = self.ph.makePacket(BROADCAST_ID, INST_SYNC_READ, (start_address, data_length), sts_ids)
+        replies, sts_comm_result = await self.port.txRxPacket(packet, tuple(sts_ids), data_length + 6)
+
+        states = {}
+        for sts_id in sts_ids:
+            rxpacket, result = replies.get(sts_id, (None, COMM_RX_TIMEOUT))
+            if result != COMM_SUCCESS or rxpacket[PKT_LENGTH] != data_length + 2:
+                states[sts_id] = None
+                continue
+            state = {'error': rxpacket[PKT_ERROR]}
+            for f in fields:
+                address, length, sign_bit = STS_STATE_FIELDS[f]
+                idx = PKT_PARAMETER0 + address - start_address
+                value = rxpacket[idx] if length == 1 else self.ph.sts_makeword(rxpacket[idx], rxpacket[idx + 1])
+                state[f] = value if sign_bit is None else self.ph.sts_tohost(value, sign_bit)
+            states[sts_id] = state
+        return states, sts_comm_result
+
+    async def AwaitSettled(self, sts_ids, tolerance=SETTLE_TOLERANCE, timeout=5.0, goals=None, wrap=None):
+        # async sts.AwaitSettled: other tasks run between polls
+        monitor = SettleMonitor(sts_ids, tolerance, goals, wrap)
+        deadline = self.port.loop.time() + timeout
+        while True:
+            states, _ = await self.SyncReadState(sts_ids, SETTLE_FIELDS)
+            if monitor.update(states):
+                return True, states
+            if self.port.loop.time() + monitor.period > deadline:
+                return False, states
+            await asyncio.sleep(monitor.period)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .stservo_def import *
+from .sts import *
+from .goal_cache import *
+
+
+class _Bus(object):
+    __slots__ = ('ph', 'ids', 'goalCache', 'executor')
+
+    def __init__(self, ph, name):
+        self.ph = ph
+        self.ids = []
+        self.goalCache = GoalWriteCache(ph)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+
+
+class BusGroup(object):
+    # Several sts buses (one PortHandler per USB adapter) driven as one.
+    #
+    # Each bus gets its own worker thread, so its transactions stay in order
+    # while the buses run side by side: the serial I/O releases the GIL, and
+    # loop rate grows with the number of adapters. Servo IDs are mapped to
+    # buses with addBus() or scan(); an ID must be unique across the group.
+    #
+    # ReadState() sync-reads every bus at once and merges the replies;
+    # WriteGoals() sends each bus its goals in one change-only sync write
+    # (GoalWriteCache). Like TransactionEngine, the group owns its ports
+    # while it is in use: go through run() rather than calling a bus's
+    # packet handler from another thread.
+
+    def __init__(self):
+        self.buses = []
+        self.bus_of = {}  # sts_id -> _Bus
+
+    def addBus(self, ph, sts_ids=()):
+        # Add a bus (an sts on an open PortHandler) with the IDs on it; returns its index
+        bus = _Bus(ph, "sts_bus%d" % len(self.buses))
+        self.buses.append(bus)
+        for sts_id in sts_ids:
+            self.addServo(sts_id, len(self.buses) - 1)
+        return len(self.buses) - 1
+
+    def addServo(self, sts_id, bus_index):
+        old = self.bus_of.get(sts_id)
+        if old is not None:
+            old.ids.remove(sts_id)
+        bus = self.buses[bus_index]
+        bus.ids.append(sts_id)
+        self.bus_of[sts_id] = bus
+
+    def getBus(self, sts_id):
+        # The packet handler of the bus sts_id is on, or None
+        bus = self.bus_of.get(sts_id)
+        return bus.ph if bus is not None else None
+
+    def close(self):
+        for bus in self.buses:
+            bus.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def run(self, fn, buses=None):
+        # Call fn(ph, sts_ids) on each bus in its own thread; list of return values
+        buses = self.buses if buses is None else buses
+        futures = [bus.executor.submit(fn, bus.ph, list(bus.ids)) for bus in buses]
+        return [future.result() for future in futures]
+
+    def _split(self, sts_ids):
+        # ({bus: [ids]} for the mapped IDs in bus order, [IDs on no bus])
+        split = dict((bus, []) for bus in self.buses)
+        unmapped = []
+        for sts_id in sts_ids:
+            bus = self.bus_of.get(sts_id)
+            if bus is None:
+                unmapped.append(sts_id)
+            else:
+                split[bus].append(sts_id)
+        return dict((bus, ids) for bus, ids in split.items() if ids), unmapped
+
+    def scan(self, sts_ids):
+        # Ping sts_ids on every bus and map each ID to the bus that answered.
+        # Returns {sts_id: bus index} for the IDs found.
+        def ping(ph, _):
+            return [sts_id for sts_id in sts_ids if ph.ping(sts_id)[1] == COMM_SUCCESS]
+
+        found = {}
+        for index, ids in enumerate(self.run(ping)):
+            for sts_id in ids:
+                if sts_id not in found:
+                    self.addServo(sts_id, index)
+                    found[sts_id] = index
+        return found
+
+    def ReadState(self, sts_ids=None, fields=None):
+        # One sync read per bus, all buses at once.
+        # Returns ({id: state or None}, comm_result) as sts.SyncReadState;
+        # comm_result is the first failure of any bus. IDs on no bus (not
+        # added, or not found by scan()) get None and COMM_NOT_AVAILABLE.
+        split, unmapped = self._split(self.bus_of if sts_ids is None else sts_ids)
+        futures = [bus.executor.submit(bus.ph.SyncReadState, ids, fields) for bus, ids in split.items()]
+
+        states = dict((sts_id, None) for sts_id in unmapped)
+        sts_comm_result = COMM_NOT_AVAILABLE if unmapped else COMM_SUCCESS
+        for future in futures:
+            bus_states, result = future.result()
+            states.update(bus_states)
+            if sts_comm_result == COMM_SUCCESS:
+                sts_comm_result = result
+        return states, sts_comm_result
+
+    def WriteGoals(self, goals, speed, acc):
+        # {sts_id: position}: one change-only sync write per bus, all buses at once.
+        # Goals for IDs on no bus are skipped and reported as COMM_NOT_AVAILABLE.
+        split, unmapped = self._split(goals)
+        futures = [bus.executor.submit(bus.goalCache.writeGoals, dict((sts_id, goals[sts_id]) for sts_id in ids), speed, acc)
+                   for bus, ids in split.items()]
+
+        sts_comm_result = COMM_NOT_AVAILABLE if unmapped else COMM_SUCCESS
+        for future in futures:
+            result = future.result()
+            if sts_comm_result == COMM_SUCCESS:
+                sts_comm_result = result
+        return sts_comm_result
+
+    def invalidateGoals(self, sts_ids=None):
+        # Make WriteGoals resend these goals (see GoalWriteCache.invalidate)
+        for bus in self.buses:
+            bus.goalCache.invalidate(sts_ids)
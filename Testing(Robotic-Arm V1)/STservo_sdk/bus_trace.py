@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+
+import time
+import struct
+from array import array
+
+from .stservo_def import *
+from .port_handler import *
+from .protocol_packet_handler import *
+
+TRACE_MAGIC = b'STSTRC1\n'
+TRACE_SLOT = 256  # data bytes per record; longer frames take several records
+TRACE_RECORD = struct.Struct('<qBbHq')  # time ns, kind, result, length, duration ns
+
+
+class BusTracer(object):
+    # Opt-in wire trace: portHandler.setTracer(BusTracer()).
+    #
+    # PortHandler records every TX frame and RX chunk, and the packet
+    # handler records the result of each receive (and of busy/failed
+    # sends) with the time since the last TX. Records go into a
+    # preallocated ring of `capacity` entries; flush() appends the ones not
+    # yet written to a binary log (TRACE_MAGIC, then per record
+    # TRACE_RECORD + data). When tracing is off the hooks cost one
+    # `tracer is not None` test.
+
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self.stamps = array('q', bytes(8 * capacity))
+        self.durations = array('q', bytes(8 * capacity))
+        self.kinds = bytearray(capacity)
+        self.results = array('b', bytes(capacity))
+        self.lengths = array('H', bytes(2 * capacity))
+        self.data = bytearray(TRACE_SLOT * capacity)
+
+        self.count = 0    # records ever made
+        self.flushed = 0  # records already written by flush()
+        self.dropped = 0  # records overwritten before they were flushed
+        self.last_tx = 0
+
+    def record(self, kind, data=b'', result=0):
+        now = time.perf_counter_ns()
+        duration = 0
+        if kind == TRACE_TX:
+            self.last_tx = now
+        elif kind == TRACE_RESULT:
+            duration = now - self.last_tx
+
+        offset = 0
+        while True:
+            chunk = data[offset: offset + TRACE_SLOT]
+            i = self.count % self.capacity
+            self.stamps[i] = now
+            self.durations[i] = duration
+            self.kinds[i] = kind
+            self.results[i] = result
+            self.lengths[i] = len(chunk)
+            self.data[i * TRACE_SLOT: i * TRACE_SLOT + len(chunk)] = chunk
+            self.count += 1
+            offset += TRACE_SLOT
+            if offset >= len(data):
+                break
+
+    def records(self):
+        # (time ns, kind, result, duration ns, bytes) still in the ring, oldest first
+        for n in range(max(self.flushed, self.count - self.capacity), self.count):
+            i = n % self.capacity
+            yield (self.stamps[i], self.kinds[i], self.results[i], self.durations[i],
+                   bytes(self.data[i * TRACE_SLOT: i * TRACE_SLOT + self.lengths[i]]))
+
+    def flush(self, path):
+        # Append unflushed records to the log at path; returns how many
+        first = self.count - self.capacity
+        if first > self.flushed:
+            self.dropped += first - self.flushed
+            self.flushed = first
+
+        written = 0
+        with open(path, 'ab') as f:
+            if f.tell() == 0:
+                f.write(TRACE_MAGIC)
+            for stamp, kind, result, duration, data in self.records():
+                f.write(TRACE_RECORD.pack(stamp, kind, result, len(data), duration))
+                f.write(data)
+                written += 1
+        self.flushed = self.count
+        return written
+
+    def clear(self):
+        self.count = 0
+        self.flushed = 0
+        self.dropped = 0
+
+
+def readTrace(path):
+    # Records of a log written by BusTracer.flush(), as BusTracer.records()
+    with open(path, 'rb') as f:
+        if f.read(len(TRACE_MAGIC)) != TRACE_MAGIC:
+            raise ValueError("%s is not a bus trace" % path)
+        while True:
+            header = f.read(TRACE_RECORD.size)
+            if len(header) < TRACE_RECORD.size:
+                return
+            stamp, kind, result, length, duration = TRACE_RECORD.unpack(header)
+            yield stamp, kind, result, duration, f.read(length)
+
+
+class ReplayPortHandler(PortHandler):
+    # PortHandler fed with captured RX bytes, so the packet handler's own
+    # parser can be run over a trace. Reads never block: once the fed bytes
+    # are used up the packet times out.
+
+    def __init__(self):
+        PortHandler.__init__(self, "replay")
+        self.rx = bytearray()
+        self.is_open = True
+
+    def feed(self, data):
+        self.rx.extend(data)
+
+    def setupPort(self, cflag_baud):
+        self.is_open = True
+        return True
+
+    def closePort(self):
+        self.is_open = False
+
+    def clearPort(self):
+        pass
+
+    def getBytesAvailable(self):
+        return len(self.rx)
+
+    def readPort(self, length):
+        data = bytes(self.rx[:length])
+        del self.rx[:length]
+        return data
+
+    def readPortInto(self, buffer):
+        length = min(len(buffer), len(self.rx))
+        buffer[:length] = self.rx[:length]
+        del self.rx[:length]
+        return length
+
+    def writePort(self, packet):
+        return len(packet)
+
+    def isPacketTimeout(self):
+        return not self.rx
+
+
+def replayTrace(records):
+    # Re-parse each TX and the RX bytes that followed it with the SDK parser.
+    # Yields dicts: time, id, instruction, tx, rx, packets [(status packet,
+    # result)], recorded (result codes in the trace), duration (ns).
+    portHandler = ReplayPortHandler()
+    packetHandler = protocol_packet_handler(portHandler, 0)
+
+    def finish(step):
+        tx = step['tx']
+        if tx[PKT_INSTRUCTION] == INST_READ and len(tx) > PKT_PARAMETER0 + 1:
+            wait_length = tx[PKT_PARAMETER0 + 1] + 6
+        elif tx[PKT_INSTRUCTION] == INST_SYNC_READ and len(tx) > PKT_PARAMETER0 + 1:
+            wait_length = tx[PKT_PARAMETER0 + 1] + 6
+        else:
+            wait_length = 6
+        packetHandler.rx_pending = 0
+        portHandler.rx = bytearray(step['rx'])
+        while portHandler.rx:
+            packet, result = packetHandler.rxPacket(wait_length)
+            step['packets'].append((bytes(packet), result))
+        return step
+
+    step = None
+    for stamp, kind, result, duration, data in records:
+        if kind == TRACE_TX:
+            if step is not None:
+                yield finish(step)
+            step = {'time': stamp, 'id': data[PKT_ID] if len(data) > PKT_ID else None,
+                    'instruction': data[PKT_INSTRUCTION] if len(data) > PKT_INSTRUCTION else None,
+                    'tx': bytes(data), 'rx': bytearray(), 'packets': [], 'recorded': [], 'duration': 0}
+        elif step is None:
+            continue
+        elif kind == TRACE_RX:
+            step['rx'].extend(data)
+        elif kind == TRACE_RESULT:
+            step['recorded'].append(result)
+            step['duration'] = duration
+    if step is not None:
+        yield finish(step)
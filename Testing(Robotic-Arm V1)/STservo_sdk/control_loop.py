@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+import time
+from array import array
+
+SPIN_NS = 200000  # busy-wait the last 0.2 ms of each period for accuracy
+
+
+class ControlLoop(object):
+    # Fixed-rate control loop: read -> compute -> write once per period.
+    #
+    #   state = read()
+    #   command = compute(state)
+    #   write(command)
+    #
+    # Cycles are scheduled on absolute perf_counter_ns deadlines, so a slow
+    # cycle does not push the following ones back. time.sleep sleeps on
+    # CLOCK_MONOTONIC (clock_nanosleep on Linux) up to SPIN_NS before the
+    # deadline, then the loop spins the rest. A cycle that runs past the
+    # next deadline is an overrun; the missed ticks are skipped rather than
+    # run back to back.
+    #
+    # The last `history` cycles are kept in ring buffers (ns): release
+    # jitter and the duration of each phase. Use stats() to size the rate
+    # to what the bus sustains.
+
+    def __init__(self, rate_hz, read=None, compute=None, write=None, history=1024):
+        self.period_ns = int(round(1e9 / rate_hz))
+        self.read = read
+        self.compute = compute
+        self.write = write
+
+        self.history = history
+        self.jitter_ns = array('q', bytes(8 * history))
+        self.read_ns = array('q', bytes(8 * history))
+        self.compute_ns = array('q', bytes(8 * history))
+        self.write_ns = array('q', bytes(8 * history))
+        self.cycle_ns = array('q', bytes(8 * history))
+
+        self.cycles = 0
+        self.overruns = 0
+        self.missed = 0
+        self.is_running = False
+
+    def stop(self):
+        self.is_running = False
+
+    def sleepUntil(self, deadline_ns):
+        remaining = deadline_ns - time.perf_counter_ns()
+        if remaining > SPIN_NS:
+            time.sleep((remaining - SPIN_NS) / 1e9)
+        while time.perf_counter_ns() < deadline_ns:
+            pass
+
+    def step(self, release_ns):
+        # Run one cycle released at release_ns, record its timings
+        t0 = time.perf_counter_ns()
+        state = self.read() if self.read is not None else None
+        t1 = time.perf_counter_ns()
+        command = self.compute(state) if self.compute is not None else state
+        t2 = time.perf_counter_ns()
+        if self.write is not None:
+            self.write(command)
+        t3 = time.perf_counter_ns()
+
+        i = self.cycles % self.history
+        self.jitter_ns[i] = t0 - release_ns
+        self.read_ns[i] = t1 - t0
+        self.compute_ns[i] = t2 - t1
+        self.write_ns[i] = t3 - t2
+        self.cycle_ns[i] = t3 - t0
+        self.cycles += 1
+
+    def run(self, cycles=None, duration=None):
+        # Run until stop(), or for a number of cycles / seconds
+        self.is_running = True
+        period = self.period_ns
+        deadline = time.perf_counter_ns()
+        end = None if duration is None else deadline + int(duration * 1e9)
+        start_cycles = self.cycles
+
+        while self.is_running:
+            if (cycles is not None) and (self.cycles - start_cycles >= cycles):
+                break
+            if (end is not None) and (deadline >= end):
+                break
+
+            self.sleepUntil(deadline)
+            self.step(deadline)
+
+            deadline += period
+            now = time.perf_counter_ns()
+            if now > deadline:
+                self.overruns += 1
+                skipped = (now - deadline) // period + 1
+                self.missed += skipped
+                deadline += skipped * period
+
+        self.is_running = False
+
+    def samples(self, buffer):
+        # The recorded values of one ring buffer, oldest first
+        n = min(self.cycles, self.history)
+        i = self.cycles % self.history
+        if self.cycles <= self.history:
+            return list(buffer[:n])
+        return list(buffer[i:]) + list(buffer[:i])
+
+    def stats(self):
+        # Summary of the recorded cycles, in microseconds
+        result = {'rate_hz': 1e9 / self.period_ns, 'cycles': self.cycles,
+                  'overruns': self.overruns, 'missed': self.missed}
+        for name, buffer in (('jitter', self.jitter_ns), ('read', self.read_ns), ('compute', self.compute_ns),
+                             ('write', self.write_ns), ('cycle', self.cycle_ns)):
+            values = sorted(self.samples(buffer))
+            if not values:
+                continue
+            result[name] = {'mean_us': sum(values) / len(values) / 1e3,
+                            'p50_us': values[len(values) // 2] / 1e3,
+                            'p99_us': values[min(len(values) - 1, len(values) * 99 // 100)] / 1e3,
+                            'max_us': values[-1] / 1e3}
+        return result
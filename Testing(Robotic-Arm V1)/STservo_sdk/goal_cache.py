@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+import time
+
+from .stservo_def import *
+from .group_sync_write import *
+from .sts import *
+
+GOAL_REFRESH_PERIOD = 0.5  # seconds between full resends of every goal
+
+
+class GoalWriteCache(object):
+    # Change-only goal writes over sts.
+    #
+    # setGoal() records the wanted (position, speed, acc) per ID; flush()
+    # sends only the goals that differ from the last ones sent, as a single
+    # GroupSyncWrite broadcast. Sync writes get no status packet, so "last
+    # sent" is the best the host knows: call invalidate() after anything
+    # that may have changed a goal behind the cache's back (direct
+    # WritePosEx, a servo reset, a comm error) to force a resend.
+    #
+    # A servo that misses a broadcast to line noise would otherwise keep
+    # its old goal until the goal changes, so every refresh_period seconds
+    # flush() forgets what was sent and the next one resends every goal.
+    # refresh_period=None turns this off.
+
+    def __init__(self, ph, refresh_period=GOAL_REFRESH_PERIOD, clock=time.monotonic):
+        self.ph = ph
+        self.refresh_period = refresh_period
+        self.clock = clock
+        self.refresh_due = clock() + refresh_period if refresh_period is not None else None
+        self.groupSyncWrite = GroupSyncWrite(ph, STS_ACC, 7)
+        self.sent = {}      # sts_id -> [acc, pos_L, pos_H, 0, 0, speed_L, speed_H] last sent
+        self.pending = {}   # sts_id -> data waiting for flush()
+
+        self.goal_count = 0        # setGoal calls
+        self.suppressed_count = 0  # goals dropped because nothing changed
+        self.sent_count = 0        # goals sent
+        self.packet_count = 0      # sync write packets sent
+        self.refresh_count = 0     # periodic full resends
+
+    def setGoal(self, sts_id, position, speed, acc):
+        # position is signed (two's complement on the wire, as WriteSignedPosEx)
+        position = position & 0xFFFF
+        data = [acc, position & 0xFF, (position >> 8) & 0xFF, 0, 0, speed & 0xFF, (speed >> 8) & 0xFF]
+        self.goal_count += 1
+        if self.sent.get(sts_id) == data:
+            self.pending.pop(sts_id, None)
+            self.suppressed_count += 1
+            return False
+        self.pending[sts_id] = data
+        return True
+
+    def flush(self):
+        # Send the changed goals in one sync write packet
+        if self.refresh_due is not None:
+            now = self.clock()
+            if now >= self.refresh_due:
+                self.sent.clear()  # the next setGoal of every ID is sent again
+                self.refresh_due = now + self.refresh_period
+                self.refresh_count += 1
+        if not self.pending:
+            return COMM_SUCCESS
+
+        groupSyncWrite = self.groupSyncWrite
+        groupSyncWrite.clearParam()
+        for sts_id, data in self.pending.items():
+            groupSyncWrite.addParam(sts_id, data)
+
+        sts_comm_result = groupSyncWrite.txPacket()
+        if sts_comm_result == COMM_SUCCESS:
+            self.sent.update(self.pending)
+            self.sent_count += len(self.pending)
+            self.packet_count += 1
+            self.pending.clear()
+        return sts_comm_result
+
+    def writeGoals(self, goals, speed, acc):
+        # setGoal for every {sts_id: position} then flush()
+        for sts_id, position in goals.items():
+            self.setGoal(sts_id, position, speed, acc)
+        return self.flush()
+
+    def invalidate(self, sts_ids=None):
+        # Forget the last sent goal (all IDs by default) so it is written again
+        if sts_ids is None:
+            self.sent.clear()
+        else:
+            for sts_id in sts_ids:
+                self.sent.pop(sts_id, None)
+
+    def resetCounters(self):
+        self.goal_count = 0
+        self.suppressed_count = 0
+        self.sent_count = 0
+        self.packet_count = 0
+        self.refresh_count = 0
@@ -12,6 +12,8 @@ class GroupSyncRead:
         self.is_param_changed = False
         self.param = []
         self.data_dict = {}
+        self.rx_result = {}
+        self.rx_ids = []  # IDs asked for by the last txPacket
 
         self.clearParam()
 
@@ -38,11 +40,13 @@ class GroupSyncRead:
             return
 
         del self.data_dict[sts_id]
+        self.rx_result.pop(sts_id, None)
 
         self.is_param_changed = True
 
     def clearParam(self):
         self.data_dict.clear()
+        self.rx_result.clear()
 
     def txPacket(self):
         if len(self.data_dict.keys()) == 0:
@@ -52,7 +56,17 @@ class GroupSyncRead:
         if self.is_param_changed is True or not self.param:
             self.makeParam()
 
-        return self.ph.syncReadTx(self.start_address, self.data_length, self.param, len(self.data_dict.keys()))
+        adaptive_timeout = self.ph.adaptive_timeout
+        if adaptive_timeout is None:
+            self.rx_ids = self.param
+            return self.ph.syncReadTx(self.start_address, self.data_length, self.param, len(self.data_dict.keys()))
+
+        # leave quarantined IDs out of the request
+        self.rx_ids = [sts_id for sts_id in self.param if adaptive_timeout.admit(sts_id)]
+        if not self.rx_ids:
+            self.readRx(b'')
+            return COMM_RX_TIMEOUT
+        return self.ph.syncReadTx(self.start_address, self.data_length, self.rx_ids, len(self.rx_ids))
 
     def rxPacket(self):
         self.last_result = True
@@ -62,16 +76,24 @@ class GroupSyncRead:
         if len(self.data_dict.keys()) == 0:
             return COMM_NOT_AVAILABLE
 
-        result, rxpacket = self.ph.syncReadRx(self.data_length, len(self.data_dict.keys()))
+        result, rxpacket = self.ph.syncReadRx(self.data_length, len(self.rx_ids), self.rx_ids)
         # print(rxpacket)
-        if len(rxpacket) >= (self.data_length+6):
-            for sts_id in self.data_dict:
-                self.data_dict[sts_id], result = self.readRx(rxpacket, sts_id, self.data_length)
-                if result != COMM_SUCCESS:
-                    self.last_result = False
-                # print(sts_id)
-        else:
-            self.last_result = False
+        self.readRx(rxpacket)
+
+        adaptive_timeout = self.ph.adaptive_timeout
+        if adaptive_timeout is not None:
+            # the whole reply timed once, as the latency of every ID in it
+            latency = None
+            if result == COMM_SUCCESS:
+                latency = self.ph.portHandler.getTimeSinceStart() - self.ph.portHandler.tx_time_per_byte * len(rxpacket)
+            for sts_id in self.rx_ids:
+                adaptive_timeout.update(sts_id, self.rx_result[sts_id], latency)
+
+        for sts_id in self.data_dict:
+            if self.rx_result[sts_id] != COMM_SUCCESS:
+                self.last_result = False
+                if result == COMM_SUCCESS or self.rx_result[sts_id] == COMM_RX_CORRUPT:
+                    result = self.rx_result[sts_id]
         # print(self.last_result)
         return result
 
@@ -82,46 +104,37 @@ class GroupSyncRead:
 
         return self.rxPacket()
 
-    def readRx(self, rxpacket, sts_id, data_length):
-        # print(sts_id)
-        # print(rxpacket)
-        data = []
+    def readRx(self, rxpacket):
+        # Walk the concatenated status packets once, filling data_dict by ID.
+        # rx_result[id] ends up COMM_SUCCESS, COMM_RX_CORRUPT (bad checksum)
+        # or COMM_RX_TIMEOUT (no reply from that ID).
+        for sts_id in self.data_dict:
+            self.data_dict[sts_id] = None
+            self.rx_result[sts_id] = COMM_RX_TIMEOUT
+
+        rxpacket = bytes(rxpacket)
+        packet_length = self.data_length + 6  # HEADER0 HEADER1 ID LEN ERR ... CHKSUM
         rx_length = len(rxpacket)
-        # print(rx_length)
-        rx_index = 0;
-        while (rx_index+6+data_length) <= rx_length:
-            headpacket = [0x00, 0x00, 0x00]
-            while rx_index < rx_length:
-                headpacket[2] = headpacket[1];
-                headpacket[1] = headpacket[0];
-                headpacket[0] = rxpacket[rx_index];
-                rx_index += 1
-                if (headpacket[2] == 0xFF) and (headpacket[1] == 0xFF) and headpacket[0] == sts_id:
-                    # print(rx_index)
-                    break
-            # print(rx_index+3+data_length)
-            if (rx_index+3+data_length) > rx_length:
-                break;
-            if rxpacket[rx_index] != (data_length+2):
-                rx_index += 1
-                # print(rx_index)
+        rx_index = rxpacket.find(b'\xff\xff')
+        while 0 <= rx_index <= rx_length - packet_length:
+            sts_id = rxpacket[rx_index + 2]
+            if (sts_id not in self.data_dict) or (rxpacket[rx_index + 3] != self.data_length + 2):
+                rx_index = rxpacket.find(b'\xff\xff', rx_index + 1)
                 continue
-            rx_index += 1
-            Error = rxpacket[rx_index]
-            rx_index += 1
-            calSum = sts_id + (data_length+2) + Error
-            data = [Error]
-            data.extend(rxpacket[rx_index : rx_index+data_length])
-            for i in range(0, data_length):
-                calSum += rxpacket[rx_index]
-                rx_index += 1
-            calSum = ~calSum & 0xFF
-            # print(calSum)
-            if calSum != rxpacket[rx_index]:
-                return None, COMM_RX_CORRUPT
-            return data, COMM_SUCCESS 
-        # print(rx_index)
-        return None, COMM_RX_CORRUPT
+
+            end = rx_index + packet_length
+            if (~sum(rxpacket[rx_index + 2:end - 1]) & 0xFF) != rxpacket[end - 1]:
+                if self.rx_result[sts_id] != COMM_SUCCESS:
+                    self.rx_result[sts_id] = COMM_RX_CORRUPT
+                rx_index = rxpacket.find(b'\xff\xff', rx_index + 1)
+                continue
+
+            self.data_dict[sts_id] = list(rxpacket[rx_index + 4:end - 1])  # [Error, data...]
+            self.rx_result[sts_id] = COMM_SUCCESS
+            rx_index = rxpacket.find(b'\xff\xff', end)
+
+    def getRxResult(self, sts_id):
+        return self.rx_result.get(sts_id, COMM_NOT_AVAILABLE)
 
     def isAvailable(self, sts_id, address, data_length):
         #if self.last_result is False or sts_id not in self.data_dict:
@@ -140,12 +153,12 @@ class GroupSyncRead:
         if data_length == 1:
             return self.data_dict[sts_id][address-self.start_address+1]
         elif data_length == 2:
-            return self.ph.scs_makeword(self.data_dict[sts_id][address-self.start_address+1],
+            return self.ph.sts_makeword(self.data_dict[sts_id][address-self.start_address+1],
                                 self.data_dict[sts_id][address-self.start_address+2])
         elif data_length == 4:
-            return self.ph.scs_makedword(self.ph.scs_makeword(self.data_dict[sts_id][address-self.start_address+1],
+            return self.ph.sts_makedword(self.ph.sts_makeword(self.data_dict[sts_id][address-self.start_address+1],
                                               self.data_dict[sts_id][address-self.start_address+2]),
-                                 self.ph.scs_makeword(self.data_dict[sts_id][address-self.start_address+3],
+                                 self.ph.sts_makeword(self.data_dict[sts_id][address-self.start_address+3],
                                               self.data_dict[sts_id][address-self.start_address+4]))
         else:
             return 0
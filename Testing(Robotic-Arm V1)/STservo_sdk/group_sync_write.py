@@ -71,3 +71,7 @@ class GroupSyncWrite:
 
         return self.ph.syncWriteTxOnly(self.start_address, self.data_length, self.param,
                                        len(self.data_dict.keys()) * (1 + self.data_length))
+
+    def txParam(self, param):
+        # Send a prebuilt param block (ID + data_length bytes per servo), e.g. a precomputed trajectory sample
+        return self.ph.syncWriteTxOnly(self.start_address, self.data_length, param, len(param))
@@ -4,21 +4,30 @@ import time
 import serial
 import sys
 import platform
+import select
+import os
+
+from .stservo_def import *
 
 DEFAULT_BAUDRATE = 1000000
 LATENCY_TIMER = 50 
+RX_BLOCK_BYTES = 3  # read timeout (in byte times) used for blocking rx without select()
 
 class PortHandler(object):
     def __init__(self, port_name):
         self.is_open = False
         self.baudrate = DEFAULT_BAUDRATE
-        self.packet_start_time = 0.0
-        self.packet_timeout = 0.0
-        self.tx_time_per_byte = 0.0
+        self.clock = time.monotonic_ns  # integer ns; see setClock
+        self.packet_start_time = 0      # ns
+        self.packet_deadline = 0        # ns
+        self.packet_timeout = 0.0       # ms
+        self.tx_time_per_byte = 0.0     # ms
 
         self.is_using = False
         self.port_name = port_name
         self.ser = None
+        self.rx_blocking = False
+        self.tracer = None
 
     def openPort(self):
         return self.setBaudRate(self.baudrate)
@@ -53,59 +62,110 @@ class PortHandler(object):
     def getBytesAvailable(self):
         return self.ser.in_waiting
 
+    def setRxBlocking(self, enable):
+        # Block on the port until bytes arrive (or the packet times out)
+        # instead of returning straight away with nothing read.
+        self.rx_blocking = enable
+        if self.is_open:
+            self.ser.timeout = self.getRxReadTimeout()
+
+    def getRxBlocking(self):
+        return self.rx_blocking
+
+    def getRxReadTimeout(self):
+        # select() is used on POSIX, so the port itself stays non-blocking.
+        # Elsewhere fall back to a read timeout of a few byte times.
+        if not self.rx_blocking or os.name == 'posix':
+            return 0
+        return (self.tx_time_per_byte * RX_BLOCK_BYTES) / 1000.0
+
+    def waitForRx(self):
+        remaining = self.packet_deadline - self.clock()
+        if remaining <= 0:
+            return False
+
+        ready, _, _ = select.select([self.ser.fileno()], [], [], remaining / 1000000000.0)
+        return bool(ready)
+
+    def setTracer(self, tracer):
+        # BusTracer recording every TX/RX frame, or None to stop tracing
+        self.tracer = tracer
+
+    def getTracer(self):
+        return self.tracer
+
     def readPort(self, length):
+        data = self.ser.read(length)
+        if not data and self.rx_blocking and os.name == 'posix' and self.waitForRx():
+            data = self.ser.read(length)
+        if data and self.tracer is not None:
+            self.tracer.record(TRACE_RX, data)
+
         if (sys.version_info > (3, 0)):
-            return self.ser.read(length)
+            return data
         else:
-            return [ord(ch) for ch in self.ser.read(length)]
+            return [ord(ch) for ch in data]
+
+    def readPortInto(self, buffer):
+        length = self.ser.readinto(buffer)
+        if not length and self.rx_blocking and os.name == 'posix' and self.waitForRx():
+            length = self.ser.readinto(buffer)
+        if length and self.tracer is not None:
+            self.tracer.record(TRACE_RX, buffer[:length])
+
+        return length
 
     def writePort(self, packet):
+        if self.tracer is not None:
+            self.tracer.record(TRACE_TX, packet)
         return self.ser.write(packet)
 
+    def setClock(self, clock):
+        # Time source for packet timeouts: a callable returning integer ns
+        # that never goes backwards, e.g. a simulated clock for a fake bus.
+        self.clock = clock
+
+    def getClock(self):
+        return self.clock
+
     def setPacketTimeout(self, packet_length):
-        self.packet_start_time = self.getCurrentTime()
-        self.packet_timeout = (self.tx_time_per_byte * packet_length) + (self.tx_time_per_byte * 3.0) + LATENCY_TIMER
+        self.setPacketTimeoutMillis((self.tx_time_per_byte * packet_length) + (self.tx_time_per_byte * 3.0) + LATENCY_TIMER)
 
     def setPacketTimeoutMillis(self, msec):
-        self.packet_start_time = self.getCurrentTime()
         self.packet_timeout = msec
+        self.packet_start_time = self.clock()
+        self.packet_deadline = self.packet_start_time + int(msec * 1000000)
 
     def isPacketTimeout(self):
-        if self.getTimeSinceStart() > self.packet_timeout:
-            self.packet_timeout = 0
-            return True
-
-        return False
+        return self.clock() > self.packet_deadline
 
     def getCurrentTime(self):
-        return round(time.time() * 1000000000) / 1000000.0
+        # ms
+        return self.clock() / 1000000.0
 
     def getTimeSinceStart(self):
-        time_since = self.getCurrentTime() - self.packet_start_time
-        if time_since < 0.0:
-            self.packet_start_time = self.getCurrentTime()
-
-        return time_since
+        # ms since the packet timeout was set
+        return (self.clock() - self.packet_start_time) / 1000000.0
 
     def setupPort(self, cflag_baud):
         if self.is_open:
             self.closePort()
 
+        self.tx_time_per_byte = (1000.0 / self.baudrate) * 10.0
+
         self.ser = serial.Serial(
             port=self.port_name,
             baudrate=self.baudrate,
             # parity = serial.PARITY_ODD,
             # stopbits = serial.STOPBITS_TWO,
             bytesize=serial.EIGHTBITS,
-            timeout=0
+            timeout=self.getRxReadTimeout()
         )
 
         self.is_open = True
 
         self.ser.reset_input_buffer()
 
-        self.tx_time_per_byte = (1000.0 / self.baudrate) * 10.0
-
         return True
 
     def getCFlagBaud(self, baudrate):
@@ -28,6 +28,26 @@ class protocol_packet_handler(object):
         self.portHandler = portHandler
         self.sts_end = protocol_end
 
+        # Packet buffers reused by every transaction
+        self.txpacket = bytearray(TXPACKET_MAX_LEN)
+        self.txpacket[PKT_HEADER0] = 0xFF
+        self.txpacket[PKT_HEADER1] = 0xFF
+        self.txview = memoryview(self.txpacket)
+        self.rxpacket = bytearray(RXPACKET_MAX_LEN + PKT_LENGTH + 1)
+        self.rxview = memoryview(self.rxpacket)
+        self.rx_pending = 0
+        self.syncrxpacket = bytearray(RXPACKET_MAX_LEN)
+        self.syncrxview = memoryview(self.syncrxpacket)
+
+        self.adaptive_timeout = None
+
+    def setAdaptiveTimeout(self, adaptive_timeout):
+        # AdaptiveTimeout sizing packet timeouts per ID, or None for the fixed LATENCY_TIMER
+        self.adaptive_timeout = adaptive_timeout
+
+    def getAdaptiveTimeout(self):
+        return self.adaptive_timeout
+
     def sts_getend(self):
         return self.sts_end
 
@@ -116,156 +136,180 @@ class protocol_packet_handler(object):
 
         return ""
 
-    def txPacket(self, txpacket):
-        checksum = 0
-        total_packet_length = txpacket[PKT_LENGTH] + 4  # 4: HEADER0 HEADER1 ID LENGTH
-
-        if self.portHandler.is_using:
+    def txFrame(self, sts_id, instruction, head=(), param=()):
+        # Build the packet in the preallocated tx buffer and send it.
+        # head: leading parameters (address, length), param: data bytes
+        portHandler = self.portHandler
+        if portHandler.is_using:
+            if portHandler.tracer is not None:
+                portHandler.tracer.record(TRACE_RESULT, b'', COMM_PORT_BUSY)
             return COMM_PORT_BUSY
-        self.portHandler.is_using = True
+        portHandler.is_using = True
+
+        param_start = PKT_PARAMETER0 + len(head)
+        checksum_index = param_start + len(param)
 
         # check max packet length
-        if total_packet_length > TXPACKET_MAX_LEN:
-            self.portHandler.is_using = False
+        if checksum_index >= TXPACKET_MAX_LEN:
+            portHandler.is_using = False
+            if portHandler.tracer is not None:
+                portHandler.tracer.record(TRACE_RESULT, b'', COMM_TX_ERROR)
             return COMM_TX_ERROR
 
-        # make packet header
-        txpacket[PKT_HEADER0] = 0xFF
-        txpacket[PKT_HEADER1] = 0xFF
-
-        # add a checksum to the packet
-        for idx in range(2, total_packet_length - 1):  # except header, checksum
-            checksum += txpacket[idx]
-
-        txpacket[total_packet_length - 1] = ~checksum & 0xFF
+        txpacket = self.txpacket
+        txpacket[PKT_ID] = sts_id
+        txpacket[PKT_LENGTH] = checksum_index - PKT_LENGTH
+        txpacket[PKT_INSTRUCTION] = instruction
+        txpacket[PKT_PARAMETER0: param_start] = head
+        txpacket[param_start: checksum_index] = param
 
-        #print "[TxPacket] %r" % txpacket
+        # add a checksum to the packet (except header, checksum)
+        txpacket[checksum_index] = ~sum(self.txview[PKT_ID: checksum_index]) & 0xFF
 
         # tx packet
-        self.portHandler.clearPort()
-        written_packet_length = self.portHandler.writePort(txpacket)
-        if total_packet_length != written_packet_length:
-            self.portHandler.is_using = False
+        portHandler.clearPort()
+        if portHandler.writePort(self.txview[:checksum_index + 1]) != checksum_index + 1:
+            portHandler.is_using = False
+            if portHandler.tracer is not None:
+                portHandler.tracer.record(TRACE_RESULT, b'', COMM_TX_FAIL)
             return COMM_TX_FAIL
 
         return COMM_SUCCESS
 
-    def rxPacket(self):
-        rxpacket = []
+    def makePacket(self, sts_id, instruction, head=(), param=()):
+        # Encode a complete instruction packet without sending it
+        packet = bytearray((0xFF, 0xFF, sts_id, len(head) + len(param) + 2, instruction))
+        packet.extend(head)
+        packet.extend(param)
+        packet.append(~sum(packet[PKT_ID:]) & 0xFF)
+        return bytes(packet)
+
+    def txPacket(self, txpacket):
+        total_packet_length = txpacket[PKT_LENGTH] + 4  # 4: HEADER0 HEADER1 ID LENGTH
+        return self.txFrame(txpacket[PKT_ID], txpacket[PKT_INSTRUCTION], (),
+                            txpacket[PKT_PARAMETER0: total_packet_length - 1])
+
+    def rxPacket(self, wait_length=6):
+        # wait_length: expected packet length when the caller knows it,
+        # otherwise the minimum (HEADER0 HEADER1 ID LENGTH ERROR CHKSUM).
+        # Bytes read past the end of the packet are kept for the next call.
+        rxpacket = self.rxpacket
+        rxview = self.rxview
 
         result = COMM_TX_FAIL
-        checksum = 0
-        rx_length = 0
-        wait_length = 6  # minimum length (HEADER0 HEADER1 ID LENGTH ERROR CHKSUM)
+        rx_length = self.rx_pending
+        self.rx_pending = 0
 
         while True:
-            rxpacket.extend(self.portHandler.readPort(wait_length - rx_length))
-            rx_length = len(rxpacket)
-            if rx_length >= wait_length:
+            if rx_length < wait_length:
+                rx_length += self.portHandler.readPortInto(rxview[rx_length: wait_length])
+            if rx_length >= 6:
                 # find packet header
-                for idx in range(0, (rx_length - 1)):
-                    if (rxpacket[idx] == 0xFF) and (rxpacket[idx + 1] == 0xFF):
-                        break
+                idx = rxpacket.find(b'\xff\xff', 0, rx_length)
+                if idx < 0:
+                    idx = rx_length - 1  # keep the last byte, it may start a header
 
                 if idx == 0:  # found at the beginning of the packet
                     if (rxpacket[PKT_ID] > 0xFD) or (rxpacket[PKT_LENGTH] > RXPACKET_MAX_LEN) or (
                             rxpacket[PKT_ERROR] > 0x7F):
                         # unavailable ID or unavailable Length or unavailable Error
                         # remove the first byte in the packet
-                        del rxpacket[0]
+                        rxpacket[0: rx_length - 1] = rxpacket[1: rx_length]
                         rx_length -= 1
                         continue
 
-                    # re-calculate the exact length of the rx packet
-                    if wait_length != (rxpacket[PKT_LENGTH] + PKT_LENGTH + 1):
-                        wait_length = rxpacket[PKT_LENGTH] + PKT_LENGTH + 1
-                        continue
-
-                    if rx_length < wait_length:
-                        # check timeout
-                        if self.portHandler.isPacketTimeout():
-                            if rx_length == 0:
-                                result = COMM_RX_TIMEOUT
-                            else:
-                                result = COMM_RX_CORRUPT
-                            break
+                    # the exact length of the rx packet
+                    wait_length = rxpacket[PKT_LENGTH] + PKT_LENGTH + 1
+                    if rx_length >= wait_length:
+                        # verify checksum (except header, checksum)
+                        if rxpacket[wait_length - 1] == ~sum(rxview[2: wait_length - 1]) & 0xFF:
+                            result = COMM_SUCCESS
                         else:
-                            continue
-
-                    # calculate checksum
-                    for i in range(2, wait_length - 1):  # except header, checksum
-                        checksum += rxpacket[i]
-                    checksum = ~checksum & 0xFF
-
-                    # verify checksum
-                    if rxpacket[wait_length - 1] == checksum:
-                        result = COMM_SUCCESS
-                    else:
-                        result = COMM_RX_CORRUPT
-                    break
+                            result = COMM_RX_CORRUPT
+                        break
 
                 else:
                     # remove unnecessary packets
-                    del rxpacket[0: idx]
+                    rxpacket[0: rx_length - idx] = rxpacket[idx: rx_length]
                     rx_length -= idx
+                    continue
 
-            else:
-                # check timeout
-                if self.portHandler.isPacketTimeout():
-                    if rx_length == 0:
-                        result = COMM_RX_TIMEOUT
-                    else:
-                        result = COMM_RX_CORRUPT
-                    break
+            # check timeout
+            if self.portHandler.isPacketTimeout():
+                if rx_length == 0:
+                    result = COMM_RX_TIMEOUT
+                else:
+                    result = COMM_RX_CORRUPT
+                wait_length = rx_length
+                break
 
         self.portHandler.is_using = False
-        return rxpacket, result
-
-    def txRxPacket(self, txpacket):
+        if self.portHandler.tracer is not None:
+            self.portHandler.tracer.record(TRACE_RESULT, b'', result)
+        if rx_length > wait_length:
+            packet = rxpacket[:wait_length]
+            self.rx_pending = rx_length - wait_length
+            rxpacket[0: self.rx_pending] = rxpacket[wait_length: rx_length]
+            return packet, result
+        return rxpacket[:rx_length], result
+
+    def txRxFrame(self, sts_id, instruction, head=(), param=()):
         rxpacket = None
         error = 0
 
+        # quarantined ID: answer without using the bus
+        adaptive_timeout = self.adaptive_timeout
+        if (adaptive_timeout is not None) and (sts_id != BROADCAST_ID) and not adaptive_timeout.admit(sts_id):
+            return rxpacket, COMM_RX_TIMEOUT, error
+
         # tx packet
-        result = self.txPacket(txpacket)
+        result = self.txFrame(sts_id, instruction, head, param)
         if result != COMM_SUCCESS:
             return rxpacket, result, error
 
         # (ID == Broadcast ID) == no need to wait for status packet or not available
-        if (txpacket[PKT_ID] == BROADCAST_ID):
+        if (sts_id == BROADCAST_ID):
             self.portHandler.is_using = False
             return rxpacket, result, error
 
         # set packet timeout
-        if txpacket[PKT_INSTRUCTION] == INST_READ:
-            self.portHandler.setPacketTimeout(txpacket[PKT_PARAMETER0 + 1] + 6)
+        if instruction == INST_READ:
+            rx_length = self.txpacket[PKT_PARAMETER0 + 1] + 6
+        else:
+            rx_length = 6  # HEADER0 HEADER1 ID LENGTH ERROR CHECKSUM
+        if adaptive_timeout is None:
+            self.portHandler.setPacketTimeout(rx_length)
         else:
-            self.portHandler.setPacketTimeout(6)  # HEADER0 HEADER1 ID LENGTH ERROR CHECKSUM
+            self.portHandler.setPacketTimeoutMillis(
+                adaptive_timeout.getTimeout(sts_id, rx_length, self.portHandler.tx_time_per_byte))
 
         # rx packet
         while True:
-            rxpacket, result = self.rxPacket()
-            if result != COMM_SUCCESS or txpacket[PKT_ID] == rxpacket[PKT_ID]:
+            rxpacket, result = self.rxPacket(rx_length)
+            if result != COMM_SUCCESS or sts_id == rxpacket[PKT_ID]:
                 break
 
-        if result == COMM_SUCCESS and txpacket[PKT_ID] == rxpacket[PKT_ID]:
+        if adaptive_timeout is not None:
+            adaptive_timeout.update(sts_id, result, self.portHandler.getTimeSinceStart() - self.portHandler.tx_time_per_byte * rx_length)
+
+        if result == COMM_SUCCESS and sts_id == rxpacket[PKT_ID]:
             error = rxpacket[PKT_ERROR]
 
         return rxpacket, result, error
 
+    def txRxPacket(self, txpacket):
+        total_packet_length = txpacket[PKT_LENGTH] + 4  # 4: HEADER0 HEADER1 ID LENGTH
+        return self.txRxFrame(txpacket[PKT_ID], txpacket[PKT_INSTRUCTION], (),
+                              txpacket[PKT_PARAMETER0: total_packet_length - 1])
+
     def ping(self, sts_id):
         model_number = 0
         error = 0
 
-        txpacket = [0] * 6
-
         if sts_id >= BROADCAST_ID:
             return model_number, COMM_NOT_AVAILABLE, error
 
-        txpacket[PKT_ID] = sts_id
-        txpacket[PKT_LENGTH] = 2
-        txpacket[PKT_INSTRUCTION] = INST_PING
-
-        rxpacket, result, error = self.txRxPacket(txpacket)
+        rxpacket, result, error = self.txRxFrame(sts_id, INST_PING)
 
         if result == COMM_SUCCESS:
             data_read, result, error = self.readTxRx(sts_id, 3, 2)  # Address 3 : Model Number
@@ -275,30 +319,15 @@ class protocol_packet_handler(object):
         return model_number, result, error
 
     def action(self, sts_id):
-        txpacket = [0] * 6
-
-        txpacket[PKT_ID] = sts_id
-        txpacket[PKT_LENGTH] = 2
-        txpacket[PKT_INSTRUCTION] = INST_ACTION
-
-        _, result, _ = self.txRxPacket(txpacket)
+        _, result, _ = self.txRxFrame(sts_id, INST_ACTION)
 
         return result
 
     def readTx(self, sts_id, address, length):
-
-        txpacket = [0] * 8
-
         if sts_id >= BROADCAST_ID:
             return COMM_NOT_AVAILABLE
 
-        txpacket[PKT_ID] = sts_id
-        txpacket[PKT_LENGTH] = 4
-        txpacket[PKT_INSTRUCTION] = INST_READ
-        txpacket[PKT_PARAMETER0 + 0] = address
-        txpacket[PKT_PARAMETER0 + 1] = length
-
-        result = self.txPacket(txpacket)
+        result = self.txFrame(sts_id, INST_READ, (address, length))
 
         # set packet timeout
         if result == COMM_SUCCESS:
@@ -314,7 +343,7 @@ class protocol_packet_handler(object):
         data = []
 
         while True:
-            rxpacket, result = self.rxPacket()
+            rxpacket, result = self.rxPacket(length + 6)
 
             if result != COMM_SUCCESS or rxpacket[PKT_ID] == sts_id:
                 break
@@ -327,19 +356,12 @@ class protocol_packet_handler(object):
         return data, result, error
 
     def readTxRx(self, sts_id, address, length):
-        txpacket = [0] * 8
         data = []
 
         if sts_id >= BROADCAST_ID:
             return data, COMM_NOT_AVAILABLE, 0
 
-        txpacket[PKT_ID] = sts_id
-        txpacket[PKT_LENGTH] = 4
-        txpacket[PKT_INSTRUCTION] = INST_READ
-        txpacket[PKT_PARAMETER0 + 0] = address
-        txpacket[PKT_PARAMETER0 + 1] = length
-
-        rxpacket, result, error = self.txRxPacket(txpacket)
+        rxpacket, result, error = self.txRxFrame(sts_id, INST_READ, (address, length))
         if result == COMM_SUCCESS:
             error = rxpacket[PKT_ERROR]
 
@@ -389,30 +411,13 @@ class protocol_packet_handler(object):
         return data_read, result, error
 
     def writeTxOnly(self, sts_id, address, length, data):
-        txpacket = [0] * (length + 7)
-
-        txpacket[PKT_ID] = sts_id
-        txpacket[PKT_LENGTH] = length + 3
-        txpacket[PKT_INSTRUCTION] = INST_WRITE
-        txpacket[PKT_PARAMETER0] = address
-
-        txpacket[PKT_PARAMETER0 + 1: PKT_PARAMETER0 + 1 + length] = data[0: length]
-
-        result = self.txPacket(txpacket)
+        result = self.txFrame(sts_id, INST_WRITE, (address,), data[0: length])
         self.portHandler.is_using = False
 
         return result
 
     def writeTxRx(self, sts_id, address, length, data):
-        txpacket = [0] * (length + 7)
-
-        txpacket[PKT_ID] = sts_id
-        txpacket[PKT_LENGTH] = length + 3
-        txpacket[PKT_INSTRUCTION] = INST_WRITE
-        txpacket[PKT_PARAMETER0] = address
-
-        txpacket[PKT_PARAMETER0 + 1: PKT_PARAMETER0 + 1 + length] = data[0: length]
-        rxpacket, result, error = self.txRxPacket(txpacket)
+        rxpacket, result, error = self.txRxFrame(sts_id, INST_WRITE, (address,), data[0: length])
 
         return result, error
 
@@ -447,58 +452,38 @@ class protocol_packet_handler(object):
         return self.writeTxRx(sts_id, address, 4, data_write)
 
     def regWriteTxOnly(self, sts_id, address, length, data):
-        txpacket = [0] * (length + 7)
-
-        txpacket[PKT_ID] = sts_id
-        txpacket[PKT_LENGTH] = length + 3
-        txpacket[PKT_INSTRUCTION] = INST_REG_WRITE
-        txpacket[PKT_PARAMETER0] = address
-
-        txpacket[PKT_PARAMETER0 + 1: PKT_PARAMETER0 + 1 + length] = data[0: length]
-
-        result = self.txPacket(txpacket)
+        result = self.txFrame(sts_id, INST_REG_WRITE, (address,), data[0: length])
         self.portHandler.is_using = False
 
         return result
 
     def regWriteTxRx(self, sts_id, address, length, data):
-        txpacket = [0] * (length + 7)
-
-        txpacket[PKT_ID] = sts_id
-        txpacket[PKT_LENGTH] = length + 3
-        txpacket[PKT_INSTRUCTION] = INST_REG_WRITE
-        txpacket[PKT_PARAMETER0] = address
-
-        txpacket[PKT_PARAMETER0 + 1: PKT_PARAMETER0 + 1 + length] = data[0: length]
-
-        _, result, error = self.txRxPacket(txpacket)
+        _, result, error = self.txRxFrame(sts_id, INST_REG_WRITE, (address,), data[0: length])
 
         return result, error
 
     def syncReadTx(self, start_address, data_length, param, param_length):
-        txpacket = [0] * (param_length + 8)
-        # 8: HEADER0 HEADER1 ID LEN INST START_ADDR DATA_LEN CHKSUM
-
-        txpacket[PKT_ID] = BROADCAST_ID
-        txpacket[PKT_LENGTH] = param_length + 4  # 7: INST START_ADDR DATA_LEN CHKSUM
-        txpacket[PKT_INSTRUCTION] = INST_SYNC_READ
-        txpacket[PKT_PARAMETER0 + 0] = start_address
-        txpacket[PKT_PARAMETER0 + 1] = data_length
-
-        txpacket[PKT_PARAMETER0 + 2: PKT_PARAMETER0 + 2 + param_length] = param[0: param_length]
-
-        # print(txpacket)
-        result = self.txPacket(txpacket)
+        # HEADER0 HEADER1 ID LEN INST START_ADDR DATA_LEN ... CHKSUM
+        result = self.txFrame(BROADCAST_ID, INST_SYNC_READ, (start_address, data_length), param[0: param_length])
         return result
 
-    def syncReadRx(self, data_length, param_length):
+    def syncReadRx(self, data_length, param_length, sts_ids=None):
+        # The returned data is a view of the handler's sync rx buffer and is
+        # only valid until the next sync read.
+        # sts_ids: the IDs asked for, to size the timeout from their latency
         wait_length = (6 + data_length) * param_length
-        self.portHandler.setPacketTimeout(wait_length)
-        rxpacket = []
+        if (self.adaptive_timeout is None) or not sts_ids:
+            self.portHandler.setPacketTimeout(wait_length)
+        else:
+            self.portHandler.setPacketTimeoutMillis(
+                self.adaptive_timeout.getTimeout(sts_ids, wait_length, self.portHandler.tx_time_per_byte))
+        if len(self.syncrxpacket) < wait_length:
+            self.syncrxpacket = bytearray(wait_length)
+            self.syncrxview = memoryview(self.syncrxpacket)
+        rxview = self.syncrxview
         rx_length = 0
         while True:
-            rxpacket.extend(self.portHandler.readPort(wait_length - rx_length))
-            rx_length = len(rxpacket)
+            rx_length += self.portHandler.readPortInto(rxview[rx_length: wait_length])
             if rx_length >= wait_length:
                 result = COMM_SUCCESS
                 break
@@ -511,20 +496,12 @@ class protocol_packet_handler(object):
                         result = COMM_RX_CORRUPT
                     break
         self.portHandler.is_using = False
-        return result, rxpacket
+        if self.portHandler.tracer is not None:
+            self.portHandler.tracer.record(TRACE_RESULT, b'', result)
+        return result, rxview[:rx_length]
 
     def syncWriteTxOnly(self, start_address, data_length, param, param_length):
-        txpacket = [0] * (param_length + 8)
-        # 8: HEADER0 HEADER1 ID LEN INST START_ADDR DATA_LEN ... CHKSUM
-
-        txpacket[PKT_ID] = BROADCAST_ID
-        txpacket[PKT_LENGTH] = param_length + 4  # 4: INST START_ADDR DATA_LEN ... CHKSUM
-        txpacket[PKT_INSTRUCTION] = INST_SYNC_WRITE
-        txpacket[PKT_PARAMETER0 + 0] = start_address
-        txpacket[PKT_PARAMETER0 + 1] = data_length
-
-        txpacket[PKT_PARAMETER0 + 2: PKT_PARAMETER0 + 2 + param_length] = param[0: param_length]
-
-        _, result, _ = self.txRxPacket(txpacket)
+        # HEADER0 HEADER1 ID LEN INST START_ADDR DATA_LEN ... CHKSUM
+        _, result, _ = self.txRxFrame(BROADCAST_ID, INST_SYNC_WRITE, (start_address, data_length), param[0: param_length])
 
         return result
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+
+import time
+
+from .stservo_def import *
+from .protocol_packet_handler import *
+from .sts import *
+
+CONTROL_TABLE_SIZE = 256
+
+#寄存器类型
+REG_EEPROM = 0   # EPROM: static, cached until written
+REG_SRAM_RW = 1  # SRAM(读写): set by the host, cached for rw_ttl
+REG_SRAM_RO = 2  # SRAM(只读): live servo state, cached for ro_ttl
+
+
+def registerClass(address):
+    if address < STS_TORQUE_ENABLE:
+        return REG_EEPROM
+    if address < STS_PRESENT_POSITION_L:
+        return REG_SRAM_RW
+    return REG_SRAM_RO
+
+
+class RegisterMirror(object):
+    # Host-side copy of each servo's memory table over sts.
+    #
+    # read() serves bytes from the copy while they are fresh and otherwise
+    # reads the stale span in one INST_READ (sts.ReadBlock).
+    # A miss in the EEPROM area fetches the whole EEPROM block, so the
+    # model number, ID, limits, offset and mode of a servo cost one round
+    # trip between them. Writes go straight to the servo and invalidate the
+    # written bytes; writing STS_ID drops the servo's whole copy.
+
+    def __init__(self, ph, ro_ttl=0.02, rw_ttl=1.0):
+        self.ph = ph
+        self.ttl = {REG_EEPROM: None, REG_SRAM_RW: rw_ttl, REG_SRAM_RO: ro_ttl}  # seconds, None = forever
+
+        self.values = {}  # sts_id -> bytearray(CONTROL_TABLE_SIZE)
+        self.stamps = {}  # sts_id -> [time read or None] per address
+        self.errors = {}  # sts_id -> error byte of the last status packet
+
+        self.hit_count = 0
+        self.miss_count = 0
+        self.read_count = 0  # INST_READ round trips
+
+    def _table(self, sts_id):
+        if sts_id not in self.values:
+            self.values[sts_id] = bytearray(CONTROL_TABLE_SIZE)
+            self.stamps[sts_id] = [None] * CONTROL_TABLE_SIZE
+        return self.values[sts_id], self.stamps[sts_id]
+
+    def isFresh(self, sts_id, address, now=None):
+        stamp = self._table(sts_id)[1][address]
+        if stamp is None:
+            return False
+        ttl = self.ttl[registerClass(address)]
+        return (ttl is None) or ((now if now is not None else time.monotonic()) - stamp < ttl)
+
+    def fetch(self, sts_id, address, length):
+        # Read [address, address + length) from the servo into the copy
+        values, stamps = self._table(sts_id)
+        data, result, error = self.ph.ReadBlock(sts_id, address, length)
+        self.read_count += (length + STS_MAX_READ_LENGTH - 1) // STS_MAX_READ_LENGTH
+        if result != COMM_SUCCESS:
+            return result, error
+        now = time.monotonic()
+        values[address:address + length] = bytes(data)
+        stamps[address:address + length] = [now] * length
+        self.errors[sts_id] = error
+        return result, error
+
+    def read(self, sts_id, address, length):
+        # Same result as ph.readTxRx: (data, comm_result, error)
+        if (sts_id >= BROADCAST_ID) or (address + length > CONTROL_TABLE_SIZE):
+            return [], COMM_NOT_AVAILABLE, 0
+
+        now = time.monotonic()
+        stale = [a for a in range(address, address + length) if not self.isFresh(sts_id, a, now)]
+        if stale:
+            start, end = stale[0], stale[-1] + 1
+            if start < STS_TORQUE_ENABLE:
+                start, end = 0, max(end, STS_TORQUE_ENABLE)
+            self.miss_count += 1
+            result, error = self.fetch(sts_id, start, end - start)
+            if result != COMM_SUCCESS:
+                return [], result, error
+        else:
+            self.hit_count += 1
+
+        return list(self.values[sts_id][address:address + length]), COMM_SUCCESS, self.errors.get(sts_id, 0)
+
+    def read1Byte(self, sts_id, address):
+        data, result, error = self.read(sts_id, address, 1)
+        data_read = data[0] if (result == COMM_SUCCESS) else 0
+        return data_read, result, error
+
+    def read2Byte(self, sts_id, address):
+        data, result, error = self.read(sts_id, address, 2)
+        data_read = self.ph.sts_makeword(data[0], data[1]) if (result == COMM_SUCCESS) else 0
+        return data_read, result, error
+
+    def ping(self, sts_id):
+        # PING, with the model number from the mirror
+        if sts_id >= BROADCAST_ID:
+            return 0, COMM_NOT_AVAILABLE, 0
+        _, result, error = self.ph.txRxFrame(sts_id, INST_PING)
+        if result != COMM_SUCCESS:
+            return 0, result, error
+        return self.read2Byte(sts_id, STS_MODEL_L)
+
+    def writeTxRx(self, sts_id, address, length, data):
+        result, error = self.ph.writeTxRx(sts_id, address, length, data)
+        for target in (list(self.stamps) if sts_id == BROADCAST_ID else [sts_id]):
+            self.invalidate(target, address, length)
+        return result, error
+
+    def write1Byte(self, sts_id, address, data):
+        return self.writeTxRx(sts_id, address, 1, [data])
+
+    def write2Byte(self, sts_id, address, data):
+        return self.writeTxRx(sts_id, address, 2, [self.ph.sts_lobyte(data), self.ph.sts_hibyte(data)])
+
+    def invalidate(self, sts_id=None, address=0, length=CONTROL_TABLE_SIZE):
+        # Forget cached bytes; everything for every servo by default
+        if sts_id is None:
+            self.values.clear()
+            self.stamps.clear()
+            self.errors.clear()
+            return
+        if sts_id not in self.stamps:
+            return
+        if address <= STS_ID < address + length:
+            del self.values[sts_id], self.stamps[sts_id]
+            self.errors.pop(sts_id, None)
+            return
+        end = min(address + length, CONTROL_TABLE_SIZE)
+        self.stamps[sts_id][address:end] = [None] * (end - address)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+
+SETTLE_FIELDS = ['position', 'speed', 'moving']  # one sync read span, present position .. moving
+SETTLE_TOLERANCE = 10      # steps
+SETTLE_MIN_PERIOD = 0.002  # seconds between polls, near the goal
+SETTLE_MAX_PERIOD = 0.05   # seconds between polls, far from it (the old fixed poll)
+
+
+class SettleMonitor(object):
+    # Decides when a group of servos has settled, and when to poll next.
+    #
+    # Feed it the states of one sync read of SETTLE_FIELDS per poll. A
+    # servo with a goal is settled once its position is within tolerance
+    # of the goal; without a goal, once it reports MOVING = 0. Goals are in
+    # present position units; pass wrap (e.g. 4096) to compare positions
+    # that wrap around a turn, as in position mode. A wrapped position also
+    # passes the goal on every turn of a multi-turn move, so with wrap the
+    # servo must have stopped (MOVING = 0) as well.
+    #
+    # The poll period follows the slowest servo still moving: half its
+    # estimated time to the tolerance band (distance left / present
+    # speed), between min_period and max_period. When no estimate is
+    # possible (no goal, or a servo that is not moving) the period doubles
+    # from min_period on each poll.
+    #
+    # Without goals the first poll may come before a servo has started
+    # and seen MOVING = 0; pass the goals just sent to rule that out.
+
+    def __init__(self, sts_ids, tolerance=SETTLE_TOLERANCE, goals=None, wrap=None,
+                 min_period=SETTLE_MIN_PERIOD, max_period=SETTLE_MAX_PERIOD):
+        self.sts_ids = list(sts_ids)
+        self.tolerance = tolerance
+        self.goals = goals or {}
+        self.wrap = wrap
+        self.min_period = min_period
+        self.max_period = max_period
+
+        self.unsettled = list(self.sts_ids)
+        self.period = min_period
+        self.backoff = min_period
+        self.polls = 0
+
+    def error(self, sts_id, position):
+        # position - goal, the short way round when positions wrap
+        error = position - self.goals[sts_id]
+        if self.wrap:
+            error = (error + self.wrap // 2) % self.wrap - self.wrap // 2
+        return error
+
+    def update(self, states):
+        # Check one poll's {id: state}; True once every servo has settled
+        self.polls += 1
+        unsettled = []
+        eta = None
+        for sts_id in self.sts_ids:
+            state = states.get(sts_id)
+            if state is None:
+                unsettled.append(sts_id)
+                continue
+            if sts_id in self.goals:
+                remaining = abs(self.error(sts_id, state['position'])) - self.tolerance
+                if remaining <= 0 and not (self.wrap and state['moving']):
+                    continue
+                if state['speed']:
+                    eta = max(eta or 0.0, remaining / float(abs(state['speed'])))
+                unsettled.append(sts_id)
+            elif state['moving']:
+                unsettled.append(sts_id)
+        self.unsettled = unsettled
+
+        if eta is not None:
+            self.period = min(max(eta / 2.0, self.min_period), self.max_period)
+            self.backoff = self.min_period
+        else:
+            self.period = self.backoff
+            self.backoff = min(self.backoff * 2.0, self.max_period)
+        return not unsettled
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+
+import operator
+import time
+from array import array
+
+from .sts import *
+
+
+class JointSnapshot(object):
+    # One complete, consistent copy of every joint's state.
+    __slots__ = ('seq', 'stamp', 'ids', 'fields', 'values', 'valid', 'index')
+
+    def __init__(self, seq, stamp, ids, fields, values, valid, index):
+        self.seq = seq          # publish count, 0 before the first publish
+        self.stamp = stamp      # writer's clock (ns) at publish
+        self.ids = ids
+        self.fields = fields
+        self.values = values    # array('q'), one row of len(fields) per ID
+        self.valid = valid      # bytes, 1 where the ID answered the last poll
+        self.index = index
+
+    def get(self, sts_id, field):
+        i = self.index[sts_id]
+        return self.values[i * len(self.fields) + self.fields.index(field)]
+
+    def state(self, sts_id):
+        # {field: value} of sts_id, or None if it did not answer the last poll
+        i = self.index[sts_id]
+        if not self.valid[i]:
+            return None
+        width = len(self.fields)
+        return dict(zip(self.fields, self.values[i * width:(i + 1) * width]))
+
+
+class StateExchange(object):
+    # Joint state handed from the bus thread to any number of readers
+    # without a lock.
+    #
+    # One writer (the thread that owns the bus) calls publish() with each
+    # poll's {id: state}. It fills the back one of two preallocated
+    # buffers, then bumps seq; the buffer readers copy is always seq & 1.
+    # The writer never waits for a reader, and readers never wait for the
+    # writer: read() copies the front buffer and checks seq did not move
+    # meanwhile (a seqlock over the double buffer), retrying only if a
+    # publish landed during its copy. A reader that copied the buffer
+    # being refilled sees seq change and copies again, so every snapshot
+    # is one complete poll.
+    #
+    # States are SyncReadState dicts or StsTelemetry tuples (the default
+    # fields); None marks an ID that did not answer, and keeps its last
+    # values with valid = 0. Values are integers (acc None is stored as 0).
+    #
+    # Only one thread may publish. The int assignment that publishes and
+    # the buffer copies are single operations under CPython's GIL; the seq
+    # check is what keeps reads whole without it.
+
+    def __init__(self, sts_ids, fields=StsTelemetry._fields, clock=time.monotonic_ns):
+        self.ids = tuple(sts_ids)
+        self.fields = tuple(fields)
+        self.index = dict((sts_id, i) for i, sts_id in enumerate(self.ids))
+        self.attrs = operator.attrgetter(*self.fields)
+        self.items = operator.itemgetter(*self.fields)
+        self.clock = clock
+        size = len(self.ids) * len(self.fields)
+        self.buffers = (array('q', bytes(8 * size)), array('q', bytes(8 * size)))
+        self.valid = (bytearray(len(self.ids)), bytearray(len(self.ids)))
+        self.stamps = [0, 0]
+        self.seq = 0
+        self.retry_count = 0  # reads that had to copy again (approximate: readers race on it)
+
+    def publish(self, states):
+        # Writer only: store one poll ({id: state or None}) and make it current
+        front = self.seq & 1
+        back = front ^ 1
+        values = self.buffers[back]
+        valid = self.valid[back]
+        values[:] = self.buffers[front]  # IDs not in states keep their values
+        valid[:] = self.valid[front]
+
+        width = len(self.fields)
+        for sts_id, state in states.items():
+            i = self.index.get(sts_id)
+            if i is None:
+                continue
+            if state is None:
+                valid[i] = 0
+                continue
+            row = self.items(state) if isinstance(state, dict) else self.attrs(state)
+            values[i * width:(i + 1) * width] = array('q', [value or 0 for value in row])
+            valid[i] = 1
+
+        self.stamps[back] = self.clock()
+        self.seq += 1  # publish
+        return self.seq
+
+    def read(self):
+        # A JointSnapshot of the last complete publish; never blocks
+        while True:
+            seq = self.seq
+            front = seq & 1
+            values = self.buffers[front][:]
+            valid = bytes(self.valid[front])
+            stamp = self.stamps[front]
+            if self.seq == seq:
+                return JointSnapshot(seq, stamp, self.ids, self.fields, values, valid, self.index)
+            self.retry_count += 1
+
+    def get(self, sts_id, field):
+        # One value from the current snapshot
+        return self.read().get(sts_id, field)
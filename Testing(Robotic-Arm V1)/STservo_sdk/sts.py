@@ -1,9 +1,13 @@
 #!/usr/bin/env python
 
+import collections
+import time
+
 from .stservo_def import *
 from .protocol_packet_handler import *
 from .group_sync_read import *
 from .group_sync_write import *
+from .settle import *
 
 #波特率定义
 STS_1M = 0
@@ -54,13 +58,60 @@ STS_PRESENT_LOAD_H = 61
 STS_PRESENT_VOLTAGE = 62
 STS_PRESENT_TEMPERATURE = 63
 STS_MOVING = 66
+STS_MULTI_TURN_L = 67  # 多圈位置 (scripts: abs67)
+STS_MULTI_TURN_H = 68
 STS_PRESENT_CURRENT_L = 69
 STS_PRESENT_CURRENT_H = 70
 
+#状态字段定义 (SyncReadState): name -> (address, length, sign bit)
+STS_STATE_FIELDS = {
+    'position': (STS_PRESENT_POSITION_L, 2, 15),
+    'speed': (STS_PRESENT_SPEED_L, 2, 15),
+    'load': (STS_PRESENT_LOAD_L, 2, 10),
+    'voltage': (STS_PRESENT_VOLTAGE, 1, None),
+    'temperature': (STS_PRESENT_TEMPERATURE, 1, None),
+    'moving': (STS_MOVING, 1, None),
+    'multi_turn': (STS_MULTI_TURN_L, 2, None),
+    'current': (STS_PRESENT_CURRENT_L, 2, 15),
+}
+
+#遥测记录 (ReadTelemetry); acc is None unless it was read
+StsTelemetry = collections.namedtuple('StsTelemetry', ['position', 'speed', 'load', 'voltage', 'temperature',
+                                                       'moving', 'multi_turn', 'current', 'acc'])
+
+#内存表字段定义 (ReadControlTable): name -> (address, length, sign bit)
+STS_CONTROL_TABLE = {
+    'model': (STS_MODEL_L, 2, None),
+    'id': (STS_ID, 1, None),
+    'baud_rate': (STS_BAUD_RATE, 1, None),
+    'min_angle_limit': (STS_MIN_ANGLE_LIMIT_L, 2, 15),
+    'max_angle_limit': (STS_MAX_ANGLE_LIMIT_L, 2, 15),
+    'cw_dead': (STS_CW_DEAD, 1, None),
+    'ccw_dead': (STS_CCW_DEAD, 1, None),
+    'offset': (STS_OFS_L, 2, 11),
+    'mode': (STS_MODE, 1, None),
+    'torque_enable': (STS_TORQUE_ENABLE, 1, None),
+    'acc': (STS_ACC, 1, None),
+    'goal_position': (STS_GOAL_POSITION_L, 2, 15),
+    'goal_time': (STS_GOAL_TIME_L, 2, None),
+    'goal_speed': (STS_GOAL_SPEED_L, 2, 15),
+    'lock': (STS_LOCK, 1, None),
+    'present_position': (STS_PRESENT_POSITION_L, 2, 15),
+    'present_speed': (STS_PRESENT_SPEED_L, 2, 15),
+    'present_load': (STS_PRESENT_LOAD_L, 2, 10),
+    'present_voltage': (STS_PRESENT_VOLTAGE, 1, None),
+    'present_temperature': (STS_PRESENT_TEMPERATURE, 1, None),
+    'moving': (STS_MOVING, 1, None),
+    'multi_turn': (STS_MULTI_TURN_L, 2, None),
+    'present_current': (STS_PRESENT_CURRENT_L, 2, 15),
+}
+STS_MAX_READ_LENGTH = RXPACKET_MAX_LEN - 6  # data bytes in one status packet
+
 class sts(protocol_packet_handler):
     def __init__(self, portHandler):
         protocol_packet_handler.__init__(self, portHandler, 0)
         self.groupSyncWrite = GroupSyncWrite(self, STS_ACC, 7)
+        self.groupSyncRead = GroupSyncRead(self, STS_PRESENT_POSITION_L, STS_PRESENT_CURRENT_H - STS_PRESENT_POSITION_L + 1)
     
     def ReadByte(self, sts_id, address):
         data, sts_comm_result, sts_error = self.read1ByteTxRx(sts_id, address)
@@ -117,33 +168,177 @@ class sts(protocol_packet_handler):
         return self.sts_tohost(sts_present_position, 15), self.sts_tohost(sts_present_speed, 15), sts_comm_result, sts_error
 
     def ReadPosSpeedAccCurrent(self, sts_id):
-        # Read 4 bytes: [Pos_L, Pos_H, Speed_L, Speed_H] starting at STS_PRESENT_POSITION_L
-        pos_speed_32, comm1, err1 = self.read4ByteTxRx(sts_id, STS_PRESENT_POSITION_L)
-        pos_raw = self.sts_loword(pos_speed_32)
-        speed_raw = self.sts_hiword(pos_speed_32)
-
-        # Convert to host signed (15-bit)
-        pos = self.sts_tohost(pos_raw, 15)
-        speed = self.sts_tohost(speed_raw, 15)
-
-        # Read ACC from SRAM (0x29 / STS_ACC)
-        acc, comm2, err2 = self.read1ByteTxRx(sts_id, STS_ACC)
-
-        # Read current (2bytes: 69, 70)
-        current_raw, comm3, err3 = self.read2ByteTxRx(sts_id, STS_PRESENT_CURRENT_L)
-        current = self.sts_tohost(current_raw,15)
-
-        # Prefer to surface any error from either read
-        comm_result = next((c for c in (comm1, comm2, comm3) if c != 0), 0)
-        sts_error = next((e for e in (err1, err2, err3) if e != 0), 0)
-
-        return pos, speed, acc,current, comm_result, sts_error
-
+        # One read of STS_ACC..STS_PRESENT_CURRENT_H (see ReadTelemetry)
+        telemetry, sts_comm_result, sts_error = self.ReadTelemetry(sts_id, with_acc=True)
+        if telemetry is None:
+            return 0, 0, 0, 0, sts_comm_result, sts_error
+        return telemetry.position, telemetry.speed, telemetry.acc, telemetry.current, sts_comm_result, sts_error
+
+    def decodeTelemetry(self, start, data):
+        # StsTelemetry from registers read from start up to STS_PRESENT_CURRENT_H
+        def word(address):
+            return self.sts_makeword(data[address - start], data[address - start + 1])
+
+        return StsTelemetry(self.sts_tohost(word(STS_PRESENT_POSITION_L), 15),
+                            self.sts_tohost(word(STS_PRESENT_SPEED_L), 15),
+                            self.sts_tohost(word(STS_PRESENT_LOAD_L), 10),
+                            data[STS_PRESENT_VOLTAGE - start],
+                            data[STS_PRESENT_TEMPERATURE - start],
+                            data[STS_MOVING - start],
+                            word(STS_MULTI_TURN_L),
+                            self.sts_tohost(word(STS_PRESENT_CURRENT_L), 15),
+                            data[STS_ACC - start] if start <= STS_ACC else None)
+
+    def ReadTelemetry(self, sts_id, with_acc=False):
+        # Present position..current (56-70) in one INST_READ. ACC sits
+        # before the goal registers, so with_acc widens the same read to
+        # start at STS_ACC (41-70) rather than adding a round trip.
+        start = STS_ACC if with_acc else STS_PRESENT_POSITION_L
+        data, sts_comm_result, sts_error = self.readTxRx(sts_id, start, STS_PRESENT_CURRENT_H + 1 - start)
+        if sts_comm_result != COMM_SUCCESS:
+            return None, sts_comm_result, sts_error
+        return self.decodeTelemetry(start, data), sts_comm_result, sts_error
+
+    def SyncReadTelemetry(self, sts_ids, with_acc=False):
+        # ReadTelemetry for many servos in one INST_SYNC_READ.
+        # Returns ({id: StsTelemetry or None}, comm_result)
+        start = STS_ACC if with_acc else STS_PRESENT_POSITION_L
+        data_length = STS_PRESENT_CURRENT_H + 1 - start
+        if (self.groupSyncRead.start_address != start) or (self.groupSyncRead.data_length != data_length):
+            self.groupSyncRead = GroupSyncRead(self, start, data_length)
+
+        self.groupSyncRead.clearParam()
+        for sts_id in sts_ids:
+            self.groupSyncRead.addParam(sts_id)
+
+        sts_comm_result = self.groupSyncRead.txRxPacket()
+
+        telemetry = {}
+        for sts_id in sts_ids:
+            available, _ = self.groupSyncRead.isAvailable(sts_id, start, data_length)
+            telemetry[sts_id] = self.decodeTelemetry(start, self.groupSyncRead.data_dict[sts_id][1:]) if available else None
+        return telemetry, sts_comm_result
 
     def ReadMoving(self, sts_id):
         moving, sts_comm_result, sts_error = self.read1ByteTxRx(sts_id, STS_MOVING)
         return moving, sts_comm_result, sts_error
 
+    def SyncReadState(self, sts_ids, fields=None):
+        # One INST_SYNC_READ over the span covering the requested fields.
+        # Returns ({id: {field: value, ..., 'error': err} or None}, comm_result)
+        if fields is None:
+            fields = list(STS_STATE_FIELDS)
+
+        start_address = min(STS_STATE_FIELDS[f][0] for f in fields)
+        end_address = max(STS_STATE_FIELDS[f][0] + STS_STATE_FIELDS[f][1] for f in fields)
+        if (self.groupSyncRead.start_address != start_address) or (self.groupSyncRead.data_length != end_address - start_address):
+            self.groupSyncRead = GroupSyncRead(self, start_address, end_address - start_address)
+
+        self.groupSyncRead.clearParam()
+        for sts_id in sts_ids:
+            self.groupSyncRead.addParam(sts_id)
+
+        sts_comm_result = self.groupSyncRead.txRxPacket()
+
+        states = {}
+        for sts_id in sts_ids:
+            available, sts_error = self.groupSyncRead.isAvailable(sts_id, start_address, end_address - start_address)
+            if not available:
+                states[sts_id] = None
+                continue
+
+            state = {'error': sts_error}
+            for f in fields:
+                address, length, sign_bit = STS_STATE_FIELDS[f]
+                value = self.groupSyncRead.getData(sts_id, address, length)
+                state[f] = value if sign_bit is None else self.sts_tohost(value, sign_bit)
+            states[sts_id] = state
+
+        return states, sts_comm_result
+
+    def AwaitSettled(self, sts_ids, tolerance=SETTLE_TOLERANCE, timeout=5.0, goals=None, wrap=None, sleep=time.sleep):
+        # Poll position, speed and MOVING of every ID with one sync read at a
+        # time until all are settled (see SettleMonitor), or timeout seconds.
+        # Returns (settled, {id: state or None} of the last poll)
+        monitor = SettleMonitor(sts_ids, tolerance, goals, wrap)
+        clock = self.portHandler.getClock()
+        deadline = clock() + int(timeout * 1000000000)
+        while True:
+            states, _ = self.SyncReadState(sts_ids, SETTLE_FIELDS)
+            if monitor.update(states):
+                return True, states
+            if clock() + int(monitor.period * 1000000000) > deadline:
+                return False, states
+            sleep(monitor.period)
+
+    def ReadBlock(self, sts_id, address, length):
+        # INST_READ of any length, split into STS_MAX_READ_LENGTH chunks
+        data = []
+        sts_error = 0
+        end = address + length
+        while address < end:
+            chunk = min(end - address, STS_MAX_READ_LENGTH)
+            data_read, sts_comm_result, sts_error = self.readTxRx(sts_id, address, chunk)
+            if sts_comm_result != COMM_SUCCESS:
+                return [], sts_comm_result, sts_error
+            data.extend(data_read)
+            address += chunk
+        return data, COMM_SUCCESS, sts_error
+
+    def decodeControlTable(self, start, data):
+        # {field name: value} for the STS_CONTROL_TABLE fields inside data,
+        # plus 'raw': {address: byte} for every byte read
+        snapshot = {}
+        end = start + len(data)
+        for name, (address, length, sign_bit) in STS_CONTROL_TABLE.items():
+            if (address < start) or (address + length > end):
+                continue
+            idx = address - start
+            value = data[idx] if length == 1 else self.sts_makeword(data[idx], data[idx + 1])
+            snapshot[name] = value if sign_bit is None else self.sts_tohost(value, sign_bit)
+        snapshot['raw'] = dict(zip(range(start, end), data))
+        return snapshot
+
+    def ReadControlTable(self, sts_id, start=0, end=STS_PRESENT_CURRENT_H + 1):
+        # Registers [start, end) of one servo as a named-field snapshot
+        data, sts_comm_result, sts_error = self.ReadBlock(sts_id, start, end - start)
+        if sts_comm_result != COMM_SUCCESS:
+            return None, sts_comm_result, sts_error
+        return self.decodeControlTable(start, data), sts_comm_result, sts_error
+
+    def ReadControlTables(self, sts_ids, start=0, end=STS_PRESENT_CURRENT_H + 1):
+        # ReadControlTable for many servos, one INST_SYNC_READ per chunk.
+        # Returns ({id: snapshot or None}, comm_result)
+        data = dict((sts_id, []) for sts_id in sts_ids)
+        errors = {}
+        sts_comm_result = COMM_SUCCESS
+        address = start
+        while address < end:
+            chunk = min(end - address, STS_MAX_READ_LENGTH)
+            groupSyncRead = GroupSyncRead(self, address, chunk)
+            for sts_id in sts_ids:
+                groupSyncRead.addParam(sts_id)
+            result = groupSyncRead.txRxPacket()
+            if result != COMM_SUCCESS:
+                sts_comm_result = result
+            for sts_id in sts_ids:
+                rxdata = groupSyncRead.data_dict.get(sts_id)
+                if (data[sts_id] is None) or not rxdata:
+                    data[sts_id] = None
+                    continue
+                errors[sts_id] = rxdata[0]
+                data[sts_id].extend(rxdata[1:])
+            address += chunk
+
+        snapshots = {}
+        for sts_id in sts_ids:
+            if data[sts_id] is None:
+                snapshots[sts_id] = None
+                continue
+            snapshots[sts_id] = self.decodeControlTable(start, data[sts_id])
+            snapshots[sts_id]['error'] = errors[sts_id]
+        return snapshots, sts_comm_result
+
     def SyncWritePosEx(self, sts_id, position, speed, acc):
         txpacket = [acc, self.sts_lobyte(position), self.sts_hibyte(position), 0, 0, self.sts_lobyte(speed), self.sts_hibyte(speed)]
         return self.groupSyncWrite.addParam(sts_id, txpacket)
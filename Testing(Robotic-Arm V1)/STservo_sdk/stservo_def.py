@@ -23,3 +23,8 @@ COMM_RX_WAITING = -5  # Now recieving status packet
 COMM_RX_TIMEOUT = -6  # There is no status packet
 COMM_RX_CORRUPT = -7  # Incorrect status packet
 COMM_NOT_AVAILABLE = -9  #
+
+# Bus trace record kinds (BusTracer)
+TRACE_TX = 1  # bytes written to the port
+TRACE_RX = 2  # bytes read from the port
+TRACE_RESULT = 3  # result of a transaction step, timed from the last TX
@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+
+import math
+from array import array
+
+from .stservo_def import *
+from .group_sync_write import *
+from .sts import *
+from .control_loop import *
+
+TRAJ_TRAPEZOID = 0  # acceleration limited, jerk unbounded at the phase changes
+TRAJ_SCURVE = 1     # 7-segment jerk limited
+TRAJ_QUINTIC = 2    # quintic polynomial, zero velocity and acceleration at both ends
+
+# Default per-joint limits in steps: steps/s, steps/s^2, steps/s^3.
+# 3400 steps/s is the STS top speed; 5000 steps/s^2 is ACC 50, what the
+# scripts use (STS_MOVING_ACC).
+DEFAULT_VELOCITY = 3400.0
+DEFAULT_ACCELERATION = 5000.0
+DEFAULT_JERK = 50000.0
+
+GOAL_LENGTH = 7        # [acc, pos_L, pos_H, 0, 0, speed_L, speed_H] at STS_ACC
+SPEED_MARGIN = 1.2     # goal speed headroom over the planned speed, so a lagging servo catches up
+
+
+def _trapezoid(distance, v_max, a_max):
+    # (duration, peak velocity) of the fastest trapezoid over distance
+    v = min(v_max, math.sqrt(distance * a_max))  # triangular when the move is short
+    return distance / v + v / a_max, v
+
+
+def _trapezoidAt(t, distance, T, v, a):
+    ta = v / a
+    if t <= ta:
+        return 0.5 * a * t * t
+    if t < T - ta:
+        return 0.5 * v * ta + v * (t - ta)
+    u = T - t
+    return distance - 0.5 * a * u * u
+
+
+def _scurveRamp(v, a_max, j):
+    # (ramp time, jerk time, distance) of a jerk limited ramp from 0 to v
+    if v * j >= a_max * a_max:
+        tj = a_max / j
+        ta = v / a_max + tj
+    else:
+        tj = math.sqrt(v / j)
+        ta = 2.0 * tj
+    return ta, tj, 0.5 * v * ta
+
+
+def _scurve(distance, v_max, a_max, j):
+    # (duration, peak velocity) of the fastest jerk limited move over distance
+    v = v_max
+    ta, tj, da = _scurveRamp(v, a_max, j)
+    if 2.0 * da > distance:
+        # too short to reach v_max: find the peak velocity whose ramps cover it
+        low, high = 0.0, v_max
+        for _ in range(50):
+            v = 0.5 * (low + high)
+            if 2.0 * _scurveRamp(v, a_max, j)[2] > distance:
+                high = v
+            else:
+                low = v
+        v = low
+        ta, tj, da = _scurveRamp(v, a_max, j)
+    return 2.0 * ta + (distance - 2.0 * da) / v, v
+
+
+def _scurveRampAt(t, v, ta, tj, j):
+    # distance covered t seconds into the ramp
+    if t <= tj:
+        return j * t * t * t / 6.0
+    if t <= ta - tj:
+        a = j * tj
+        tau = t - tj
+        return j * tj * tj * tj / 6.0 + 0.5 * j * tj * tj * tau + 0.5 * a * tau * tau
+    u = ta - t
+    return 0.5 * v * ta - v * u + j * u * u * u / 6.0
+
+
+def _scurveAt(t, distance, T, v, a_max, j):
+    ta, tj, da = _scurveRamp(v, a_max, j)
+    if t <= ta:
+        return _scurveRampAt(t, v, ta, tj, j)
+    if t < T - ta:
+        return da + v * (t - ta)
+    return distance - _scurveRampAt(T - t, v, ta, tj, j)
+
+
+def _quintic(distance, v_max, a_max, j):
+    # peak |v|, |a|, |j| of s = D(10τ^3 - 15τ^4 + 6τ^5) are 1.875D/T, 5.7735D/T^2, 60D/T^3
+    return max(1.875 * distance / v_max, math.sqrt(5.7735 * distance / a_max),
+               (60.0 * distance / j) ** (1.0 / 3.0)), None
+
+
+def _quinticAt(t, distance, T, v, a_max, j):
+    tau = t / T
+    return distance * tau * tau * tau * (10.0 - 15.0 * tau + 6.0 * tau * tau)
+
+
+class Trajectory(object):
+    # A time-parameterised multi-joint move, sampled once per control tick.
+    #
+    # Each joint gets the fastest profile its limits allow for its own
+    # distance; the others are then stretched in time to the slowest one,
+    # so all joints start and arrive together. Stretching a profile by
+    # k >= 1 scales its velocity by 1/k, acceleration by 1/k^2 and jerk by
+    # 1/k^3, so every joint stays inside its limits.
+    #
+    # Planning samples the whole move up front: positions[sts_id] is an
+    # array('i') of goal positions, one per tick, and params holds every
+    # tick's GroupSyncWrite param block (ID + 7 goal bytes per servo) back
+    # to back. Playing it back is a slice per tick, not a re-plan.
+    #
+    # limits is {sts_id: (velocity, acceleration, jerk)} in steps/s,
+    # steps/s^2, steps/s^3; missing IDs use the defaults. Jerk is ignored
+    # by TRAJ_TRAPEZOID.
+
+    def __init__(self, starts, goals, rate_hz, profile=TRAJ_SCURVE, limits=None):
+        self.ids = list(goals)
+        self.rate_hz = rate_hz
+        self.profile = profile
+        self.starts = dict((sts_id, int(starts[sts_id])) for sts_id in self.ids)
+        self.goals = dict((sts_id, int(goals[sts_id])) for sts_id in self.ids)
+        limits = limits or {}
+
+        plan, at = {TRAJ_TRAPEZOID: (_trapezoid, _trapezoidAt),
+                    TRAJ_SCURVE: (_scurve, _scurveAt),
+                    TRAJ_QUINTIC: (_quintic, _quinticAt)}[profile]
+
+        # fastest move of each joint on its own
+        self.joints = {}  # sts_id -> (distance, duration, peak velocity, acceleration, jerk)
+        for sts_id in self.ids:
+            v_max, a_max, j_max = limits.get(sts_id, (DEFAULT_VELOCITY, DEFAULT_ACCELERATION, DEFAULT_JERK))
+            distance = abs(self.goals[sts_id] - self.starts[sts_id])
+            if distance == 0:
+                self.joints[sts_id] = (0, 0.0, 0.0, a_max, j_max)
+                continue
+            if profile == TRAJ_TRAPEZOID:
+                duration, v = plan(distance, v_max, a_max)
+            else:
+                duration, v = plan(distance, v_max, a_max, j_max)
+            self.joints[sts_id] = (distance, duration, v, a_max, j_max)
+
+        self.duration = max([joint[1] for joint in self.joints.values()] + [0.0])
+        self.count = int(math.ceil(self.duration * rate_hz)) + 1  # ticks, the last one at the goal
+
+        # sample every joint on the common time base
+        self.positions = {}
+        for sts_id in self.ids:
+            start, goal = self.starts[sts_id], self.goals[sts_id]
+            distance, duration, v, a, j = self.joints[sts_id]
+            samples = array('i', [goal]) * self.count
+            if distance:
+                direction = 1 if goal > start else -1
+                scale = duration / self.duration
+                for i in range(self.count - 1):
+                    t = min(i / rate_hz, self.duration) * scale
+                    if profile == TRAJ_TRAPEZOID:
+                        s = at(t, distance, duration, v, a)
+                    else:
+                        s = at(t, distance, duration, v, a, j)
+                    samples[i] = start + direction * int(round(s))
+            self.positions[sts_id] = samples
+
+        # goal speed per tick: the planned speed into the next sample, with headroom
+        self.speeds = {}
+        for sts_id in self.ids:
+            samples = self.positions[sts_id]
+            speeds = array('H', bytes(2 * self.count))
+            for i in range(self.count):
+                step = max(abs(samples[min(i + 1, self.count - 1)] - samples[i]),
+                           abs(samples[i] - samples[max(i - 1, 0)]))
+                speeds[i] = min(int(math.ceil(step * rate_hz * SPEED_MARGIN)), 0x7FFF)
+            self.speeds[sts_id] = speeds
+
+        # every tick's sync write param block, prebuilt
+        self.block_length = len(self.ids) * (1 + GOAL_LENGTH)
+        params = bytearray(self.count * self.block_length)
+        offset = 0
+        for i in range(self.count):
+            for sts_id in self.ids:
+                position = self.positions[sts_id][i] & 0xFFFF  # two's complement, as WriteSignedPosEx
+                speed = self.speeds[sts_id][i]
+                params[offset:offset + 1 + GOAL_LENGTH] = bytes((
+                    sts_id, 0, position & 0xFF, (position >> 8) & 0xFF, 0, 0, speed & 0xFF, (speed >> 8) & 0xFF))
+                offset += 1 + GOAL_LENGTH
+        self.params = params
+        self.view = memoryview(params)
+
+    def sample(self, index):
+        # Param block of tick index (clamped to the last tick), for GroupSyncWrite.txParam
+        index = min(index, self.count - 1)
+        return self.view[index * self.block_length:(index + 1) * self.block_length]
+
+    def setpoints(self, index):
+        # {sts_id: goal position} at tick index
+        index = min(index, self.count - 1)
+        return dict((sts_id, self.positions[sts_id][index]) for sts_id in self.ids)
+
+
+class TrajectoryPlayer(object):
+    # Streams a Trajectory to the servos, one sample per control tick, as a
+    # single GroupSyncWrite broadcast.
+    #
+    # write() sends the next sample and has ControlLoop's write signature,
+    # so a loop can read state and stream in the same cycle:
+    #
+    #   player.start(Trajectory(starts, goals, 100))
+    #   ControlLoop(100, read=..., write=player.write).run(cycles=player.remaining())
+    #
+    # or play() runs it on a loop of its own. After the last sample the goal
+    # is held; stop() ends the move early with the servos at their last
+    # setpoint.
+
+    def __init__(self, ph):
+        self.ph = ph
+        self.groupSyncWrite = GroupSyncWrite(ph, STS_ACC, GOAL_LENGTH)
+        self.trajectory = None
+        self.index = 0
+        self.error_count = 0
+
+    def start(self, trajectory):
+        self.trajectory = trajectory
+        self.index = 0
+
+    def stop(self):
+        self.trajectory = None
+
+    def isDone(self):
+        return (self.trajectory is None) or (self.index >= self.trajectory.count)
+
+    def remaining(self):
+        return 0 if self.trajectory is None else max(self.trajectory.count - self.index, 0)
+
+    def setpoints(self):
+        # {sts_id: position} last sent
+        if self.trajectory is None or self.index == 0:
+            return {}
+        return self.trajectory.setpoints(self.index - 1)
+
+    def write(self, command=None):
+        # Send the next sample; COMM_SUCCESS without a packet once the move is done
+        if self.isDone():
+            return COMM_SUCCESS
+        sts_comm_result = self.groupSyncWrite.txParam(self.trajectory.sample(self.index))
+        if sts_comm_result != COMM_SUCCESS:
+            self.error_count += 1
+        self.index += 1
+        return sts_comm_result
+
+    def play(self, trajectory, loop=None):
+        # Stream the whole trajectory at its rate; returns the ControlLoop used
+        self.start(trajectory)
+        if loop is None:
+            loop = ControlLoop(trajectory.rate_hz, write=self.write)
+        else:
+            loop.write = self.write
+        loop.run(cycles=self.remaining())
+        return loop
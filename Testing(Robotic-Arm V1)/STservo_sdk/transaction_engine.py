@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+
+import threading
+import collections
+from concurrent.futures import Future
+
+from .stservo_def import *
+from .protocol_packet_handler import *
+from .sts import *
+
+
+class _Request(object):
+    __slots__ = ('packet', 'sts_id', 'rx_length', 'decode', 'future')
+
+    def __init__(self, packet, sts_id, rx_length, decode, future):
+        self.packet = packet
+        self.sts_id = sts_id
+        self.rx_length = rx_length  # expected status packet length, None = no reply
+        self.decode = decode
+        self.future = future
+
+
+class TransactionEngine(object):
+    # Queues instruction packets and runs them on a dedicated bus thread.
+    #
+    # Packets are encoded when they are submitted, so the bus thread only
+    # writes, waits and matches replies to requests by ID. Each submit
+    # returns a concurrent.futures.Future (add_done_callback for callbacks).
+    #
+    # Write-only packets (sync write, broadcast, TxOnly) queued ahead of a
+    # request are sent in the same port write. window is how many
+    # reply-expecting requests may be on the wire at once. Keep it at 1 on a
+    # half-duplex bus unless the servos' return delay covers the wire time
+    # of the requests sent behind them, or the replies will collide.
+    #
+    # The engine must own the port: do not use the packet handler's TxRx
+    # methods directly while it is running.
+    #
+    # If a batch raises (a serial error, a decode that chokes on a bad
+    # reply), its requests resolve as COMM_RX_FAIL and those still queued
+    # as COMM_PORT_BUSY; the port is released and the thread keeps serving.
+
+    def __init__(self, ph, window=1):
+        self.ph = ph
+        self.window = window
+
+        self.queue = collections.deque()
+        self.cond = threading.Condition()
+        self.is_running = False
+        self.thread = None
+
+        self.tx_count = 0
+        self.rx_count = 0
+        self.batch_count = 0
+
+    def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        self.thread = threading.Thread(target=self._run, name="sts_bus", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.cond:
+            self.is_running = False
+            self.cond.notify()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def submit(self, sts_id, instruction, head=(), param=(), rx_length=None, decode=None):
+        future = Future()
+        packet = self.ph.makePacket(sts_id, instruction, head, param)
+        if len(packet) > TXPACKET_MAX_LEN:
+            future.set_result(decode(None, COMM_TX_ERROR, 0) if decode else (COMM_TX_ERROR, 0))
+            return future
+
+        request = _Request(packet, sts_id, rx_length, decode, future)
+        with self.cond:
+            self.queue.append(request)
+            self.cond.notify()
+        return future
+
+    def pending(self):
+        return len(self.queue)
+
+    # --- protocol helpers ---
+    # Reads resolve like the protocol_packet_handler methods; every write,
+    # broadcast or not, resolves to (result, error) (error is 0 without a reply).
+
+    def ping(self, sts_id):
+        # -> Future of (model_number, result, error); the model number read
+        # answers the ping, so this is one round trip where ph.ping takes two
+        if sts_id >= BROADCAST_ID:
+            future = Future()
+            future.set_result((0, COMM_NOT_AVAILABLE, 0))
+            return future
+        return self.submit(sts_id, INST_READ, (STS_MODEL_L, 2), rx_length=8, decode=self._decodeWord)
+
+    def readTxRx(self, sts_id, address, length):
+        # -> Future of (data, result, error)
+        return self.submit(sts_id, INST_READ, (address, length), rx_length=length + 6, decode=self._decodeRead)
+
+    def writeTxRx(self, sts_id, address, length, data):
+        # -> Future of (result, error)
+        rx_length = None if sts_id == BROADCAST_ID else 6
+        return self.submit(sts_id, INST_WRITE, (address,), data[0: length], rx_length=rx_length)
+
+    def writeTxOnly(self, sts_id, address, length, data):
+        return self.submit(sts_id, INST_WRITE, (address,), data[0: length])
+
+    def regWriteTxRx(self, sts_id, address, length, data):
+        rx_length = None if sts_id == BROADCAST_ID else 6
+        return self.submit(sts_id, INST_REG_WRITE, (address,), data[0: length], rx_length=rx_length)
+
+    def action(self, sts_id):
+        rx_length = None if sts_id == BROADCAST_ID else 6
+        return self.submit(sts_id, INST_ACTION, rx_length=rx_length)
+
+    def syncWriteTxOnly(self, start_address, data_length, param, param_length):
+        return self.submit(BROADCAST_ID, INST_SYNC_WRITE, (start_address, data_length), param[0: param_length])
+
+    # --- sts helpers ---
+
+    def ReadPos(self, sts_id):
+        # -> Future of (position, result, error)
+        return self.submit(sts_id, INST_READ, (STS_PRESENT_POSITION_L, 2), rx_length=8, decode=self._decodePos)
+
+    def WritePosEx(self, sts_id, position, speed, acc):
+        ph = self.ph
+        txpacket = [acc, ph.sts_lobyte(position), ph.sts_hibyte(position), 0, 0, ph.sts_lobyte(speed), ph.sts_hibyte(speed)]
+        return self.writeTxRx(sts_id, STS_ACC, len(txpacket), txpacket)
+
+    def WriteSignedPosEx(self, sts_id, signed_position, speed, acc):
+        position = signed_position & 0xFFFF  # 2's complement conversion
+        txpacket = [acc, position & 0xFF, (position >> 8) & 0xFF, 0, 0, speed & 0xFF, (speed >> 8) & 0xFF]
+        return self.writeTxRx(sts_id, STS_ACC, len(txpacket), txpacket)
+
+    def _decodeRead(self, rxpacket, result, error):
+        if result != COMM_SUCCESS:
+            return [], result, error
+        length = rxpacket[PKT_LENGTH] - 2
+        return list(rxpacket[PKT_PARAMETER0: PKT_PARAMETER0 + length]), result, error
+
+    def _decodeWord(self, rxpacket, result, error):
+        if result != COMM_SUCCESS:
+            return 0, result, error
+        return self.ph.sts_makeword(rxpacket[PKT_PARAMETER0], rxpacket[PKT_PARAMETER0 + 1]), result, error
+
+    def _decodePos(self, rxpacket, result, error):
+        if result != COMM_SUCCESS:
+            return 0, result, error
+        position = self.ph.sts_makeword(rxpacket[PKT_PARAMETER0], rxpacket[PKT_PARAMETER0 + 1])
+        return self.ph.sts_tohost(position, 15), result, error
+
+    # --- bus thread ---
+
+    def _finish(self, request, rxpacket, result, error):
+        if request.decode is not None:
+            request.future.set_result(request.decode(rxpacket, result, error))
+        else:
+            request.future.set_result((result, error))
+
+    def _fail(self, requests, result, exc):
+        # Resolve whatever is left of requests after a bus thread error
+        for request in requests:
+            if request.future.done():
+                continue
+            try:
+                self._finish(request, None, result, 0)
+            except Exception:
+                request.future.set_exception(exc)
+
+    def _takeBatch(self):
+        # Leading write-only packets plus up to `window` requests that expect a reply
+        batch = []
+        replies = 0
+        while self.queue and replies < self.window:
+            request = self.queue.popleft()
+            batch.append(request)
+            if request.rx_length is not None:
+                replies += 1
+        return batch
+
+    def _run(self):
+        ph = self.ph
+        portHandler = ph.portHandler
+        while True:
+            with self.cond:
+                while self.is_running and not self.queue:
+                    self.cond.wait()
+                if not self.queue:
+                    return
+                batch = self._takeBatch()
+
+            try:
+                out = bytearray()
+                for request in batch:
+                    out.extend(request.packet)
+
+                portHandler.is_using = True
+                portHandler.clearPort()
+                written = portHandler.writePort(out)
+                self.tx_count += len(batch)
+                self.batch_count += 1
+
+                tx_result = COMM_SUCCESS if written == len(out) else COMM_TX_FAIL
+                outstanding = []
+                for request in batch:
+                    if request.rx_length is None or tx_result != COMM_SUCCESS:
+                        self._finish(request, None, tx_result, 0)
+                    else:
+                        outstanding.append(request)
+
+                if outstanding:
+                    portHandler.setPacketTimeout(sum(request.rx_length for request in outstanding))
+                while outstanding:
+                    rxpacket, result = ph.rxPacket(outstanding[0].rx_length)
+                    if result != COMM_SUCCESS:
+                        for request in outstanding:
+                            self._finish(request, None, result, 0)
+                        break
+
+                    self.rx_count += 1
+                    for idx, request in enumerate(outstanding):
+                        if request.sts_id == rxpacket[PKT_ID]:
+                            del outstanding[idx]
+                            self._finish(request, rxpacket, result, rxpacket[PKT_ERROR])
+                            break
+            except Exception as exc:
+                with self.cond:
+                    queued = list(self.queue)
+                    self.queue.clear()
+                self._fail(batch, COMM_RX_FAIL, exc)
+                self._fail(queued, COMM_PORT_BUSY, exc)
+            finally:
+                portHandler.is_using = False
@@ -24,6 +24,7 @@ else:
 
 sys.path.append("..")
 from STservo_sdk import *
+from Maths.ik_grid import IKGrid
 
 # Settings
 motor_IDS = [1,2,3,4,5]
@@ -35,6 +36,7 @@ TICKS_PER_TURN = 4096
 
 STS_MOVING_SPEED = 1200
 STS_MOVING_ACC = 50
+ZERO_TIMEOUT = 30.0  # seconds to wait for the motors to reach 0
 
 output_position = []
 target_angle = []
@@ -47,6 +49,17 @@ l3 = 24.25
 x = -20  # target x in cm
 y = -10  # target y in cm
 phi = -np.pi/2  # desired end-effector orientation in radians
+IK_GRID_FILE = None  # e.g. 'ik_grid.npy' to use a precomputed IK grid instead of solving each tick
+
+
+# Optional precomputed IK (Maths/ik_grid.py), built for phi on first use
+ikGrid = None
+if IK_GRID_FILE:
+    if os.path.exists(IK_GRID_FILE):
+        ikGrid = IKGrid.load(IK_GRID_FILE)
+    if ikGrid is None or (ikGrid.l1, ikGrid.l2, ikGrid.l3) != (l1, l2, l3):
+        ikGrid = IKGrid.build([phi], l1=l1, l2=l2, l3=l3)
+        ikGrid.save(IK_GRID_FILE)
 
 
 # Setup
@@ -94,18 +107,9 @@ for sid in motor_IDS:
 print("Sending To Zero")
 for sid in motor_IDS:
     packetHandler.WriteSignedPosEx(sid, 0, STS_MOVING_SPEED, STS_MOVING_ACC)
-time.sleep(1)
-# Wait until all motors have stopped moving
-all_stopped = False
-while not all_stopped:
-    all_stopped = True
-    for sid in motor_IDS:
-        moving, _, _ = packetHandler.ReadMoving(sid)
-        if moving != 0:
-            all_stopped = False
-            break
-    time.sleep(0.05)  
-print("At Zero")
+# Wait until every motor is at 0 (one sync read per poll)
+settled, _ = packetHandler.AwaitSettled(motor_IDS, timeout=ZERO_TIMEOUT, goals=dict.fromkeys(motor_IDS, 0), wrap=TICKS_PER_TURN)
+print("At Zero" if settled else "Timed out on the way to zero")
 
 def unsigned_to_signed_16bit(val):
     return val - 0x10000 if val > 0x7FFF else val
@@ -139,7 +143,7 @@ def analytical_ik_3dof(x, y, phi=0.0):
     return np.degrees([theta1, theta2, theta3])
 
 def updatexy(x,y,phi):
-    angles = analytical_ik_3dof(x, y, phi)
+    angles = ikGrid.solve_planar(x, y, phi) if ikGrid else analytical_ik_3dof(x, y, phi)
 
     if angles is None:
         print("Target is unreachable.")
@@ -177,18 +181,9 @@ while running:
         print("Sending To Zero")
         for sid in motor_IDS:
             packetHandler.WriteSignedPosEx(sid, 0, STS_MOVING_SPEED, STS_MOVING_ACC)
-        time.sleep(1)
-        # Wait until all motors have stopped moving
-        all_stopped = False
-        while not all_stopped:
-            all_stopped = True
-            for sid in motor_IDS:
-                moving, _, _ = packetHandler.ReadMoving(sid)
-                if moving != 0:
-                    all_stopped = False
-                    break
-            time.sleep(0.05)  
-        print("At Zero")
+        # Wait until every motor is at 0 (one sync read per poll)
+        settled, _ = packetHandler.AwaitSettled(motor_IDS, timeout=ZERO_TIMEOUT, goals=dict.fromkeys(motor_IDS, 0), wrap=TICKS_PER_TURN)
+        print("At Zero" if settled else "Timed out on the way to zero")
         running = False
         break
     if now - last_update_time > update_interval:
@@ -24,6 +24,8 @@ else:
 
 sys.path.append("..")
 from STservo_sdk import *
+from Maths.ik_grid import IKGrid
+from Maths.workspace import WorkspaceMap, joint_limits_from_ticks
 
 # Settings
 motor_IDS = [1,2,3,4,5]
@@ -34,12 +36,16 @@ DEVICENAME = 'COM4'            # Change this to match port (Linux: '/dev/ttyUSB0
 TICKS_PER_TURN = 4096
 STS_MOVING_SPEED = 1200
 STS_MOVING_ACC = 50
+ZERO_TIMEOUT = 30.0  # seconds to wait for the motors to reach 0
+GOAL_REFRESH_PERIOD = 0.2  # seconds between resends of every goal, in case a servo missed a sync write
 
 # Inital 3d target:
 x = 10
 y = 0
 z= 15
 phi = -np.pi / 2  # orientation
+IK_GRID_FILE = None  # e.g. 'ik_grid.npy' to use a precomputed IK grid instead of solving each tick
+WORKSPACE_FILE = None  # e.g. 'workspace.npy' to clamp targets to the reachable workspace
 
 output_position = []
 target_angle = []
@@ -50,12 +56,38 @@ l2 = 22.85
 l3 = 24.25  
 
 
+# Optional precomputed IK (Maths/ik_grid.py), built for phi on first use
+ikGrid = None
+if IK_GRID_FILE:
+    if os.path.exists(IK_GRID_FILE):
+        ikGrid = IKGrid.load(IK_GRID_FILE)
+    if ikGrid is None or (ikGrid.l1, ikGrid.l2, ikGrid.l3) != (l1, l2, l3):
+        ikGrid = IKGrid.build([phi], l1=l1, l2=l2, l3=l3)
+        ikGrid.save(IK_GRID_FILE)
+
+# Optional reachability map (Maths/workspace.py) for phi and the servo limits, built on first use
+# (rebuilt if the saved one is for another phi, other limits or link lengths)
+workspaceMap = None
+if WORKSPACE_FILE:
+    limits = joint_limits_from_ticks(starting_angles=starting_angles[:4])
+    if os.path.exists(WORKSPACE_FILE):
+        workspaceMap = WorkspaceMap.load(WORKSPACE_FILE)
+        if not workspaceMap.matches(limits, phi=phi, l1=l1, l2=l2, l3=l3):
+            print("Saved workspace map is stale, rebuilding it")
+            workspaceMap = None  # release the memory-mapped files before overwriting them
+    if workspaceMap is None:
+        workspaceMap = WorkspaceMap.build(limits, phi=phi, l1=l1, l2=l2, l3=l3)
+        workspaceMap.save(WORKSPACE_FILE)
+
+
 
 
 # Setup
 
 portHandler = PortHandler(DEVICENAME)
 packetHandler = sts(portHandler)
+packetHandler.setAdaptiveTimeout(AdaptiveTimeout())  # a missing servo stops costing 50 ms per read
+goalCache = GoalWriteCache(packetHandler, refresh_period=GOAL_REFRESH_PERIOD)
 
 if not portHandler.openPort():
     print("Failed to open port.")
@@ -97,18 +129,9 @@ for sid in motor_IDS:
 print("Sending To Zero")
 for sid in motor_IDS:
     packetHandler.WriteSignedPosEx(sid, 0, STS_MOVING_SPEED, STS_MOVING_ACC)
-time.sleep(1)
-# Wait until all motors have stopped moving
-all_stopped = False
-while not all_stopped:
-    all_stopped = True
-    for sid in motor_IDS:
-        moving, _, _ = packetHandler.ReadMoving(sid)
-        if moving != 0:
-            all_stopped = False
-            break
-    time.sleep(0.05)  
-print("At Zero")
+# Wait until every motor is at 0 (one sync read per poll)
+settled, _ = packetHandler.AwaitSettled(motor_IDS, timeout=ZERO_TIMEOUT, goals=dict.fromkeys(motor_IDS, 0), wrap=TICKS_PER_TURN)
+print("At Zero" if settled else "Timed out on the way to zero")
 
 
 def analytical_ik_3dof_with_base(x, y, z, phi):
@@ -143,10 +166,14 @@ def analytical_ik_3dof_with_base(x, y, z, phi):
     return np.degrees([theta0, theta1, theta2, theta3])
 
 def update_position(x, y, z, phi):
-    angles = analytical_ik_3dof_with_base(x, y, z, phi)
+    # Returns the target actually used, (x, y, z) clamped into the workspace
+    if workspaceMap is not None and not workspaceMap.isReachable(x, y, z):
+        x, y, z = [float(v) for v in workspaceMap.clamp(x, y, z)]
+        print(f"Outside the workspace, moving to the nearest reachable point ({x:.1f}, {y:.1f}, {z:.1f})")
+    angles = ikGrid.solve(x, y, z, phi) if ikGrid else analytical_ik_3dof_with_base(x, y, z, phi)
     if angles is None:
             print("Unreachable.")
-            return
+            return x, y, z
     
     theta0, theta1, theta2, theta3 = angles
     print(f"θ0: {theta0:.1f}, θ1: {theta1:.1f}, θ2: {theta2:.1f}, θ3: {theta3:.1f}")
@@ -156,6 +183,7 @@ def update_position(x, y, z, phi):
     target_angle[2] = int(-theta2)
     target_angle[3] = int(450-theta3)
     print(target_angle)
+    return x, y, z
 
 
 
@@ -171,10 +199,11 @@ while running:
     axis_valy = joystick.get_axis(0)
     axis_valx = joystick.get_axis(1)
 
-    # Sending the array of angles to the motor
+    # Sending the array of angles to the motor (changed goals only, in one sync write)
     for sid in motor_IDS:
         output_position[sid-1] = int((target_angle[sid-1]-starting_angles[sid-1]) * (TICKS_PER_TURN / 18))
-        packetHandler.WriteSignedPosEx(sid, output_position[sid - 1], STS_MOVING_SPEED, STS_MOVING_ACC)
+        goalCache.setGoal(sid, output_position[sid - 1], STS_MOVING_SPEED, STS_MOVING_ACC)
+    goalCache.flush()
 
 
     if joystick.get_button(9):  # ESC button
@@ -182,48 +211,39 @@ while running:
         print("Sending To Zero")
         for sid in motor_IDS:
             packetHandler.WriteSignedPosEx(sid, 0, STS_MOVING_SPEED, STS_MOVING_ACC)
-        time.sleep(1)
-        # Wait until all motors have stopped moving
-        all_stopped = False
-        while not all_stopped:
-            all_stopped = True
-            for sid in motor_IDS:
-                moving, _, _ = packetHandler.ReadMoving(sid)
-                if moving != 0:
-                    all_stopped = False
-                    break
-            time.sleep(0.05)  
-        print("At Zero")
+        # Wait until every motor is at 0 (one sync read per poll)
+        settled, _ = packetHandler.AwaitSettled(motor_IDS, timeout=ZERO_TIMEOUT, goals=dict.fromkeys(motor_IDS, 0), wrap=TICKS_PER_TURN)
+        print("At Zero" if settled else "Timed out on the way to zero")
         running = False
         break
     if now - last_update_time > update_interval:
         # x axis
         if axis_valx > 0.1:
             y -= 1
-            update_position(x,y,z,phi)
+            x, y, z = update_position(x,y,z,phi)
             print(target_angle , x,y,z)
         elif axis_valx < -0.1:
             y += 1
-            update_position(x,y,z,phi)
+            x, y, z = update_position(x,y,z,phi)
             print(target_angle , x,y,z)
 
         # y axis
         if axis_valy > 0.1:
             x += 1
-            update_position(x,y,z,phi)
+            x, y, z = update_position(x,y,z,phi)
             print(target_angle , x,y,z)
         elif axis_valy < -0.1:
             x -= 1
-            update_position(x,y,z,phi)
+            x, y, z = update_position(x,y,z,phi)
             print(target_angle , x,y,z)
 
         if joystick.get_button(1):
             z += 1
-            update_position(x,y,z,phi)
+            x, y, z = update_position(x,y,z,phi)
             print(target_angle , x,y,z)
         elif joystick.get_button(2):
             z -= 1
-            update_position(x,y,z,phi)
+            x, y, z = update_position(x,y,z,phi)
             print(target_angle , x,y,z)
         last_update_time = now
 
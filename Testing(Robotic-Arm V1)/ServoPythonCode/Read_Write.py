@@ -291,15 +291,18 @@ while 1:
     if ch== chr(0x1b) or ch == 'q':
         break
     elif ch == 'i':
-      # Read STServo present position
-      for index in range(0, 70):
-        result, sts_comm_result, sts_error= packetHandler.ReadByte(STS_ID, index)
-        if sts_comm_result != COMM_SUCCESS:
-            print(packetHandler.getTxRxResult(sts_comm_result))
-        else:
-            print("[ID:%03d] Position:%d =  %d" % (STS_ID, index, result))
-        if sts_error != 0:
-            print(packetHandler.getRxPacketError(sts_error))
+      # Read STServo registers 0-70 in one packet
+      table, sts_comm_result, sts_error= packetHandler.ReadControlTable(STS_ID)
+      if sts_comm_result != COMM_SUCCESS:
+          print(packetHandler.getTxRxResult(sts_comm_result))
+      else:
+          for index, result in table['raw'].items():
+              print("[ID:%03d] Position:%d =  %d" % (STS_ID, index, result))
+          for name, value in table.items():
+              if name != 'raw':
+                  print("[ID:%03d] %s = %d" % (STS_ID, name, value))
+      if sts_error != 0:
+          print(packetHandler.getRxPacketError(sts_error))
     elif ch == 'p':
         showPosition(STS_ID)
     elif ch == '-':
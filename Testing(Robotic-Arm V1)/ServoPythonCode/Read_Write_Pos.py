@@ -32,6 +32,7 @@ else:
 
 sys.path.append("..")
 from STservo_sdk import *        
+from Maths.multi_turn import MultiTurnTracker
 
 # Default settings
 STS_ID = 1
@@ -42,6 +43,9 @@ DEVICENAME  = 'COM5'
  # e.g. Windows: "COM1"   Linux: "/dev/ttyUSB0" Mac: "/dev/tty.usbserial-*"
 SPEED = 1200
 ACC = 50
+ZERO_TIMEOUT = 30.0  # seconds
+POLL_PERIOD = 0.02   # seconds between state polls of the bus thread
+STALE_AFTER = 0.5    # seconds after which the last published poll is reported as stale
 
 # Ticks
 TICKS_PER_TURN = 4096
@@ -50,15 +54,16 @@ HALF_TURN = TICKS_PER_TURN // 2
 # Target controller limits (WritePosEx uses 16-bit w/ sign trick here)
 CHUNK_LIMIT = 30000       # keep under 0x7FFF
 
-# States
-MOTOR_GLOBALS_STEPS = {}
-MOTOR_CURRENT_ROTATION ={}
+# States: global steps, rotation, last reg67 and target steps of every motor,
+# unwrapped for all motors at once (16-bit reg67)
+tracker = MultiTurnTracker(MOTOR_IDS, wrap=65536, ticks_per_turn=TICKS_PER_TURN)
 LAST_POS = {}
-LAST_ABS67 = {}
+
+# Latest telemetry of every motor, published by the bus thread (poll_states)
+exchange = StateExchange(MOTOR_IDS)
 
 
 # Movement
-TARGET_STEPS = {}
 TARGET_ANGLES = {}
 
 
@@ -92,6 +97,7 @@ def spawn(name, target, *args, **kwargs):
 # Initalise PortHandler instance and PacketHandler instance
 portHandler = PortHandler(DEVICENAME)
 packetHandler = sts(portHandler)
+registerMirror = RegisterMirror(packetHandler)
     
 # Open port
 if portHandler.openPort():
@@ -113,30 +119,10 @@ else:
 
 # -- Rotation tracking ---
 
-def _init_motor_rotation_state(sid: int, abs67: int, user_rot: int):
-    """Initialize rotation state from absolute 16-bit reg67."""
-    abs67 &= 0xFFFF
-    with state_lock:
-        LAST_ABS67[sid] = abs67
-        MOTOR_CURRENT_ROTATION[sid] = int(user_rot)
-        MOTOR_GLOBALS_STEPS[sid] = MOTOR_CURRENT_ROTATION[sid] * TICKS_PER_TURN + (abs67 % TICKS_PER_TURN)
-        TARGET_STEPS[sid] = MOTOR_GLOBALS_STEPS[sid]
-        TARGET_ANGLES[sid] = 0
-        
-
-
-
 def update_rotation_from_abs67(sid: int, abs67: int):
     """Update rotation using wrap-aware delta of reg67 (16-bit)."""
-    abs67 &= 0xFFFF
-    with state_lock:
-        prev = LAST_ABS67.get(sid, abs67)
-        # signed 16-bit wrap diff: range [-32768, +32767]
-        delta = ((abs67 - prev + 32768) % 65536) - 32768
-        MOTOR_GLOBALS_STEPS[sid] += delta
-        LAST_ABS67[sid] = abs67
-        MOTOR_CURRENT_ROTATION[sid] = int(MOTOR_GLOBALS_STEPS[sid] // TICKS_PER_TURN)
-        return MOTOR_CURRENT_ROTATION[sid]
+    state = tracker.update_values({sid: abs67 & 0xFFFF})
+    return int(state.rotations[tracker.index[sid]])
     
 def read_abs67(sid: int):
     with comm_lock:
@@ -151,6 +137,8 @@ def read_abs67(sid: int):
 
 
 
+initial_abs67 = []
+initial_rotations = []
 for sid in MOTOR_IDS:
 
     # --- Enable position mode ---
@@ -206,8 +194,10 @@ for sid in MOTOR_IDS:
         rot = int(rot_str) if rot_str else 0
     except Exception:
         rot = 0
-    _init_motor_rotation_state(sid, abs67, rot)
-    print(f"Set current rotation to: {MOTOR_CURRENT_ROTATION[sid]}")
+    initial_abs67.append(abs67 & 0xFFFF)
+    initial_rotations.append(rot)
+    TARGET_ANGLES[sid] = 0
+    print(f"Set current rotation to: {rot}")
 
     # --- Indivual Motor Global Positions ---
     # MOTOR_GLOBALS_POS[sid] = TICKS_PER_TURN * rot + (abs67 % TICKS_PER_TURN)
@@ -217,48 +207,66 @@ for sid in MOTOR_IDS:
     # print(abs67 % TICKS_PER_TURN)
 
 
-print(f"Motor Target Steps Disctionary: {TARGET_STEPS}")
+# Rotation state of every motor from its reg67 and the rotation given
+state = tracker.reset(initial_abs67, rotations=initial_rotations)
+
+print(f"Motor Target Steps: {dict(zip(MOTOR_IDS, state.targets.tolist()))}")
 print(f"Target Anges: {TARGET_ANGLES}")
-print(f"Motor Global Steps Dictionary: {MOTOR_GLOBALS_STEPS}")
-print(f"Motor Indivual Rotation Disctionary: {MOTOR_CURRENT_ROTATION}")
+print(f"Motor Global Steps: {dict(zip(MOTOR_IDS, state.steps.tolist()))}")
+print(f"Motor Indivual Rotations: {dict(zip(MOTOR_IDS, state.rotations.tolist()))}")
 
 
 
 
 
-def showPosition(ID):
-    # with comm_lock:
-    #     result, sts_comm_result, sts_error= packetHandler.Read2Byte(ID, 67) # Unknown
-    # with print_lock:
-    #     print("Code Absolute Position:", result)  
+# -- Bus thread: the only writer of the exchange ---
 
-    with comm_lock:
-        # Read STServo present position, speed, acceleration, current
-        pos, speed, acc, current, sts_comm_result, sts_error = packetHandler.ReadPosSpeedAccCurrent(ID)
-        result67, sts_comm_result2, sts_error2 = packetHandler.Read2Byte(ID, 67)
+poll_stop = threading.Event()
 
-    update_rotation_from_abs67(ID, result67)
+def poll_states():
+    """Sync read every motor's telemetry and publish it; readers never hold the bus."""
+    while not poll_stop.is_set():
+        try:
+            with comm_lock:
+                telemetry, _ = packetHandler.SyncReadTelemetry(MOTOR_IDS, with_acc=True)
+            exchange.publish(telemetry)
+            tracker.update_values(dict((sid, None if t is None else t.multi_turn) for sid, t in telemetry.items()))
+        except Exception as e:
+            # keep polling; showPosition reports the snapshot as stale meanwhile
+            with print_lock:
+                print("[poll_states] error:", e)
+        poll_stop.wait(POLL_PERIOD)
 
-    with state_lock:
-        rot = MOTOR_CURRENT_ROTATION[ID]
-        global_steps = MOTOR_GLOBALS_STEPS.get(ID, 0)
-        tgt = TARGET_STEPS.get(ID, global_steps)
-        err = tgt - global_steps
+spawn("poll_states", poll_states)
+
+
+def showPosition(ID):
+    # Last published poll, so a slow dump_registers holding comm_lock does not stall it
+    snapshot = exchange.read()
+    telemetry = snapshot.state(ID)
+    age = (time.monotonic_ns() - snapshot.stamp) / 1e9
+
+    state = tracker.snapshot()  # consistent without state_lock
+    i = tracker.index[ID]
+    rot = int(state.rotations[i])
+    global_steps = int(state.steps[i])
+    tgt = int(state.targets[i])
+    err = tgt - global_steps
 
     with print_lock:
-        if sts_comm_result != COMM_SUCCESS:
-            print(packetHandler.getTxRxResult(sts_comm_result))
+        if snapshot.seq == 0:
+            print("[ID:%03d] no poll published yet" % ID)
+            return
+        if age > STALE_AFTER:
+            print("[ID:%03d] stale: last poll %.1f s ago" % (ID, age))
+        if telemetry is None:
+            print("[ID:%03d] no reply to the last poll" % ID)
         else:
             print(
                 "[ID:%03d] Speed:%d Acc:%d (~%d steps/s^2) Current:%d global_steps:%d byte67:%d Rot:%d Target:%d Err:%d"
-                % (ID, speed, acc, acc * 100, current, global_steps, result67, rot, tgt, err)
+                % (ID, telemetry['speed'], telemetry['acc'], telemetry['acc'] * 100, telemetry['current'],
+                   global_steps, telemetry['multi_turn'], rot, tgt, err)
             )
-        if sts_error != 0:
-            print(packetHandler.getRxPacketError(sts_error))
-        if sts_comm_result2 != COMM_SUCCESS:
-            print(packetHandler.getTxRxResult(sts_comm_result2))
-        if sts_error2 != 0:
-            print(packetHandler.getRxPacketError(sts_error2))
     
 
 # def moveBySteps(ID, steps, speed, acc):
@@ -299,10 +307,13 @@ def showPosition(ID):
 #         if moving == 0:
 #             break
 #         time.sleep(0.1)
+def encode_steps(steps):
+    """Encode negative steps as +0x8000, the trick used by this SDK."""
+    return -steps + 0x8000 if steps < 0 else steps
+
 def moveBySteps(ID, steps, speed, acc):
     """One-shot relative move by steps (handles sign encoding), blocks until stop."""
-    # Encode negative as +0x8000 trick used by this SDK
-    tx_steps = -steps + 0x8000 if steps < 0 else steps
+    tx_steps = encode_steps(steps)
     with comm_lock:
         sts_comm_result, sts_error = packetHandler.WritePosEx(ID, tx_steps, speed, acc)
     if sts_comm_result != COMM_SUCCESS:
@@ -324,40 +335,67 @@ def moveBySteps(ID, steps, speed, acc):
         if moving == 0:
             break
         time.sleep(0.05)
-    print(TARGET_STEPS, MOTOR_GLOBALS_STEPS)
+    state = tracker.snapshot()
+    print(state.targets, state.steps)
 
 # ----------------- Position controller (NEW) -----------------
 def position_controller(ID):
    
     while True:
-        difference = TARGET_STEPS[ID] - MOTOR_GLOBALS_STEPS[ID]
+        difference = tracker.target(ID) - tracker.steps(ID)
         moveBySteps(ID, difference, 1200, 50)
         read_abs67(ID)
 
 def manual_position_control(ID):
-    difference = TARGET_STEPS[ID] - MOTOR_GLOBALS_STEPS[ID]
+    difference = tracker.target(ID) - tracker.steps(ID)
     moveBySteps(ID, difference, 1200, 50)
     read_abs67(ID)
        
 def dump_registers():
-    for index in range(0, 70):
-        with comm_lock:
-            result, sts_comm_result, sts_error = packetHandler.ReadByte(STS_ID, index)
-        with print_lock:
-            if sts_comm_result != COMM_SUCCESS:
-                print(packetHandler.getTxRxResult(sts_comm_result))
-            else:
+    # One bulk read of registers 0-69 instead of 70 single-byte reads
+    with comm_lock:
+        data, sts_comm_result, sts_error = registerMirror.read(STS_ID, 0, 70)
+    with print_lock:
+        if sts_comm_result != COMM_SUCCESS:
+            print(packetHandler.getTxRxResult(sts_comm_result))
+        else:
+            for index, result in enumerate(data):
                 print("[ID:%03d] Reg[%02d] = %d" % (STS_ID, index, result))
-            if sts_error != 0:
-                print(packetHandler.getRxPacketError(sts_error))
+        if sts_error != 0:
+            print(packetHandler.getRxPacketError(sts_error))
 
 def goto_zero():
+    """Start every motor towards zero, then wait for all of them together."""
+    moving_ids = []
     for sid in MOTOR_IDS:
         with comm_lock:
             result, sts_comm_result, sts_error = packetHandler.Read2Byte(sid, 67)
         with print_lock:
             print("Current:", result)
-        moveBySteps(sid, -result, SPEED, ACC)
+        with comm_lock:
+            sts_comm_result, sts_error = packetHandler.WritePosEx(sid, encode_steps(-result), SPEED, ACC)
+        # a motor that did not take the move is reported and not waited for
+        if sts_comm_result != COMM_SUCCESS:
+            with print_lock: print(packetHandler.getTxRxResult(sts_comm_result))
+        elif sts_error != 0:
+            with print_lock: print(packetHandler.getRxPacketError(sts_error))
+        else:
+            moving_ids.append(sid)
+    if not moving_ids:
+        return
+
+    # one sync read of position/speed/moving per poll, the bus is free in between
+    monitor = SettleMonitor(moving_ids)
+    deadline = time.monotonic() + ZERO_TIMEOUT
+    while True:
+        with comm_lock:
+            states, _ = packetHandler.SyncReadState(moving_ids, SETTLE_FIELDS)
+        if monitor.update(states):
+            break
+        if time.monotonic() > deadline:
+            with print_lock: print("Timed out on the way to zero:", monitor.unsettled)
+            break
+        time.sleep(monitor.period)
 
 def show_all_positions():
     print("Motor Positions:")
@@ -370,16 +408,15 @@ def update_target_angles(ID, angle):
     steps = int(round(angle * (TICKS_PER_TURN * float(GEAR_RATIOS[ID]) / 360)))
     with state_lock:
         TARGET_ANGLES[ID] += angle   
-        TARGET_STEPS[ID] += steps
+    target_steps = tracker.move_target(ID, steps)
     with print_lock:
         print("Target Angles and Steps")
-        print(f"[{ID}] +{angle}° -> Δsteps={steps}, total_angle={TARGET_ANGLES[ID]}°, target_steps={TARGET_STEPS[ID]}")
+        print(f"[{ID}] +{angle}° -> Δsteps={steps}, total_angle={TARGET_ANGLES[ID]}°, target_steps={target_steps}")
 
 def update_target_steps(ID, delta_steps):
-    with state_lock:
-        TARGET_STEPS[ID] += int(delta_steps)
+    target_steps = tracker.move_target(ID, delta_steps)
     with print_lock:
-        print(f"[{ID}] Δtarget_steps={delta_steps} -> target_steps={TARGET_STEPS[ID]}")
+        print(f"[{ID}] Δtarget_steps={delta_steps} -> target_steps={target_steps}")
 
 
 # start controllers (NEW)
@@ -412,6 +449,7 @@ try:
         # else: ignore other keys
 finally:
     # Give in-flight workers a brief chance to finish nicely
+    poll_stop.set()
     with workers_lock:
         current_workers = list(workers)
     for t in current_workers:
@@ -47,6 +47,7 @@ portHandler = PortHandler(DEVICENAME)
 # Initialize PacketHandler instance
 # Get methods and members of Protocol
 packetHandler = sts(portHandler)
+registerMirror = RegisterMirror(packetHandler)
     
 # Open port
 if portHandler.openPort():
@@ -91,14 +92,13 @@ print(packetHandler.getTxRxResult(sts_comm_result), "Maximum angle:", result)
 global_position = 0
 
 def showPosition():
-  result, sts_comm_result, sts_error= packetHandler.Read2Byte(STS_ID, 67) # Unknown
-  print("Unknown:", result)  
-  # Read STServo present position
-  sts_present_position, sts_present_speed, sts_comm_result, sts_error = packetHandler.ReadPosSpeed(STS_ID)
+  # Read STServo present position, speed and register 67 in one packet
+  telemetry, sts_comm_result, sts_error = packetHandler.ReadTelemetry(STS_ID)
   if sts_comm_result != COMM_SUCCESS:
       print(packetHandler.getTxRxResult(sts_comm_result))
   else:
-      print("[ID:%03d] PresPos:%d PresSpd:%d global_position:%d" % (STS_ID, sts_present_position, sts_present_speed, global_position))
+      print("Unknown:", telemetry.multi_turn)
+      print("[ID:%03d] PresPos:%d PresSpd:%d global_position:%d" % (STS_ID, telemetry.position, telemetry.speed, global_position))
   if sts_error != 0:
       print(packetHandler.getRxPacketError(sts_error))
     
@@ -159,15 +159,15 @@ while 1:
     if ch== chr(0x1b) or ch == 'q':
         break
     elif ch == 'i':
-      # Read STServo present position
-      for index in range(0, 70):
-        result, sts_comm_result, sts_error= packetHandler.ReadByte(STS_ID, index)
-        if sts_comm_result != COMM_SUCCESS:
-            print(packetHandler.getTxRxResult(sts_comm_result))
-        else:
-            print("[ID:%03d] Position:%d =  %d" % (STS_ID, index, result))
-        if sts_error != 0:
-            print(packetHandler.getRxPacketError(sts_error))
+      # Read STServo registers 0-69 in one bulk read
+      data, sts_comm_result, sts_error= registerMirror.read(STS_ID, 0, 70)
+      if sts_comm_result != COMM_SUCCESS:
+          print(packetHandler.getTxRxResult(sts_comm_result))
+      else:
+          for index, result in enumerate(data):
+              print("[ID:%03d] Position:%d =  %d" % (STS_ID, index, result))
+      if sts_error != 0:
+          print(packetHandler.getRxPacketError(sts_error))
     elif ch == 'p':
         showPosition()
     elif ch == '0':
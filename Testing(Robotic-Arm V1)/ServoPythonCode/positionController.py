@@ -26,6 +26,8 @@ else:
 
 sys.path.append("..")
 from STservo_sdk import *  # Uses STServo SDK library
+from Maths.multi_turn import MultiTurnTracker
+from Maths.telemetry import TelemetryRecorder
 
 # Settings
 # STS_IDS = [4]               # Servo IDs
@@ -38,32 +40,34 @@ TICKS_PER_TURN = 4096
 
 STS_MOVING_SPEED = 1200  # Pattern of speeds
 STS_MOVING_ACC = 50
+ZERO_TIMEOUT = 30.0  # seconds to wait for the motors to reach 0
+GOAL_REFRESH_PERIOD = 0.2  # seconds between resends of every goal, in case a servo missed a sync write
+TELEMETRY_CAPACITY = 4096  # logged samples kept in RAM (~7 min at the 0.1 s log interval)
+TELEMETRY_DIR = None       # e.g. "telemetry": also spill every sample to .npy files there (a run_* folder per session)
         #Motors = [1, 2, 3, 4, 5]
 target_position = []
 target_angle = []
 maxLimits = []
 minLimits = []
 raw_position = []
-prev_pos = {}
-turn_count = {}
-abs_positions = {}
+tracker = MultiTurnTracker(motor_IDS, wrap=TICKS_PER_TURN)  # absolute ticks of every joint, unwrapped at once
 abs_angle_positions ={}
 max_angle=[]
 output_position = []
 
-# For logging accuracy over time
-time_log = []
-target_angle_log = {sid: [] for sid in motor_IDS}
-actual_angle_log = {sid: [] for sid in motor_IDS}
-error_angle_log = {sid: [] for sid in motor_IDS}
-velocity_log = {sid: [] for sid in motor_IDS}
-acceleration_log = {sid: [] for sid in motor_IDS}
+# For logging accuracy over time: target, actual and error angle of every joint
+# (velocity and acceleration are computed from the log when plotted)
+telemetry = TelemetryRecorder(motor_IDS, ['target', 'actual', 'error'], capacity=TELEMETRY_CAPACITY,
+                              spill_dir=TELEMETRY_DIR)
 
 
 # Setup
 
 portHandler = PortHandler(DEVICENAME)
 packetHandler = sts(portHandler)
+packetHandler.setAdaptiveTimeout(AdaptiveTimeout())  # a missing servo stops costing 50 ms per read
+goalCache = GoalWriteCache(packetHandler, refresh_period=GOAL_REFRESH_PERIOD)
+registerMirror = RegisterMirror(packetHandler)
 
 if not portHandler.openPort():
     print("Failed to open port.")
@@ -73,6 +77,9 @@ if not portHandler.setBaudRate(BAUDRATE):
     print("Failed to set baudrate.")
     sys.exit()
 
+# Wait for replies on the port instead of spinning a core
+portHandler.setRxBlocking(True)
+
 # Initalise Pygame and Joystick
 pygame.init()
 pygame.joystick.init()
@@ -100,18 +107,9 @@ for sid in motor_IDS:
 print("Sending To Zero")
 for sid in motor_IDS:
     packetHandler.WriteSignedPosEx(sid, 0, STS_MOVING_SPEED, STS_MOVING_ACC)
-time.sleep(1)
-# Wait until all motors have stopped moving
-all_stopped = False
-while not all_stopped:
-    all_stopped = True
-    for sid in motor_IDS:
-        moving, _, _ = packetHandler.ReadMoving(sid)
-        if moving != 0:
-            all_stopped = False
-            break
-    time.sleep(0.05)  
-print("At Zero")
+# Wait until every motor is at 0 (one sync read per poll)
+settled, _ = packetHandler.AwaitSettled(motor_IDS, timeout=ZERO_TIMEOUT, goals=dict.fromkeys(motor_IDS, 0), wrap=TICKS_PER_TURN)
+print("At Zero" if settled else "Timed out on the way to zero")
 
 def unsigned_to_signed_16bit(val):
     return val - 0x10000 if val > 0x7FFF else val
@@ -121,10 +119,11 @@ def unsigned_to_signed_16bit(val):
 
 def compute_accuracy():
     errors = []
+    abs_positions = tracker.snapshot().steps
     print("\n--- Accuracy Report ---")
     for i, sid in enumerate(motor_IDS):
         target_pos_ticks = output_position[i]  # Target position in encoder ticks
-        actual_pos_ticks = abs_positions[sid]  # Measured absolute position in ticks
+        actual_pos_ticks = int(abs_positions[i])  # Measured absolute position in ticks
 
         error_ticks = actual_pos_ticks - target_pos_ticks
         error_deg = error_ticks * (18 / TICKS_PER_TURN)  # Convert to degrees
@@ -149,11 +148,13 @@ def compute_accuracy():
 
 def plot_accuracy():
     print("Generating accuracy plots...")
-    for sid in motor_IDS:
+    samples = telemetry.history()
+    time_log = samples['time']
+    for i, sid in enumerate(motor_IDS):
         plt.figure(figsize=(10, 5))
         plt.title(f"Motor {sid} - Target vs Actual Angle Over Time")
-        plt.plot(time_log, target_angle_log[sid], label='Target Angle (°)')
-        plt.plot(time_log, actual_angle_log[sid], label='Actual Angle (°)')
+        plt.plot(time_log, samples['target'][:, i], label='Target Angle (°)')
+        plt.plot(time_log, samples['actual'][:, i], label='Actual Angle (°)')
         plt.xlabel("Time (s)")
         plt.ylabel("Angle (°)")
         plt.legend()
@@ -162,7 +163,7 @@ def plot_accuracy():
 
         plt.figure(figsize=(10, 4))
         plt.title(f"Motor {sid} - Error Over Time")
-        plt.plot(time_log, error_angle_log[sid], label='Error (Target - Actual)', linestyle='--')
+        plt.plot(time_log, samples['error'][:, i], label='Error (Target - Actual)', linestyle='--')
         plt.xlabel("Time (s)")
         plt.ylabel("Error (°)")
         plt.legend()
@@ -170,11 +171,14 @@ def plot_accuracy():
         plt.show()
 def plot_joint_trajectory():
     print("Plotting joint trajectory smoothness...")
+    time_log = telemetry.times(history=True)
+    velocity_log = telemetry.velocity('actual', history=True)
+    acceleration_log = telemetry.acceleration('actual', history=True)
 
-    for sid in motor_IDS:
+    for i, sid in enumerate(motor_IDS):
         # Velocity Plot
         t_vel = time_log[1:]                          # Velocity starts at 2nd time point
-        v_log = velocity_log[sid][1:]                 # Align lengths
+        v_log = velocity_log[1:, i]                   # Align lengths
         plt.figure(figsize=(10, 4))
         plt.title(f"Motor {sid} - Joint Velocity Over Time")
         plt.plot(t_vel, v_log, label='Velocity (°/s)')
@@ -187,7 +191,7 @@ def plot_joint_trajectory():
 
         # Acceleration Plot
         t_acc = time_log[2:]                          # Acceleration starts at 3rd time point
-        a_log = acceleration_log[sid][2:]             # Align lengths
+        a_log = acceleration_log[2:, i]               # Align lengths
         plt.figure(figsize=(10, 4))
         plt.title(f"Motor {sid} - Joint Acceleration Over Time")
         plt.plot(t_acc, a_log, label='Acceleration (°/s²)', color='orange')
@@ -208,7 +212,7 @@ def usefulinfo():
 
         
         
-    print("Absolute Position:", abs_positions)
+    print("Absolute Position:", dict(zip(motor_IDS, tracker.snapshot().steps.tolist())))
     print("Angles (absolute)", abs_angle_positions)
     print("Raw Position:", raw_position)
     print("Target Position:", target_position)
@@ -220,18 +224,19 @@ for sid in motor_IDS:
     target_angle.append(starting_angles[sid-1])
     raw_pos, _, _ = packetHandler.ReadPos(sid)
     raw_position.append(unsigned_to_signed_16bit(raw_pos))
-    prev_pos[sid] = unsigned_to_signed_16bit(raw_pos)
-    turn_count[sid] = 0
-    abs_positions[sid] = 0
     abs_angle_positions[sid] = starting_angles[sid -1]
-    max_val, _, _ = packetHandler.read2ByteTxRx(sid, STS_MAX_ANGLE_LIMIT_L)
-    min_val, _, _ = packetHandler.read2ByteTxRx(sid, STS_MIN_ANGLE_LIMIT_L)
+    # Angle limits are EEPROM: one bulk read per servo, then served from the mirror
+    max_val, _, _ = registerMirror.read2Byte(sid, STS_MAX_ANGLE_LIMIT_L)
+    min_val, _, _ = registerMirror.read2Byte(sid, STS_MIN_ANGLE_LIMIT_L)
     maxangle = (unsigned_to_signed_16bit(max_val) * (18/TICKS_PER_TURN)) + starting_angles[sid - 1] # 18 because 20:1 ratio, 360/20 =18
     max_angle.append(maxangle)
     maxLimits.append(unsigned_to_signed_16bit(max_val))
     minLimits.append(unsigned_to_signed_16bit(min_val))
 
     
+tracker.reset(raw_position)
+joint_starting_angles = np.array([starting_angles[sid - 1] for sid in motor_IDS], dtype=float)
+
 print("Max Limits:", maxLimits)
 print("Max Limits:", minLimits)
 print("Starting Angles:", starting_angles)
@@ -255,59 +260,22 @@ while running:
     axis_valy = joystick.get_axis(0)
     axis_valx = joystick.get_axis(1)
 
-    # Sending the array of angles to the motor
+    # Sending the array of angles to the motor (changed goals only, in one sync write)
     for sid in motor_IDS:
         output_position[sid-1] = int((target_angle[sid-1]-starting_angles[sid-1]) * (TICKS_PER_TURN / 18))
-        packetHandler.WriteSignedPosEx(sid, output_position[sid - 1], STS_MOVING_SPEED, STS_MOVING_ACC)
-
-    for sid in motor_IDS:
-        raw_pos, _, _ = packetHandler.ReadPos(sid)
-        current_pos = unsigned_to_signed_16bit(raw_pos)
-        delta = current_pos - prev_pos[sid]
-
-        if delta > TICKS_PER_TURN / 2:
-            turn_count[sid] -= 1
-        elif delta < -TICKS_PER_TURN / 2:
-            turn_count[sid] += 1
-
-
-
-        abs_positions[sid] = current_pos + turn_count[sid] * TICKS_PER_TURN
-        prev_pos[sid] = current_pos
-        abs_angle_positions[sid] = starting_angles[sid-1] + (abs_positions[sid] * (18/TICKS_PER_TURN))
+        goalCache.setGoal(sid, output_position[sid - 1], STS_MOVING_SPEED, STS_MOVING_ACC)
+    goalCache.flush()
+
+    # One sync read for every joint instead of a ReadPos per servo, unwrapped in one call
+    states, _ = packetHandler.SyncReadState(motor_IDS, ['position'])
+    abs_positions = tracker.update_states(states).steps
+    actual_angles = joint_starting_angles + abs_positions * (18/TICKS_PER_TURN)
+    abs_angle_positions = dict(zip(motor_IDS, actual_angles.tolist()))
     
     if now - last_update_time > update_interval:
-        time_log.append(now)
-
-        for i, sid in enumerate(motor_IDS):
-            tgt_angle = target_angle[i]
-            act_angle = abs_angle_positions[sid]
-            err_angle = tgt_angle - act_angle
-
-            target_angle_log[sid].append(tgt_angle)
-            actual_angle_log[sid].append(act_angle)
-            error_angle_log[sid].append(err_angle)
-            
-        for sid in motor_IDS:
-            angle_list = actual_angle_log[sid]
-
-            # Velocity
-            if len(time_log) >= 2:
-                dt = time_log[-1] - time_log[-2]
-                dtheta = angle_list[-1] - angle_list[-2]
-                velocity = dtheta / dt
-            else:
-                velocity = 0.0
-            velocity_log[sid].append(velocity)
-
-            # Acceleration
-            if len(time_log) >= 3:  # We need at least 3 timestamps to compute 2 velocities
-                dt_vel = time_log[-2] - time_log[-3]
-                dv = velocity_log[sid][-1] - velocity_log[sid][-2]
-                acceleration = dv / dt_vel
-            else:
-                acceleration = 0.0
-            acceleration_log[sid].append(acceleration)
+        # One ring buffer row per sample, fixed memory however long the session
+        target_angles = np.array(target_angle, dtype=float)
+        telemetry.append(now, target=target_angles, actual=actual_angles, error=target_angles - actual_angles)
 
 
 
@@ -323,18 +291,9 @@ while running:
         print("Sending To Zero")
         for sid in motor_IDS:
             packetHandler.WriteSignedPosEx(sid, 0, STS_MOVING_SPEED, STS_MOVING_ACC)
-        time.sleep(1)
-        # Wait until all motors have stopped moving
-        all_stopped = False
-        while not all_stopped:
-            all_stopped = True
-            for sid in motor_IDS:
-                moving, _, _ = packetHandler.ReadMoving(sid)
-                if moving != 0:
-                    all_stopped = False
-                    break
-            time.sleep(0.05)  
-        print("At Zero")
+        # Wait until every motor is at 0 (one sync read per poll)
+        settled, _ = packetHandler.AwaitSettled(motor_IDS, timeout=ZERO_TIMEOUT, goals=dict.fromkeys(motor_IDS, 0), wrap=TICKS_PER_TURN)
+        print("At Zero" if settled else "Timed out on the way to zero")
         running = False
         break
 
@@ -415,5 +374,6 @@ while running:
 # plot_joint_trajectory()
 
 
+telemetry.flush()
 portHandler.closePort()
 print("Port closed. Motors stopped. Program exited.")
\ No newline at end of file